@@ -18,14 +18,18 @@ router = APIRouter(
 def upload_file(params: gcp_schema.StorageBase, request: Request):
     return gcp.upload(params, DATA_FOLDER, RESOURCE_FOLDER)
 
-@router.post("/setupVectorStore", response_model=user_schema.User)
+@router.post("/setupVectorStore", response_model=gcp_schema.BuildJob, status_code=status.HTTP_202_ACCEPTED)
 def setup_vector_store(params: gcp_schema.VectorStore, request: Request, db: Session = Depends(get_db)):
     return gcp.setup_vectorStore(params, DATA_FOLDER, VECTOR_STORE_FOLDER, db)
 
-@router.post("/setupVectorStoreWithPdf", response_model=user_schema.User)
+@router.post("/setupVectorStoreWithPdf", response_model=gcp_schema.BuildJob, status_code=status.HTTP_202_ACCEPTED)
 def setup_vector_store_with_pdf(params: gcp_schema.VectorStoreFiles, request: Request, db: Session = Depends(get_db)):
     return gcp.setup_vectorStoreWithPdf(params, DATA_FOLDER, VECTOR_STORE_FOLDER, db)
 
+@router.get("/jobs/{job_id}", response_model=gcp_schema.BuildJob)
+def get_build_job(job_id: str, request: Request):
+    return gcp.get_build_job(job_id)
+
 @router.post("/generateSignedUrl")
 def generate_signed_url(params: gcp_schema.StorageCreate, request: Request):
     return gcp.generate_signed_url(params, DATA_FOLDER)
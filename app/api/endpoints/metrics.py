@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.core.metrics import collect_metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+)
+
+
+@router.get("/")
+def get_metrics():
+    return collect_metrics()
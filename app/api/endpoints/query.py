@@ -4,6 +4,7 @@ from app.schemas import query_schema, user_schema
 from app.db.session import get_db
 from sqlalchemy.orm import Session
 from app.core.config import redis_client
+from app.core.vector_cache import session_vector_store_key
 from app.utils import oauth2
 import app.crud.query as query
 
@@ -17,6 +18,10 @@ router = APIRouter(
 async def chat(chat: query_schema.QueryCreate, request: Request,  db: Session = Depends(get_db)):
     return await query.create_query(db, chat, request)
 
+@router.post("/search/batch", response_model=query_schema.SearchBatchResponse)
+async def search_batch(search: query_schema.SearchBatchCreate, request: Request):
+    return await query.search_batch(search, request)
+
 @router.post("/quiz", response_model=query_schema.QuizBase)
 def quiz(chat: query_schema.QuizCreate, request: Request,  db: Session = Depends(get_db)):
     return query.create_quiz(chat, request)
@@ -55,15 +60,14 @@ async def clear_user_session(request: Request):
         raise HTTPException(status_code=400, detail="No session ID found in request")
 
     try:
-        # Check if the session ID exists in Redis
-        session_key_index = f"{session_id}_index"
-        session_key_metadata = f"{session_id}_metadata"
-        if not await redis_client.exists(session_key_index) and not await redis_client.exists(session_key_metadata):
+        # Check if the session points at a cached vector store
+        session_key = session_vector_store_key(session_id)
+        cache_key = await redis_client.get(session_key)
+        if not cache_key:
             return {"message": "Session key not found"}
 
-        # Delete the session key
-        await redis_client.delete(session_key_index)
-        await redis_client.delete(session_key_metadata)
+        # Delete the session pointer, the shared vector store stays cached for other sessions
+        await redis_client.delete(session_key)
         return {"message": f"Session data cleared for session_id: {session_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to clear session data")
@@ -0,0 +1,243 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+import faiss
+import numpy as np
+from logging_config import logger
+from .config import (
+    redis_client,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_VERSIONS,
+    ANSWER_CACHE_REFRESH_SECONDS,
+)
+from .metrics import register_metrics
+
+# An entry is packed as its dimension and generation seconds, the question embedding and the
+# UTF-8 answer
+_ENTRY_HEADER = struct.Struct("<If")
+
+
+def _pack(vector, answer, seconds):
+    return _ENTRY_HEADER.pack(len(vector), seconds) + vector.tobytes() + answer.encode("utf-8")
+
+
+def _stream_id(entry_id):
+    milliseconds, sequence = entry_id.decode().split("-")
+    return int(milliseconds), int(sequence)
+
+
+def _unpack(data):
+    dimension, seconds = _ENTRY_HEADER.unpack_from(data)
+    start = _ENTRY_HEADER.size
+    end = start + dimension * 4
+    vector = np.frombuffer(data[start:end], dtype=np.float32)
+    return vector, data[end:].decode("utf-8"), seconds
+
+
+class _AnswerIndex:
+    """
+    The answered questions of one vector store version, oldest first.
+
+    last_read is the id of the newest Redis stream entry added, and written the ids of the
+    entries this worker appended itself, so reading the stream again skips both.
+    """
+
+    def __init__(self, dimension, max_entries):
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.answers = {}
+        self.next_id = 0
+        self.last_read = None
+        self.read_at = 0.0
+        self.written = set()
+
+    def add(self, vector, answer, seconds):
+        self.index.add_with_ids(vector.reshape(1, -1), np.array([self.next_id], dtype=np.int64))
+        self.answers[self.next_id] = (answer, seconds)
+        self.next_id += 1
+        if len(self.answers) > self.max_entries:
+            oldest = min(self.answers)
+            self.index.remove_ids(np.array([oldest], dtype=np.int64))
+            del self.answers[oldest]
+
+    def nearest(self, vector):
+        if not self.answers:
+            return None, 0.0
+        similarities, ids = self.index.search(vector.reshape(1, -1), 1)
+        if ids[0][0] == -1:
+            return None, 0.0
+        return self.answers[int(ids[0][0])], float(similarities[0][0])
+
+
+def _unit(embedding):
+    vector = np.array(embedding, dtype=np.float32).reshape(1, -1)
+    faiss.normalize_L2(vector)
+    return vector[0]
+
+
+class SemanticAnswerCache:
+    """
+    Answers to past questions, returned again for new questions that mean the same thing.
+
+    Every vector store version has its own inner-product index over the normalized embeddings
+    of the questions answered against it, so a hit is a question whose cosine similarity to a
+    past one reaches the threshold. Entries are appended to a Redis stream per version, which
+    a worker reads when it first sees the version and again, for the entries other workers
+    appended since, on a miss at most every refresh_seconds. The newest max_entries are kept.
+    """
+
+    def __init__(self, threshold, max_entries, ttl, max_versions, refresh_seconds):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_versions = max_versions
+        self.refresh_seconds = refresh_seconds
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.refreshes = 0
+        self.stored = 0
+        self.saved_seconds = 0.0
+
+    def key(self, store_key):
+        return f"acache:{store_key}"
+
+    async def _index(self, store_key, dimension):
+        with self._lock:
+            index = self._indexes.get(store_key)
+            if index is not None:
+                self._indexes.move_to_end(store_key)
+                return index
+
+        index = _AnswerIndex(dimension, self.max_entries)
+        await self._read(store_key, index)
+
+        with self._lock:
+            # Another request may have loaded the same version meanwhile, keep the first
+            index = self._indexes.setdefault(store_key, index)
+            self._indexes.move_to_end(store_key)
+            while len(self._indexes) > self.max_versions:
+                self._indexes.popitem(last=False)
+        return index
+
+    async def _read(self, store_key, index):
+        """
+        Add the stream entries appended since the index last read it.
+
+        :return: The number of answers added.
+        """
+        index.read_at = time.monotonic()
+        start = "-" if index.last_read is None else "(%d-%d" % index.last_read
+        try:
+            entries = await redis_client.xrange(self.key(store_key), start, "+")
+        except Exception as e:
+            logger.warning(f"Failed to read cached answers from Redis: {e}")
+            return 0
+
+        added = 0
+        with self._lock:
+            for entry_id, fields in entries:
+                entry_id = _stream_id(entry_id)
+                # A concurrent read may have added it already
+                if index.last_read is not None and entry_id <= index.last_read:
+                    continue
+                index.last_read = entry_id
+                if entry_id in index.written:
+                    continue
+                vector, answer, seconds = _unpack(fields[b"entry"])
+                if len(vector) == index.dimension:
+                    index.add(vector, answer, seconds)
+                    added += 1
+            if index.last_read is not None:
+                # Entries up to the last one read are never read again
+                index.written = {
+                    entry_id for entry_id in index.written if entry_id > index.last_read
+                }
+        return added
+
+    async def lookup(self, store_key, embedding):
+        """
+        Find the answer to a question similar enough to this one.
+
+        :param store_key: The cache key of the vector store version the question is asked
+            against, plus anything else the answer depends on.
+        :param embedding: The question embedding.
+        :return: The cached answer, or None.
+        """
+        start = time.perf_counter()
+        vector = _unit(embedding)
+        index = await self._index(store_key, len(vector))
+        with self._lock:
+            self.lookups += 1
+            entry, similarity = index.nearest(vector)
+        if (entry is None or similarity < self.threshold) and (
+            time.monotonic() - index.read_at >= self.refresh_seconds
+        ):
+            # Another worker may have answered it since
+            self.refreshes += 1
+            if await self._read(store_key, index):
+                with self._lock:
+                    entry, similarity = index.nearest(vector)
+        if entry is None or similarity < self.threshold:
+            return None
+        with self._lock:
+            answer, seconds = entry
+            self.hits += 1
+            self.saved_seconds += max(seconds - (time.perf_counter() - start), 0.0)
+        logger.info(f"Answered from the semantic cache, similarity {similarity:.3f}")
+        return answer
+
+    async def store(self, store_key, embedding, answer, seconds):
+        """
+        Remember the answer to a question.
+
+        :param store_key: See lookup.
+        :param embedding: The question embedding.
+        :param answer: The generated answer.
+        :param seconds: How long generating the answer took, reported as saved on later hits.
+        """
+        vector = _unit(embedding)
+        index = await self._index(store_key, len(vector))
+        with self._lock:
+            index.add(vector, answer, seconds)
+            self.stored += 1
+
+        key = self.key(store_key)
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.xadd(
+                key, {"entry": _pack(vector, answer, seconds)}, maxlen=self.max_entries
+            )
+            pipeline.expire(key, self.ttl)
+            entry_id, _ = await pipeline.execute()
+            with self._lock:
+                index.written.add(_stream_id(entry_id))
+        except Exception as e:
+            logger.warning(f"Failed to cache answer in Redis: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "versions": len(self._indexes),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "refreshes": self.refreshes,
+                "stored": self.stored,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+answer_cache = SemanticAnswerCache(
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_VERSIONS,
+    ANSWER_CACHE_REFRESH_SECONDS,
+)
+register_metrics("answer_cache", answer_cache.stats)
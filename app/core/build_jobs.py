@@ -0,0 +1,548 @@
+import hashlib
+import heapq
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from logging_config import logger
+from .config import (
+    redis_sync_client,
+    BUILD_JOB_BACKEND,
+    BUILD_JOB_WORKERS,
+    BUILD_JOB_TTL,
+    BUILD_JOB_LOCK_TIMEOUT,
+)
+from .metrics import register_metrics
+
+# Seconds between two progress updates written while a job is ingesting
+PROGRESS_INTERVAL = 1.0
+# A worker process refreshes its liveness key every HEARTBEAT_INTERVAL seconds, jobs taken by
+# a process whose key expired are queued again
+HEARTBEAT_INTERVAL = 10.0
+HEARTBEAT_TTL = 30
+# A job whose user already has a build running waits REQUEUE_DELAY seconds before it is taken
+# again, doubling every time up to REQUEUE_MAX_DELAY
+REQUEUE_DELAY = 1.0
+REQUEUE_MAX_DELAY = 30.0
+
+# Delete a lock only if it still holds our token, it may have expired and been taken since
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Extend a lock only if it still holds our token
+_EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Move the delayed jobs that are due to the queue
+_PROMOTE_DUE_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, 100)
+for _, job_id in ipairs(due) do
+    redis.call("zrem", KEYS[1], job_id)
+    redis.call("rpush", KEYS[2], job_id)
+end
+return #due
+"""
+
+job_stats = {"enqueued": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "recovered": 0}
+_stats_lock = threading.Lock()
+register_metrics("build_jobs", lambda: dict(job_stats))
+
+
+def _count(name):
+    with _stats_lock:
+        job_stats[name] += 1
+
+
+def dedup_key(user_email, pdf_list=None):
+    """
+    Return the key under which queued builds of the same user and selection are merged.
+
+    :param user_email: The email of the user.
+    :param pdf_list: The names of the PDFs to index, or None for all of them.
+    """
+    if pdf_list is None:
+        return f"{user_email}:all"
+    digest = hashlib.sha256(json.dumps(sorted(pdf_list)).encode("utf-8")).hexdigest()
+    return f"{user_email}:{digest[:16]}"
+
+
+def new_job(user_id, user_email, pdf_list=None):
+    """
+    Create the record of a queued vector store build.
+
+    :param user_id: The id of the user the vector store belongs to.
+    :param user_email: The email of the user.
+    :param pdf_list: The names of the PDFs to index, or None for all of them.
+    :return: The job dict.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "user_email": user_email,
+        "filenames": pdf_list,
+        "state": "queued",
+        "phase": None,
+        "progress": {},
+        "error": None,
+        "deferrals": 0,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+class InMemoryJobQueue:
+    """
+    Job queue kept in process, for a single API process and tests.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._jobs = {}
+        self._pending = {}
+        self._delayed = []
+        self._running_users = {}
+
+    def enqueue(self, job):
+        """
+        Queue a job unless the same build is already waiting.
+
+        :return: The queued job, or the one already waiting.
+        """
+        key = dedup_key(job["user_email"], job["filenames"])
+        with self._condition:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return dict(self._jobs[pending])
+            self._jobs[job["id"]] = dict(job)
+            self._pending[key] = job["id"]
+            self._queue.append(job["id"])
+            self._condition.notify()
+        return job
+
+    def dequeue(self, timeout):
+        """
+        Take the next job off the queue.
+
+        :return: The job, or None if none was queued within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._queue.append(heapq.heappop(self._delayed)[1])
+                if self._queue:
+                    return dict(self._jobs[self._queue.popleft()])
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self._delayed:
+                    wait = min(wait, self._delayed[0][0] - now)
+                self._condition.wait(wait)
+
+    def requeue(self, job, delay=0):
+        """Put a job taken off the queue back, to be taken again after delay seconds."""
+        with self._condition:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, job["id"]))
+            self._condition.notify()
+
+    def finish(self, job):
+        """Forget a job taken off the queue once it has run, nothing to do in process."""
+
+    def heartbeat(self):
+        """Nothing to do, the queue dies with its workers."""
+
+    def recover_stale(self):
+        """Nothing to do, the queue dies with its workers."""
+
+    def start(self, job):
+        """Mark a job as running, later builds of the same selection queue a new job."""
+        key = dedup_key(job["user_email"], job["filenames"])
+        with self._condition:
+            if self._pending.get(key) == job["id"]:
+                del self._pending[key]
+        self.update(job["id"], state="running", started_at=time.time())
+
+    def get(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self._condition:
+            self._jobs[job_id].update(fields)
+
+    def acquire_user(self, user_email):
+        """
+        Claim the right to build a user's vector store, one build per user at a time.
+
+        :return: A token to release the claim with, or None if another build holds it.
+        """
+        with self._condition:
+            if user_email in self._running_users:
+                return None
+            token = uuid.uuid4().hex
+            self._running_users[user_email] = token
+            return token
+
+    def release_user(self, user_email, token):
+        with self._condition:
+            if self._running_users.get(user_email) == token:
+                del self._running_users[user_email]
+
+
+class RedisJobQueue:
+    """
+    Job queue in Redis, shared by every API process.
+
+    Job ids wait in a list, job records are JSON strings expiring after ttl seconds, and
+    "pending" and "running" keys deduplicate queued builds and serialize builds of one user.
+    A job taken off the queue is moved atomically to a processing list of the taking process
+    until it has run, so if the process dies, recover_stale run by any other process puts the
+    job back on the queue. Jobs put back with a delay wait in a sorted set by due time. The user
+    locks held by a process are extended by its heartbeat, so they only expire lock_timeout
+    seconds after the process died. Needs Redis 6.2 or later for BLMOVE.
+    """
+
+    QUEUE_KEY = "build_jobs:queue"
+    DELAYED_KEY = "build_jobs:delayed"
+    PROCESSING_PREFIX = "build_jobs:processing:"
+
+    def __init__(self, client, ttl=BUILD_JOB_TTL, lock_timeout=BUILD_JOB_LOCK_TIMEOUT):
+        self.client = client
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.consumer_id = uuid.uuid4().hex
+        self._processing_key = f"{self.PROCESSING_PREFIX}{self.consumer_id}"
+        self._release_lock = client.register_script(_RELEASE_LOCK_SCRIPT)
+        self._extend_lock = client.register_script(_EXTEND_LOCK_SCRIPT)
+        self._promote_due = client.register_script(_PROMOTE_DUE_SCRIPT)
+        self._held_locks = {}
+        self._held_locks_lock = threading.Lock()
+
+    def _consumer_key(self, consumer_id):
+        return f"build_jobs:consumer:{consumer_id}"
+
+    def _running_key(self, user_email):
+        return f"build_jobs:running:{user_email}"
+
+    def _job_key(self, job_id):
+        return f"build_jobs:job:{job_id}"
+
+    def _pending_key(self, job):
+        return f"build_jobs:pending:{dedup_key(job['user_email'], job['filenames'])}"
+
+    def _save(self, job):
+        self.client.set(self._job_key(job["id"]), json.dumps(job), ex=self.ttl)
+
+    def enqueue(self, job):
+        """
+        Queue a job unless the same build is already waiting.
+
+        :return: The queued job, or the one already waiting.
+        """
+        # Save the record first, a concurrent request may read it as soon as the pending key exists
+        self._save(job)
+        pending_key = self._pending_key(job)
+        if not self.client.set(pending_key, job["id"], nx=True, ex=self.ttl):
+            existing = self.client.get(pending_key)
+            existing_job = self.get(existing.decode()) if existing else None
+            if existing_job is not None:
+                self.client.delete(self._job_key(job["id"]))
+                return existing_job
+            self.client.set(pending_key, job["id"], ex=self.ttl)
+        self.client.rpush(self.QUEUE_KEY, job["id"])
+        return job
+
+    def dequeue(self, timeout):
+        """
+        Take the next job off the queue.
+
+        :return: The job, or None if none was queued within timeout seconds.
+        """
+        self.heartbeat()
+        self._promote_due(keys=[self.DELAYED_KEY, self.QUEUE_KEY], args=[time.time()])
+        item = self.client.blmove(
+            self.QUEUE_KEY, self._processing_key, max(1, int(timeout)), "LEFT", "RIGHT"
+        )
+        if item is None:
+            return None
+        job = self.get(item.decode())
+        if job is None:
+            logger.warning(f"Dropping build job {item.decode()} whose record expired")
+            self.client.lrem(self._processing_key, 1, item)
+        return job
+
+    def requeue(self, job, delay=0):
+        """Put a job taken off the queue back, to be taken again after delay seconds."""
+        pipeline = self.client.pipeline()
+        pipeline.lrem(self._processing_key, 1, job["id"])
+        pipeline.zadd(self.DELAYED_KEY, {job["id"]: time.time() + delay})
+        pipeline.execute()
+
+    def finish(self, job):
+        """Drop a job from the processing list of this process once it has run."""
+        self.client.lrem(self._processing_key, 1, job["id"])
+
+    def heartbeat(self):
+        """
+        Mark this process alive, its processing list is left alone while it is, and extend
+        the user locks of the builds it is running.
+        """
+        self.client.set(self._consumer_key(self.consumer_id), "1", ex=HEARTBEAT_TTL)
+        with self._held_locks_lock:
+            held = list(self._held_locks.items())
+        for user_email, token in held:
+            if self._extend_lock(
+                keys=[self._running_key(user_email)], args=[token, self.lock_timeout]
+            ):
+                continue
+            with self._held_locks_lock:
+                # Unless the build just released it
+                lost = self._held_locks.get(user_email) == token
+            if lost:
+                logger.warning(f"Lost the build lock of {user_email}")
+
+    def recover_stale(self):
+        """
+        Queue again the jobs taken by processes that stopped sending heartbeats.
+
+        The jobs go to the front of the queue, and the user locks their builds held are
+        released so they can start at once.
+
+        :return: The number of jobs recovered.
+        """
+        recovered = 0
+        for key in self.client.scan_iter(match=f"{self.PROCESSING_PREFIX}*"):
+            consumer_id = key.decode()[len(self.PROCESSING_PREFIX) :]
+            if self.client.exists(self._consumer_key(consumer_id)):
+                continue
+            while True:
+                item = self.client.lmove(key, self.QUEUE_KEY, "RIGHT", "LEFT")
+                if item is None:
+                    break
+                job = self.get(item.decode())
+                if job is None:
+                    continue
+                running_key = self._running_key(job["user_email"])
+                lock = self.client.get(running_key)
+                if lock is not None and lock.decode().startswith(f"{consumer_id}:"):
+                    self._release_lock(keys=[running_key], args=[lock])
+                self.update(job["id"], state="queued", phase=None, started_at=None)
+                recovered += 1
+                logger.warning(
+                    f"Requeued build job {job['id']} for {job['user_email']}, "
+                    f"the process running it stopped"
+                )
+        return recovered
+
+    def start(self, job):
+        """Mark a job as running, later builds of the same selection queue a new job."""
+        pending_key = self._pending_key(job)
+        existing = self.client.get(pending_key)
+        if existing is not None and existing.decode() == job["id"]:
+            self.client.delete(pending_key)
+        self.update(job["id"], state="running", started_at=time.time())
+
+    def get(self, job_id):
+        data = self.client.get(self._job_key(job_id))
+        return json.loads(data) if data else None
+
+    def update(self, job_id, **fields):
+        # Only the worker running a job writes to it after it is queued
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self._save(job)
+
+    def acquire_user(self, user_email):
+        """
+        Claim the right to build a user's vector store, one build per user at a time.
+
+        :return: A token to release the claim with, or None if another build holds it.
+        """
+        # The token names this process, so its locks can be released if it dies
+        token = f"{self.consumer_id}:{uuid.uuid4().hex}"
+        if self.client.set(self._running_key(user_email), token, nx=True, ex=self.lock_timeout):
+            with self._held_locks_lock:
+                self._held_locks[user_email] = token
+            return token
+        return None
+
+    def release_user(self, user_email, token):
+        with self._held_locks_lock:
+            if self._held_locks.get(user_email) == token:
+                del self._held_locks[user_email]
+        self._release_lock(keys=[self._running_key(user_email)], args=[token])
+
+
+def get_job_queue():
+    """
+    Return the job queue for the configured backend.
+
+    :return: A RedisJobQueue, or an InMemoryJobQueue when BUILD_JOB_BACKEND is "memory".
+    """
+    if BUILD_JOB_BACKEND == "memory":
+        return InMemoryJobQueue()
+    return RedisJobQueue(redis_sync_client)
+
+
+class _ProgressReporter:
+    """Writes the phase and per-stage item counts of a running job, throttled while ingesting."""
+
+    def __init__(self, job_queue, job_id):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self._phase = None
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, phase, stats=None):
+        fields = {"phase": phase}
+        now = time.monotonic()
+        with self._lock:
+            # Phase changes are always written, repeated updates at most every interval
+            if phase == self._phase and now - self._last < PROGRESS_INTERVAL:
+                return
+            self._phase = phase
+            self._last = now
+        if stats is not None:
+            fields["progress"] = {name: values["items"] for name, values in stats.items()}
+        try:
+            self.job_queue.update(self.job_id, **fields)
+        except Exception as e:
+            logger.warning(f"Failed to record progress of build job {self.job_id}: {e}")
+
+
+class BuildJobWorkers:
+    """
+    Threads running queued vector store builds.
+
+    :param job_queue: The queue to take jobs from.
+    :param run_job: A function running a job, called with the job dict and a progress
+        function taking the current phase and the optional live pipeline stats.
+    :param workers: The number of jobs run at a time by this process.
+    """
+
+    def __init__(self, job_queue, run_job, workers=BUILD_JOB_WORKERS):
+        self.job_queue = job_queue
+        self.run_job = run_job
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"build-job-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(
+            threading.Thread(target=self._maintain, name="build-job-heartbeat", daemon=True)
+        )
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started {self.workers} build job workers")
+
+    def stop(self, timeout=None):
+        """Stop taking jobs and wait for the running ones to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _maintain(self):
+        """Keep this process marked alive, even while every worker runs a long build, and
+        recover the jobs of dead processes."""
+        while not self._stop.is_set():
+            try:
+                self.job_queue.heartbeat()
+                recovered = self.job_queue.recover_stale()
+                if recovered:
+                    with _stats_lock:
+                        job_stats["recovered"] += recovered
+            except Exception as e:
+                logger.warning(f"Failed to maintain the build job queue: {e}")
+            self._stop.wait(HEARTBEAT_INTERVAL)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.job_queue.dequeue(timeout=1)
+            except Exception as e:
+                logger.error(f"Failed to take a build job off the queue: {e}")
+                self._stop.wait(1)
+                continue
+            if job is None:
+                continue
+
+            token = self.job_queue.acquire_user(job["user_email"])
+            if token is None:
+                # Another build for this user is running, back off while it does
+                deferrals = job.get("deferrals", 0)
+                self.job_queue.update(job["id"], deferrals=deferrals + 1)
+                self.job_queue.requeue(
+                    job, min(REQUEUE_DELAY * 2**deferrals, REQUEUE_MAX_DELAY)
+                )
+                continue
+
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Failed to run build job {job['id']}: {e}")
+            finally:
+                self.job_queue.release_user(job["user_email"], token)
+                self.job_queue.finish(job)
+
+    def _run_job(self, job):
+        self.job_queue.start(job)
+        logger.info(f"Running build job {job['id']} for {job['user_email']}")
+        try:
+            self.run_job(job, _ProgressReporter(self.job_queue, job["id"]))
+        except Exception as e:
+            _count("failed")
+            logger.error(f"Build job {job['id']} for {job['user_email']} failed: {e}")
+            error = f"{e}: {e.__cause__}" if e.__cause__ is not None else str(e)
+            self.job_queue.update(
+                job["id"], state="failed", error=error, finished_at=time.time()
+            )
+            return
+
+        _count("succeeded")
+        self.job_queue.update(job["id"], state="succeeded", finished_at=time.time())
+        logger.info(f"Build job {job['id']} for {job['user_email']} succeeded")
+
+
+def enqueue_build(job_queue, user_id, user_email, pdf_list=None):
+    """
+    Queue a vector store build, merging it with an identical build still waiting.
+
+    :param job_queue: The queue to add the job to.
+    :param user_id: The id of the user the vector store belongs to.
+    :param user_email: The email of the user.
+    :param pdf_list: The names of the PDFs to index, or None for all of them.
+    :return: The job dict.
+    """
+    job = new_job(user_id, user_email, pdf_list)
+    queued = job_queue.enqueue(job)
+    if queued["id"] == job["id"]:
+        _count("enqueued")
+        logger.info(f"Queued build job {job['id']} for {user_email}")
+    else:
+        _count("deduplicated")
+        logger.info(f"Build for {user_email} already queued as job {queued['id']}")
+    return queued
+
+
+build_job_queue = get_job_queue()
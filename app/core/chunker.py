@@ -0,0 +1,169 @@
+from langchain_core.documents import Document
+from .config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_LENGTH_UNIT, OPENAI_EMBEDDING_MODEL
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class FastTextSplitter:
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter with its default separators.
+
+    Produces the same chunks, splitting on paragraphs, then lines, then words, then characters
+    and merging the pieces back up to chunk_size with chunk_overlap. It avoids the costs of the
+    LangChain splitter: separators are searched and split with str methods instead of regular
+    expressions, every piece is measured once, the merge window is a pair of indices instead of
+    a list copied on every overlap step, and runs without any separator are cut into windows
+    directly instead of character by character. Chunk metadata is copied shallowly, page
+    metadata only holds strings and numbers.
+
+    :param chunk_size: The maximum length of a chunk.
+    :param chunk_overlap: The length of text repeated between consecutive chunks.
+    :param length_function: The function measuring text, len by default, a token counter
+        makes the chunker token-aware.
+    """
+
+    def __init__(
+        self,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=DEFAULT_SEPARATORS,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.separators = tuple(separators)
+        self._join_length = length_function("")
+
+    def _merge(self, pieces, lengths, chunks):
+        """Merge consecutive pieces into chunks, keeping chunk_overlap of text between them."""
+        # Pieces keep their separators and are joined with "", which some token counters
+        # still measure as one token per join, as the LangChain splitter does
+        join_length = self._join_length
+        first = 0
+        total = 0
+        for i, length in enumerate(lengths):
+            added = length + (join_length if i > first else 0)
+            if total + added > self.chunk_size and i > first:
+                chunk = "".join(pieces[first:i]).strip()
+                if chunk:
+                    chunks.append(chunk)
+                while total > self.chunk_overlap or (
+                    total + added > self.chunk_size and total > 0
+                ):
+                    total -= lengths[first] + (join_length if i - first > 1 else 0)
+                    first += 1
+                    added = length + (join_length if i > first else 0)
+            total += added
+        chunk = "".join(pieces[first:]).strip()
+        if chunk:
+            chunks.append(chunk)
+
+    def _merge_characters(self, text, chunks):
+        """
+        Merge single characters the way _merge would, computing the windows arithmetically.
+
+        Every character measures 1, so the windows are chunk_size long and start every
+        chunk_size - chunk_overlap characters, at least one.
+        """
+        step = max(1, self.chunk_size - self.chunk_overlap)
+        start = 0
+        while start + self.chunk_size < len(text):
+            chunk = text[start : start + self.chunk_size].strip()
+            if chunk:
+                chunks.append(chunk)
+            start += step
+        chunk = text[start:].strip()
+        if chunk:
+            chunks.append(chunk)
+
+    def _split(self, text, separators, chunks):
+        separator = separators[-1]
+        remaining = ()
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = ""
+                break
+            if candidate in text:
+                separator = candidate
+                remaining = separators[i + 1 :]
+                break
+
+        if not separator and self.length_function is len and self.chunk_size > 1:
+            self._merge_characters(text, chunks)
+            return
+        if separator:
+            parts = text.split(separator)
+            # Separators stay at the start of the piece that follows them
+            pieces = [parts[0]] if parts[0] else []
+            pieces.extend(separator + part for part in parts[1:])
+        else:
+            pieces = list(text)
+
+        lengths = list(map(self.length_function, pieces))
+        if not lengths or max(lengths) < self.chunk_size:
+            self._merge(pieces, lengths, chunks)
+            return
+
+        good, good_lengths = [], []
+        for piece, length in zip(pieces, lengths):
+            if length < self.chunk_size:
+                good.append(piece)
+                good_lengths.append(length)
+                continue
+            if good:
+                self._merge(good, good_lengths, chunks)
+                good, good_lengths = [], []
+            if remaining:
+                self._split(piece, remaining, chunks)
+            else:
+                chunks.append(piece)
+        if good:
+            self._merge(good, good_lengths, chunks)
+
+    def split_text(self, text):
+        """
+        Split a text into chunks.
+
+        :param text: The text to split.
+        :return: The list of chunks.
+        """
+        chunks = []
+        self._split(text, self.separators, chunks)
+        return chunks
+
+    def iter_split_documents(self, documents):
+        """
+        Split documents into chunks lazily, one document at a time.
+
+        :param documents: An iterable of Documents, typically the pages of PDFs.
+        :return: An iterator of chunk Documents carrying the metadata of their page.
+        """
+        for document in documents:
+            for chunk in self.split_text(document.page_content):
+                yield Document(page_content=chunk, metadata=dict(document.metadata))
+
+    def split_documents(self, documents):
+        return list(self.iter_split_documents(documents))
+
+
+def get_chunker(unit=CHUNK_LENGTH_UNIT):
+    """
+    Return the chunker used at ingestion.
+
+    :param unit: "chars" to measure chunks in characters, "tokens" to measure them in tokens
+        of the OpenAI embedding model.
+    :return: A FastTextSplitter.
+    """
+    if unit == "tokens":
+        from .embedding_scheduler import get_token_counter
+
+        return FastTextSplitter(length_function=get_token_counter(OPENAI_EMBEDDING_MODEL))
+    if unit != "chars":
+        raise ValueError(f"Unknown chunk length unit {unit}, expected chars or tokens")
+    return FastTextSplitter()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from redis import Redis
 import aioredis
 from dotenv import load_dotenv
@@ -10,6 +11,8 @@ redis_host = os.getenv("REDIS_HOST", "localhost")
 redis_port = int(os.getenv("REDIS_PORT", 6379))
 # redis_client = Redis(host=redis_host, port=redis_port, db=0)
 redis_client = aioredis.from_url(f"redis://{redis_host}:{redis_port}", decode_responses=False)
+# Blocking client for the sync code paths (vector store builds)
+redis_sync_client = Redis(host=redis_host, port=redis_port, db=0)
 
 AGENT_SERVICE_URL = os.getenv("AGENT_SERVICE_URL")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
@@ -17,6 +20,108 @@ DATA_FOLDER = "data"
 RESOURCE_FOLDER = "resources"
 VECTOR_STORE_FOLDER = "vectorStore"
 
+# In-process cache of deserialized vector stores (per worker)
+VECTOR_CACHE_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+VECTOR_CACHE_TTL = int(os.getenv("VECTOR_CACHE_TTL", 3600))
+# Local disk tier between the worker cache and Redis/GCS, point it at local SSD when available
+VECTOR_DISK_CACHE_DIR = os.getenv(
+    "VECTOR_DISK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "vectorstore_cache")
+)
+VECTOR_DISK_CACHE_MAX_BYTES = int(
+    os.getenv("VECTOR_DISK_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+)
+# How long a resolved vector store version is trusted before GCS is checked again
+VECTOR_STORE_VERSION_TTL = int(os.getenv("VECTOR_STORE_VERSION_TTL", 3600))
+# Upper bound on how long other workers wait for the one loading a vector store from GCS
+VECTOR_STORE_LOAD_LOCK_TIMEOUT = int(os.getenv("VECTOR_STORE_LOAD_LOCK_TIMEOUT", 30))
+# FAISS index built for new vector stores: flat, ivf_flat, ivf_pq, sq8 or hnsw
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+# JSON object mapping a user email or "@domain" to an index type, e.g. {"@uni.edu": "ivf_pq"}
+VECTOR_INDEX_TENANT_TYPES = os.getenv("VECTOR_INDEX_TENANT_TYPES", "{}")
+# Below this many chunks a flat index is used whatever the configured type
+VECTOR_INDEX_TRAIN_THRESHOLD = int(os.getenv("VECTOR_INDEX_TRAIN_THRESHOLD", 10000))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", 16))
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", 64))
+# Retrieval: "hybrid" fuses BM25 and dense rankings with reciprocal rank fusion, "dense" only
+# searches the FAISS index. Each ranking contributes its top RETRIEVAL_FETCH_K chunks
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", 20))
+RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", 60))
+# Chat context selection trades relevance against redundancy with maximal marginal relevance,
+# 1 keeps the plain top results, lower values favour chunks unlike those already picked
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", 0.5))
+# Most queries accepted by one /query/search/batch request
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", 64))
+# Embedding backend: "openai" in production, "local" for CPU inference, "deterministic" for offline runs
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# JSON object mapping a user email or "@domain" to an embedding backend, e.g. {"@uni.edu": "local"}
+EMBEDDING_TENANT_BACKENDS = os.getenv("EMBEDDING_TENANT_BACKENDS", "{}")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", 1536))
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+# Local CPU embeddings: model, runtime (torch, int8 or onnx), threads (0 for the library default)
+# and the batch size and wait used to coalesce concurrent queries
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "int8")
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0))
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 64))
+LOCAL_EMBEDDING_MAX_WAIT_MS = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", 5))
+
+# Ingestion embedding requests: batch bounds, parallelism and the account rate limits
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", 50000))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 2048))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+# Where the per minute limits are tracked: "redis", shared by every process, or "memory" for
+# a single process
+EMBEDDING_RATE_LIMITER = os.getenv("EMBEDDING_RATE_LIMITER", "redis")
+
+# Query embeddings cached in process and in Redis
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 10000))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 7 * 24 * 3600))
+# Retrieval results, chunk labels and scores per vector store version and query, cached in
+# process and in Redis
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 10000))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", 24 * 3600))
+# Opt-in cache of /query/chat answers, reused for a question without chat history whose
+# embedding reaches ANSWER_CACHE_THRESHOLD cosine similarity to one already answered against
+# the same vector store version. ANSWER_CACHE_SIZE answers are kept per version, for
+# ANSWER_CACHE_VERSIONS versions in each worker, which on a miss picks up the answers of the
+# other workers at most every ANSWER_CACHE_REFRESH_SECONDS
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1000))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+ANSWER_CACHE_VERSIONS = int(os.getenv("ANSWER_CACHE_VERSIONS", 64))
+ANSWER_CACHE_REFRESH_SECONDS = float(os.getenv("ANSWER_CACHE_REFRESH_SECONDS", 5))
+# Summary and graph responses cached by model, prompt template and input text
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))
+
+# PDF parsing processes (0 for one per CPU) and the page range handed to each task
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", 0))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 32))
+# Chunk size and overlap, measured in characters or, with "tokens", embedding model tokens
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))
+CHUNK_LENGTH_UNIT = os.getenv("CHUNK_LENGTH_UNIT", "chars")
+# Items buffered between ingestion pipeline stages and chunks embedded per pipeline batch
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", 4))
+INGESTION_EMBED_BATCH_SIZE = int(os.getenv("INGESTION_EMBED_BATCH_SIZE", 256))
+# Vector store builds run as background jobs: "redis" queue shared by every API process, or
+# "memory" for a single process and tests
+BUILD_JOB_BACKEND = os.getenv("BUILD_JOB_BACKEND", "redis")
+BUILD_JOB_WORKERS = int(os.getenv("BUILD_JOB_WORKERS", 2))
+# How long job statuses are kept, and the longest a build may hold its user's lock
+BUILD_JOB_TTL = int(os.getenv("BUILD_JOB_TTL", 24 * 3600))
+BUILD_JOB_LOCK_TIMEOUT = int(os.getenv("BUILD_JOB_LOCK_TIMEOUT", 3600))
+
+# Chunk embeddings shared across rebuilds and users, 0 keeps them until Redis evicts them
+CHUNK_EMBEDDING_CACHE_TTL = int(os.getenv("CHUNK_EMBEDDING_CACHE_TTL", 30 * 24 * 3600))
+# float32, or float16 to halve the memory at a small loss of precision
+CHUNK_EMBEDDING_CACHE_DTYPE = os.getenv("CHUNK_EMBEDDING_CACHE_DTYPE", "float32")
+
 qa_system_template = """
 You are a question answering bot. You have access to a database of documents and can provide answers to questions based on the information in the documents.
 below context is provided for the user to get the best possible answer for the question.
@@ -0,0 +1,191 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+import faiss
+from logging_config import logger
+from .config import VECTOR_DISK_CACHE_DIR, VECTOR_DISK_CACHE_MAX_BYTES
+from .metrics import register_metrics
+
+# Zero-copy mapping of flat codes is only available in newer FAISS releases
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+# Staging directories untouched this long were left behind by a process that died mid-write
+STAGING_MAX_AGE = 3600
+STAGING_PREFIX = ".staging-"
+
+
+def read_index_mmap(index_path):
+    """
+    Read a FAISS index through memory-mapped I/O, falling back to a regular read.
+
+    :param index_path: The path to the index.faiss file.
+    :return: The FAISS index.
+    """
+    try:
+        return faiss.read_index(str(index_path), MMAP_FLAGS)
+    except RuntimeError as e:
+        logger.warning(f"Memory-mapped read of {index_path} failed, reading it fully: {e}")
+        return faiss.read_index(str(index_path))
+
+
+def _last_modified(path):
+    latest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return latest
+
+
+def _directory_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for filename in files:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return size
+
+
+class VectorStoreDiskCache:
+    """
+    Size-bounded directory of vector store files shared by the workers on one machine.
+
+    Every entry is a directory holding the files of one vector store version. Entries are
+    published with an atomic rename and evicted least recently used first. Staging
+    directories left behind by dead processes are removed at startup and whenever the budget
+    is enforced, once they are STAGING_MAX_AGE seconds old.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_staging = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_stale_staging()
+
+    def path_for(self, key):
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest()[:32])
+
+    def get(self, key):
+        """
+        Return the directory holding a cached vector store and mark it recently used.
+
+        :param key: The cache key.
+        :return: The directory path, or None if the key is not cached.
+        """
+        path = self.path_for(key)
+        if os.path.exists(os.path.join(path, "index.faiss")):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def staging(self):
+        """
+        Create a temporary directory on the cache filesystem so entries can be renamed into place.
+        """
+        return tempfile.TemporaryDirectory(dir=self.root, prefix=STAGING_PREFIX)
+
+    def put_dir(self, key, source_dir):
+        """
+        Move a directory of vector store files into the cache.
+
+        :param key: The cache key.
+        :param source_dir: A directory created inside a staging() directory.
+        :return: The path of the cached entry.
+        """
+        path = self.path_for(key)
+        try:
+            os.replace(source_dir, path)
+        except OSError:
+            # Another worker published the same version first
+            logger.info(f"Vectorstore {key} is already on the disk cache")
+        self._enforce_budget(keep=path)
+        return path
+
+    def put_files(self, key, files):
+        """
+        Write vector store files held in memory into the cache.
+
+        :param key: The cache key.
+        :param files: A dict mapping file names to their bytes.
+        :return: The path of the cached entry.
+        """
+        with self.staging() as staging_dir:
+            entry_dir = os.path.join(staging_dir, "entry")
+            os.makedirs(entry_dir)
+            for filename, data in files.items():
+                with open(os.path.join(entry_dir, filename), "wb") as f:
+                    f.write(data)
+            return self.put_dir(key, entry_dir)
+
+    def _remove_stale_staging(self):
+        # A writer still running keeps adding files, so its directory has recent changes
+        cutoff = time.time() - STAGING_MAX_AGE
+        for name in os.listdir(self.root):
+            if not name.startswith(STAGING_PREFIX):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if _last_modified(path) > cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            self.stale_staging += 1
+            logger.info(f"Removed stale staging directory {path} from the vectorstore disk cache")
+
+    def _enforce_budget(self, keep):
+        with self._lock:
+            self._remove_stale_staging()
+            entries = []
+            for name in os.listdir(self.root):
+                if name.startswith(STAGING_PREFIX):
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    entries.append((os.path.getmtime(path), _directory_size(path), path))
+                except OSError:
+                    continue
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                # Open memory maps stay valid after the files are unlinked
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+                logger.info(f"Evicted {path} from the vectorstore disk cache")
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_staging": self.stale_staging,
+        }
+
+
+vector_store_disk_cache = VectorStoreDiskCache(
+    VECTOR_DISK_CACHE_DIR, VECTOR_DISK_CACHE_MAX_BYTES
+)
+register_metrics("vector_store_disk_cache", vector_store_disk_cache.stats)
@@ -0,0 +1,338 @@
+import os
+import json
+import mmap
+import pickle
+import shutil
+import struct
+from collections.abc import MutableMapping
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILENAME = "index.docs"
+LEGACY_DOCSTORE_FILENAME = "index.pkl"
+
+MAGIC = b"VSDOCS01"
+_HEADER_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 8
+
+
+def _align(position):
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _pack_prefix(count, metadata_table, section_lengths):
+    """
+    Build the magic, header and padding that precede the sections of a compact docstore.
+
+    :return: A tuple of (prefix bytes, section offsets relative to the end of the prefix).
+    """
+    layout = {}
+    position = 0
+    for name, length in section_lengths:
+        layout[name] = [position, length]
+        position = _align(position + length)
+
+    header = json.dumps(
+        {"count": count, "metadata": list(metadata_table), "sections": layout}
+    ).encode("utf-8")
+    start = _align(len(MAGIC) + _HEADER_LENGTH.size + len(header))
+
+    prefix = bytearray(start)
+    prefix[: len(MAGIC)] = MAGIC
+    _HEADER_LENGTH.pack_into(prefix, len(MAGIC), len(header))
+    prefix[len(MAGIC) + _HEADER_LENGTH.size : len(MAGIC) + _HEADER_LENGTH.size + len(header)] = header
+    return bytes(prefix), layout
+
+
+def serialize_docstore(docstore, index_to_docstore_id):
+    """
+    Serialize a docstore into the compact columnar format.
+
+    Chunk texts are concatenated into one UTF-8 blob addressed by an offset array, and the
+    chunk metadata is dictionary encoded into a small table. Documents are re-keyed by their
+    FAISS label, so the docstore id of every chunk becomes str(label).
+
+    :param docstore: Any LangChain docstore holding the chunks.
+    :param index_to_docstore_id: The mapping from FAISS labels to docstore ids.
+    :return: The serialized docstore bytes.
+    """
+    labels = np.array(sorted(int(label) for label in index_to_docstore_id), dtype=np.int64)
+    offsets = np.zeros(len(labels) + 1, dtype=np.uint64)
+    codes = np.empty(len(labels), dtype=np.uint32)
+    metadata_table = {}
+    texts = []
+
+    position = 0
+    for row, label in enumerate(labels):
+        doc = docstore.search(index_to_docstore_id[int(label)])
+        if not isinstance(doc, Document):
+            raise ValueError(f"Could not find document for label {label}: {doc}")
+        text = doc.page_content.encode("utf-8")
+        texts.append(text)
+        position += len(text)
+        offsets[row + 1] = position
+        metadata = json.dumps(doc.metadata, sort_keys=True, default=str)
+        codes[row] = metadata_table.setdefault(metadata, len(metadata_table))
+
+    sections = [("labels", labels.tobytes()), ("offsets", offsets.tobytes()), ("codes", codes.tobytes())]
+    sections.append(("text", b"".join(texts)))
+
+    prefix, layout = _pack_prefix(
+        len(labels), metadata_table, [(name, len(data)) for name, data in sections]
+    )
+    out = bytearray(len(prefix) + _align(sum(_align(len(data)) for _, data in sections)))
+    out[: len(prefix)] = prefix
+    for name, data in sections:
+        offset = len(prefix) + layout[name][0]
+        out[offset : offset + len(data)] = data
+    return bytes(out)
+
+
+class CompactDocstoreWriter:
+    """
+    Write a compact docstore file one document at a time.
+
+    Only the label, offset and metadata code arrays are held in memory, chunk texts are
+    spooled to a temporary file next to the output until close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._text_file = open(f"{path}.text", "wb+")
+        self._labels = []
+        self._offsets = [0]
+        self._codes = []
+        self._metadata_table = {}
+
+    def add(self, label, document):
+        """
+        Append a document. Labels must be added in increasing order.
+
+        :param label: The FAISS label of the document.
+        :param document: The Document.
+        """
+        if self._labels and label <= self._labels[-1]:
+            raise ValueError(f"Label {label} added after {self._labels[-1]}")
+        text = document.page_content.encode("utf-8")
+        self._text_file.write(text)
+        self._labels.append(label)
+        self._offsets.append(self._offsets[-1] + len(text))
+        metadata = json.dumps(document.metadata, sort_keys=True, default=str)
+        self._codes.append(self._metadata_table.setdefault(metadata, len(self._metadata_table)))
+
+    def close(self):
+        """Write the docstore file and remove the spooled texts."""
+        sections = [
+            ("labels", np.array(self._labels, dtype=np.int64).tobytes()),
+            ("offsets", np.array(self._offsets, dtype=np.uint64).tobytes()),
+            ("codes", np.array(self._codes, dtype=np.uint32).tobytes()),
+        ]
+        text_length = self._offsets[-1]
+        prefix, layout = _pack_prefix(
+            len(self._labels),
+            self._metadata_table,
+            [(name, len(data)) for name, data in sections] + [("text", text_length)],
+        )
+
+        with open(self.path, "wb") as out:
+            out.write(prefix)
+            for name, data in sections:
+                out.seek(len(prefix) + layout[name][0])
+                out.write(data)
+            out.seek(len(prefix) + layout["text"][0])
+            self._text_file.seek(0)
+            shutil.copyfileobj(self._text_file, out)
+            out.write(b"\0" * (_align(text_length) - text_length))
+
+        self._text_file.close()
+        os.remove(self._text_file.name)
+
+
+def is_compact_docstore(data):
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def docstore_filename(data):
+    """Return the file name a serialized docstore is stored under."""
+    return DOCSTORE_FILENAME if is_compact_docstore(data) else LEGACY_DOCSTORE_FILENAME
+
+
+def load_docstore(data):
+    """
+    Load a docstore from compact bytes, falling back to the pickled InMemoryDocstore format.
+
+    :param data: A bytes-like object or mmap holding the serialized docstore.
+    :return: A tuple of (docstore, index_to_docstore_id).
+    """
+    if is_compact_docstore(data):
+        docstore = CompactDocstore(data)
+        return docstore, docstore.index_to_docstore_id
+    return pickle.loads(data)
+
+
+def load_docstore_file(db_path):
+    """
+    Load the docstore saved next to index.faiss, memory-mapping the compact format.
+
+    :param db_path: The directory holding the vector store files.
+    :return: A tuple of (docstore, index_to_docstore_id).
+    :raises FileNotFoundError: If neither docstore file exists.
+    """
+    compact_path = os.path.join(db_path, DOCSTORE_FILENAME)
+    if os.path.exists(compact_path):
+        with open(compact_path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return load_docstore(data)
+
+    with open(os.path.join(db_path, LEGACY_DOCSTORE_FILENAME), "rb") as f:
+        return pickle.load(f)
+
+
+def find_docstore_file(db_path):
+    """Return the path of the docstore file in a vector store directory, or None."""
+    for filename in (DOCSTORE_FILENAME, LEGACY_DOCSTORE_FILENAME):
+        path = os.path.join(db_path, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    Read-optimised docstore over the compact columnar format.
+
+    Only the offset, label and metadata code arrays are touched on load; a Document is
+    materialised when search() is called for it, which FAISS does for the top-k hits only.
+    Documents added or deleted after loading are kept in an overlay until re-serialized.
+    """
+
+    def __init__(self, data):
+        (header_length,) = _HEADER_LENGTH.unpack_from(data, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(bytes(data[header_start : header_start + header_length]))
+        start = _align(header_start + header_length)
+        count = header["count"]
+
+        def section(name):
+            offset, length = header["sections"][name]
+            return start + offset, length
+
+        offset, _ = section("labels")
+        self._labels = np.frombuffer(data, dtype=np.int64, count=count, offset=offset)
+        offset, _ = section("offsets")
+        self._offsets = np.frombuffer(data, dtype=np.uint64, count=count + 1, offset=offset)
+        offset, _ = section("codes")
+        self._codes = np.frombuffer(data, dtype=np.uint32, count=count, offset=offset)
+        offset, length = section("text")
+        self._text = memoryview(data)[offset : offset + length]
+
+        self._metadata_table = header["metadata"]
+        self._parsed_metadata = {}
+        self._contiguous = count == 0 or int(self._labels[-1] - self._labels[0]) + 1 == count
+        self._added = {}
+        self._deleted = set()
+        self.nbytes = len(data)
+        self.index_to_docstore_id = LabelMapping(self)
+
+    def __len__(self):
+        return len(self._labels) - len(self._deleted) + len(self._added)
+
+    def _row(self, label):
+        count = len(self._labels)
+        if count == 0:
+            return None
+        if self._contiguous:
+            row = label - int(self._labels[0])
+            return row if 0 <= row < count else None
+        row = int(np.searchsorted(self._labels, label))
+        if row < count and int(self._labels[row]) == label:
+            return row
+        return None
+
+    def _document(self, row):
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        code = int(self._codes[row])
+        if code not in self._parsed_metadata:
+            self._parsed_metadata[code] = json.loads(self._metadata_table[code])
+        return Document(
+            page_content=str(self._text[start:end], "utf-8"),
+            metadata=dict(self._parsed_metadata[code]),
+        )
+
+    def search(self, search):
+        if search in self._added:
+            return self._added[search]
+        if search in self._deleted:
+            return f"ID {search} not found."
+        try:
+            row = self._row(int(search))
+        except ValueError:
+            row = None
+        if row is None:
+            return f"ID {search} not found."
+        return self._document(row)
+
+    def add(self, texts):
+        overlapping = [_id for _id in texts if not isinstance(self.search(_id), str)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {set(overlapping)}")
+        for _id, doc in texts.items():
+            self._deleted.discard(_id)
+            self._added[_id] = doc
+
+    def delete(self, ids):
+        for _id in ids:
+            if _id in self._added:
+                del self._added[_id]
+            elif isinstance(self.search(_id), str):
+                raise ValueError(f"Tried to delete ids that does not exist: {_id}")
+            else:
+                self._deleted.add(_id)
+
+
+class LabelMapping(MutableMapping):
+    """
+    Lazy FAISS label to docstore id mapping for a CompactDocstore.
+
+    Stored labels map to str(label) without building a dict; assignments made after loading are
+    kept in an overlay.
+    """
+
+    def __init__(self, docstore):
+        self._docstore = docstore
+        self._extra = {}
+        self._removed = set()
+
+    def __getitem__(self, label):
+        label = int(label)
+        if label in self._extra:
+            return self._extra[label]
+        if label not in self._removed and self._docstore._row(label) is not None:
+            return str(label)
+        raise KeyError(label)
+
+    def __setitem__(self, label, docstore_id):
+        label = int(label)
+        self._removed.discard(label)
+        self._extra[label] = docstore_id
+
+    def __delitem__(self, label):
+        label = int(label)
+        if label in self._extra:
+            del self._extra[label]
+        elif label not in self._removed and self._docstore._row(label) is not None:
+            self._removed.add(label)
+        else:
+            raise KeyError(label)
+
+    def __iter__(self):
+        for label in self._docstore._labels:
+            label = int(label)
+            if label not in self._removed and label not in self._extra:
+                yield label
+        yield from self._extra
+
+    def __len__(self):
+        base = len(self._docstore._labels) - len(self._removed)
+        return base + sum(1 for label in self._extra if self._docstore._row(label) is None)
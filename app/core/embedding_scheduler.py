@@ -0,0 +1,375 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import openai
+from langchain_core.embeddings import Embeddings
+from logging_config import logger
+from .config import (
+    redis_sync_client,
+    OPENAI_EMBEDDING_MODEL,
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RATE_LIMITER,
+)
+from .metrics import register_metrics
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Roughly four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+scheduler_stats = {
+    "runs": 0,
+    "chunks": 0,
+    "tokens": 0,
+    "batches": 0,
+    "retries": 0,
+    "seconds": 0.0,
+    "last_chunks_per_sec": 0.0,
+}
+_stats_lock = threading.Lock()
+register_metrics("embedding_scheduler", lambda: dict(scheduler_stats))
+
+
+def get_token_counter(model):
+    """
+    Return a function counting the tokens of a text for an embedding model.
+
+    tiktoken downloads its encodings on first use, when that fails the count is estimated from
+    the text length so ingestion still works offline.
+
+    :param model: The name of the embedding model.
+    :return: A function mapping a text to its number of tokens.
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"tiktoken is unavailable, estimating token counts: {e}")
+        return lambda text: len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(token_counts, max_tokens, max_size):
+    """
+    Pack texts, in order, into batches bounded by a token budget and a number of inputs.
+
+    A text larger than the budget gets a batch of its own.
+
+    :param token_counts: The number of tokens of every text.
+    :param max_tokens: The maximum number of tokens per batch.
+    :param max_size: The maximum number of texts per batch.
+    :return: A list of (start, end) index ranges.
+    """
+    batches = []
+    start, tokens = 0, 0
+    for i, count in enumerate(token_counts):
+        if i > start and (tokens + count > max_tokens or i - start >= max_size):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount):
+        """
+        Block until amount tokens are available and take them.
+
+        :param amount: The number of tokens, capped at the bucket capacity.
+        :return: The number of seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Refill and take tokens atomically, with the Redis server clock so every process agrees.
+# Returns the seconds to wait before retrying, 0 once the tokens are taken.
+_ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket kept in Redis, so every process embedding for the account draws from it.
+
+    Falls back to a bucket of this process alone while Redis is unreachable, trying Redis
+    again after REDIS_RETRY_SECONDS.
+    """
+
+    REDIS_RETRY_SECONDS = 30.0
+
+    def __init__(self, client, key, per_minute, capacity=None):
+        self.key = key
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._fallback = TokenBucket(per_minute, capacity)
+        self._redis_retry_at = 0.0
+
+    def acquire(self, amount):
+        """
+        Block until amount tokens are available and take them, see TokenBucket.acquire.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            if time.monotonic() < self._redis_retry_at:
+                return waited + self._fallback.acquire(amount)
+            try:
+                delay = float(
+                    self._acquire(keys=[self.key], args=[self.rate, self.capacity, amount])
+                )
+            except Exception as e:
+                logger.warning(f"Failed to rate limit through Redis, limiting in process: {e}")
+                self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+                return waited + self._fallback.acquire(amount)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+_shared_buckets = {}
+_shared_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name, per_minute):
+    """
+    Return the bucket every scheduler of this process uses for a rate limit.
+
+    With EMBEDDING_RATE_LIMITER "redis" the bucket lives in Redis and is shared by every
+    process as well, so concurrent builds together stay under the account limits.
+
+    :param name: The name of the limit, such as "<model>:tokens".
+    :param per_minute: The limit per minute.
+    :return: A TokenBucket or RedisTokenBucket.
+    """
+    with _shared_buckets_lock:
+        bucket = _shared_buckets.get((name, per_minute))
+        if bucket is None:
+            if EMBEDDING_RATE_LIMITER == "redis":
+                bucket = RedisTokenBucket(
+                    redis_sync_client, f"embedding_rate:{name}", per_minute
+                )
+            else:
+                bucket = TokenBucket(per_minute)
+            _shared_buckets[(name, per_minute)] = bucket
+        return bucket
+
+
+def _retry_delay(error, attempt):
+    """Honour Retry-After when the server sends it, else back off exponentially with full jitter."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 0.1)
+            except ValueError:
+                pass
+    return random.uniform(0, min(30.0, 0.5 * 2**attempt))
+
+
+class EmbeddingScheduler:
+    """
+    Embeds texts in token-packed batches sent concurrently under tokens and requests per
+    minute limits, retrying rate-limited and transient failures.
+
+    The limits are enforced by the token_bucket and request_bucket given, see shared_bucket,
+    or by buckets private to the scheduler.
+    """
+
+    def __init__(
+        self,
+        embed_batch,
+        count_tokens,
+        max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        concurrency=EMBEDDING_CONCURRENCY,
+        tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+        requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        token_bucket=None,
+        request_bucket=None,
+    ):
+        self.embed_batch = embed_batch
+        self.count_tokens = count_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.token_bucket = token_bucket or TokenBucket(tokens_per_minute)
+        self.request_bucket = request_bucket or TokenBucket(requests_per_minute)
+
+    def _run_batch(self, texts, tokens):
+        retries = 0
+        while True:
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(tokens)
+            try:
+                return self.embed_batch(texts), retries
+            except RETRYABLE_ERRORS as e:
+                if retries >= self.max_retries:
+                    raise
+                delay = _retry_delay(e, retries)
+                retries += 1
+                logger.warning(
+                    f"Embedding batch of {len(texts)} texts failed ({type(e).__name__}), "
+                    f"retry {retries} in {delay:.2f}s"
+                )
+                time.sleep(delay)
+
+    def embed(self, texts):
+        """
+        Embed texts, keeping their order.
+
+        :param texts: The texts to embed.
+        :return: The list of embeddings.
+        """
+        if not texts:
+            return []
+
+        start_time = time.perf_counter()
+        token_counts = [self.count_tokens(text) for text in texts]
+        # Small inputs are still spread over every concurrent request
+        batch_tokens = min(
+            self.max_batch_tokens, max(1, -(-sum(token_counts) // self.concurrency))
+        )
+        batches = pack_batches(token_counts, batch_tokens, self.max_batch_size)
+
+        results = [None] * len(texts)
+        retries = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                (
+                    start,
+                    executor.submit(
+                        self._run_batch, texts[start:end], sum(token_counts[start:end])
+                    ),
+                )
+                for start, end in batches
+            ]
+            for start, future in futures:
+                vectors, batch_retries = future.result()
+                results[start : start + len(vectors)] = vectors
+                retries += batch_retries
+
+        seconds = time.perf_counter() - start_time
+        chunks_per_sec = len(texts) / seconds if seconds else 0.0
+        with _stats_lock:
+            scheduler_stats["runs"] += 1
+            scheduler_stats["chunks"] += len(texts)
+            scheduler_stats["tokens"] += sum(token_counts)
+            scheduler_stats["batches"] += len(batches)
+            scheduler_stats["retries"] += retries
+            scheduler_stats["seconds"] += seconds
+            scheduler_stats["last_chunks_per_sec"] = chunks_per_sec
+        logger.info(
+            f"Embedded {len(texts)} chunks in {len(batches)} batches and {seconds:.2f}s "
+            f"({chunks_per_sec:.1f} chunks/sec, {retries} retries)"
+        )
+        return results
+
+
+class ScheduledOpenAIEmbeddings(Embeddings):
+    """
+    OpenAI embeddings whose documents are embedded through an EmbeddingScheduler.
+
+    Every instance for a model shares its rate limits, see shared_bucket, unless
+    shared_rate_limits is False. The client honours OPENAI_BASE_URL, so the scheduler can be
+    pointed at a local fake server.
+    """
+
+    def __init__(
+        self, model=OPENAI_EMBEDDING_MODEL, shared_rate_limits=True, **scheduler_options
+    ):
+        self.model = model
+        # Retries are left to the scheduler
+        self.client = openai.OpenAI(max_retries=0)
+        if shared_rate_limits:
+            scheduler_options.setdefault(
+                "token_bucket",
+                shared_bucket(
+                    f"{model}:tokens",
+                    scheduler_options.get("tokens_per_minute", EMBEDDING_TOKENS_PER_MINUTE),
+                ),
+            )
+            scheduler_options.setdefault(
+                "request_bucket",
+                shared_bucket(
+                    f"{model}:requests",
+                    scheduler_options.get("requests_per_minute", EMBEDDING_REQUESTS_PER_MINUTE),
+                ),
+            )
+        self.scheduler = EmbeddingScheduler(
+            self._embed_batch, get_token_counter(model), **scheduler_options
+        )
+
+    def _embed_batch(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed_documents(self, texts):
+        return self.scheduler.embed(list(texts))
+
+    def embed_query(self, text):
+        return self.scheduler.embed([text])[0]
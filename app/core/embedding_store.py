@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from logging_config import logger
+from .config import (
+    redis_sync_client,
+    CHUNK_EMBEDDING_CACHE_TTL,
+    CHUNK_EMBEDDING_CACHE_DTYPE,
+)
+from .embeddings import embedding_model_name
+from .metrics import register_metrics
+
+# Keys fetched or written per Redis round trip
+REDIS_BATCH_SIZE = 1000
+
+
+def chunk_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """
+    Persistent store of chunk embeddings keyed by the embedding model and a sha256 of the text.
+
+    Vectors are kept in Redis as raw float32 or float16 bytes and shared by every user, so a
+    chunk is embedded once however many stores it ends up in.
+    """
+
+    def __init__(self, client, ttl, dtype="float32"):
+        self.client = client
+        self.ttl = ttl
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, model, digest):
+        return f"cemb:{model}:{self.dtype.name}:{digest}"
+
+    def get_many(self, model, digests):
+        """
+        Look up the embeddings of several chunks.
+
+        :param model: The name of the embedding model.
+        :param digests: The sha256 digests of the chunk texts.
+        :return: A dict mapping the digests found to their float32 vectors.
+        """
+        found = {}
+        for start in range(0, len(digests), REDIS_BATCH_SIZE):
+            batch = digests[start : start + REDIS_BATCH_SIZE]
+            try:
+                values = self.client.mget([self.key(model, digest) for digest in batch])
+            except Exception as e:
+                logger.warning(f"Failed to read chunk embeddings from Redis: {e}")
+                break
+            for digest, value in zip(batch, values):
+                if value:
+                    found[digest] = np.frombuffer(value, dtype=self.dtype).astype(np.float32)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(digests) - len(found)
+        return found
+
+    def put_many(self, model, vectors):
+        """
+        Store the embeddings of several chunks.
+
+        :param model: The name of the embedding model.
+        :param vectors: A dict mapping chunk digests to their vectors.
+        """
+        items = list(vectors.items())
+        for start in range(0, len(items), REDIS_BATCH_SIZE):
+            try:
+                pipeline = self.client.pipeline(transaction=False)
+                for digest, vector in items[start : start + REDIS_BATCH_SIZE]:
+                    value = np.asarray(vector, dtype=self.dtype).tobytes()
+                    if self.ttl:
+                        pipeline.setex(self.key(model, digest), self.ttl, value)
+                    else:
+                        pipeline.set(self.key(model, digest), value)
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Failed to cache chunk embeddings in Redis: {e}")
+                return
+
+    def wrap(self, embeddings):
+        """Return embeddings that consult this store before embedding any document."""
+        return CachedEmbeddings(embeddings, self)
+
+    def stats(self):
+        with self._lock:
+            return {"dtype": self.dtype.name, "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings that only send chunks missing from a ChunkEmbeddingStore to the wrapped model.
+
+    Duplicate chunks within one call are embedded once. Queries are passed through unchanged.
+    """
+
+    def __init__(self, embeddings, store):
+        self.embeddings = embeddings
+        self.store = store
+        # Same name as the wrapped model, so manifests and cache keys do not change
+        self.model = embedding_model_name(embeddings)
+
+    def embed_documents(self, texts):
+        digests = [chunk_digest(text) for text in texts]
+        vectors = self.store.get_many(self.model, list(dict.fromkeys(digests)))
+
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in vectors:
+                missing.setdefault(digest, text)
+
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing, embedded))
+            self.store.put_many(self.model, new_vectors)
+            vectors.update(new_vectors)
+
+        logger.info(
+            f"Embedded {len(missing)} of {len(texts)} chunks, the rest came from the cache"
+        )
+        return [np.asarray(vectors[digest], dtype=np.float32).tolist() for digest in digests]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+chunk_embedding_store = ChunkEmbeddingStore(
+    redis_sync_client, CHUNK_EMBEDDING_CACHE_TTL, CHUNK_EMBEDDING_CACHE_DTYPE
+)
+register_metrics("chunk_embedding_store", chunk_embedding_store.stats)
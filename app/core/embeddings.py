@@ -0,0 +1,124 @@
+import json
+import threading
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_openai import OpenAIEmbeddings
+from .config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_TENANT_BACKENDS,
+    EMBEDDING_DIMENSION,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_RUNTIME,
+    OPENAI_EMBEDDING_MODEL,
+)
+from .embedding_scheduler import ScheduledOpenAIEmbeddings
+
+EMBEDDING_BACKENDS = ("openai", "local", "deterministic")
+
+_local_embeddings = {}
+_local_embeddings_lock = threading.Lock()
+
+
+def resolve_embedding_backend(user_email=None):
+    """
+    Return the embedding backend configured for a tenant.
+
+    EMBEDDING_TENANT_BACKENDS maps a user email, or an "@domain" suffix, to a backend and
+    takes precedence over EMBEDDING_BACKEND.
+
+    :param user_email: The email of the user whose vector store is built or queried.
+    :return: One of EMBEDDING_BACKENDS.
+    """
+    overrides = json.loads(EMBEDDING_TENANT_BACKENDS or "{}")
+    if user_email:
+        if user_email in overrides:
+            return overrides[user_email]
+        domain = "@" + user_email.split("@")[-1]
+        if domain in overrides:
+            return overrides[domain]
+    return EMBEDDING_BACKEND
+
+
+def _get_local_embeddings(model_name=LOCAL_EMBEDDING_MODEL, runtime=LOCAL_EMBEDDING_RUNTIME):
+    # Loading a model takes seconds and hundreds of MB, every caller shares one instance
+    with _local_embeddings_lock:
+        embeddings = _local_embeddings.get((model_name, runtime))
+        if embeddings is None:
+            from .local_embeddings import LocalEmbeddings
+
+            embeddings = LocalEmbeddings(model_name, runtime)
+            _local_embeddings[(model_name, runtime)] = embeddings
+        return embeddings
+
+
+def get_embeddings(backend=None):
+    """
+    Return the embeddings for a backend.
+
+    "openai" is the production backend. "local" runs a sentence-transformers model on the
+    CPU, see local_embeddings.LocalEmbeddings. "deterministic" hashes the text into a fixed
+    vector without any network access and stands in for them in offline runs and benchmarks.
+
+    :param backend: One of EMBEDDING_BACKENDS, EMBEDDING_BACKEND if not given.
+    :return: A LangChain Embeddings instance.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend}, expected one of {EMBEDDING_BACKENDS}"
+        )
+    if backend == "deterministic":
+        return DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION)
+    if backend == "local":
+        return _get_local_embeddings()
+    return OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL)
+
+
+def get_embeddings_for_model(model, backend=None):
+    """
+    Return the embeddings of the named model, whatever backend is configured now.
+
+    A vector store must be queried with the model it was built with, recorded in its manifest,
+    even after its tenant moves to another backend and until the store is rebuilt.
+
+    :param model: The model name, see embedding_model_name, or None for vector stores built
+        without a manifest.
+    :param backend: The backend to fall back to when model is None.
+    :return: A LangChain Embeddings instance.
+    """
+    if not model:
+        return get_embeddings(backend)
+    if model == OPENAI_EMBEDDING_MODEL:
+        return get_embeddings("openai")
+    if model.startswith("DeterministicFakeEmbedding-"):
+        return DeterministicFakeEmbedding(size=int(model.rpartition("-")[2]))
+
+    from .local_embeddings import LOCAL_RUNTIMES
+
+    model_name, _, runtime = model.rpartition(":")
+    if model_name and runtime in LOCAL_RUNTIMES:
+        return _get_local_embeddings(model_name, runtime)
+    return OpenAIEmbeddings(model=model)
+
+
+def get_ingestion_embeddings(backend=None):
+    """
+    Return the embeddings used to embed document chunks at ingestion.
+
+    Same model as get_embeddings(backend), with OpenAI requests going through the
+    rate-limit-aware EmbeddingScheduler.
+
+    :param backend: One of EMBEDDING_BACKENDS, EMBEDDING_BACKEND if not given.
+    :return: A LangChain Embeddings instance.
+    """
+    if (backend or EMBEDDING_BACKEND) != "openai":
+        return get_embeddings(backend)
+    return ScheduledOpenAIEmbeddings(OPENAI_EMBEDDING_MODEL)
+
+
+def embedding_model_name(embeddings):
+    """Return a stable name for the model behind an Embeddings instance, used in cache keys."""
+    model = getattr(embeddings, "model", None)
+    if model:
+        return model
+    size = getattr(embeddings, "size", None)
+    return f"{type(embeddings).__name__}-{size}" if size else type(embeddings).__name__
@@ -1,19 +1,101 @@
 import os
 from google.cloud import storage
+from google.cloud.exceptions import GoogleCloudError
+from google.cloud.storage.retry import DEFAULT_RETRY
 from pathlib import Path
 from dotenv import load_dotenv
 import tempfile
 import shutil
+import hashlib
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from logging_config import logger
+from .local_storage import LocalStorageClient
+from .metrics import register_metrics
 
 load_dotenv()
 
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 
+# "local" keeps buckets as directories under LOCAL_STORAGE_ROOT for offline runs
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "local_storage")
+GCS_TRANSFER_CONCURRENCY = int(os.getenv("GCS_TRANSFER_CONCURRENCY", 8))
+# Files larger than this are uploaded in resumable chunks of this size
+GCS_UPLOAD_CHUNK_SIZE = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", 16 * 1024 * 1024))
+# Published vector store versions kept in the bucket, readers may still be downloading older ones
+VECTOR_STORE_KEEP_VERSIONS = int(os.getenv("VECTOR_STORE_KEEP_VERSIONS", 2))
+
 DATA_FOLDER = "data"
 RESOURCE_FOLDER = "resources"
 VECTOR_STORE_FOLDER = "vectorStore"
+# A published vector store lives in {VECTOR_STORE_FOLDER}/versions/{version}/, the CURRENT
+# blob next to it names the version readers use
+VERSIONS_FOLDER = "versions"
+CURRENT_VERSION_BLOB = "CURRENT"
+
+# GCS requires resumable upload chunks to be a multiple of 256 KiB
+_CHUNK_SIZE_MULTIPLE = 256 * 1024
+_UPLOAD_CHUNK_SIZE = max(
+    _CHUNK_SIZE_MULTIPLE, GCS_UPLOAD_CHUNK_SIZE // _CHUNK_SIZE_MULTIPLE * _CHUNK_SIZE_MULTIPLE
+)
+
+_stats_lock = threading.Lock()
+transfer_stats = {
+    direction: {"transfers": 0, "bytes": 0, "seconds": 0.0, "max_seconds": 0.0}
+    for direction in ("download", "upload")
+}
+register_metrics(
+    "gcs_transfers",
+    lambda: {direction: dict(stats) for direction, stats in transfer_stats.items()},
+)
+
+
+def get_storage_client():
+    """
+    Return the storage client for the configured backend.
+
+    :return: A google.cloud.storage.Client, or a LocalStorageClient when STORAGE_BACKEND is "local".
+    """
+    if STORAGE_BACKEND == "local":
+        return LocalStorageClient(LOCAL_STORAGE_ROOT)
+    return storage.Client()
+
+
+def _timed_transfer(direction, name, transfer, local_path):
+    """
+    Run a single blob transfer and record its timing.
+
+    :return: A dict with the blob name, size in bytes and duration in seconds.
+    """
+    start = time.perf_counter()
+    transfer()
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(local_path)
+
+    with _stats_lock:
+        stats = transfer_stats[direction]
+        stats["transfers"] += 1
+        stats["bytes"] += size
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    logger.info(f"{direction.capitalize()}ed {name} ({size} bytes) in {seconds:.3f}s")
+    return {"name": name, "bytes": size, "seconds": seconds}
+
+
+async def _run_bounded(jobs, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            return await asyncio.to_thread(job)
+
+    return await asyncio.gather(*(run(job) for job in jobs))
 
 
 def download_from_gcp(bucket_name, source_folder_path, local_dest_path):
@@ -24,7 +106,7 @@ def download_from_gcp(bucket_name, source_folder_path, local_dest_path):
     :param source_folder_path: The path to the folder in the bucket to download files from.
     :param local_dest_path: The local directory to download files to.
     """
-    client = storage.Client()
+    client = get_storage_client()
 
     try:
         bucket = client.bucket(bucket_name)
@@ -63,7 +145,7 @@ def download_file_from_gcp(bucket_name, source_file_path, local_dest_path):
     :param source_file_path: The path to the file in the bucket to download.
     :param local_dest_path: The local directory to download the file to.
     """
-    client = storage.Client()
+    client = get_storage_client()
 
     try:
         bucket = client.bucket(bucket_name)
@@ -92,31 +174,190 @@ def download_file_from_gcp(bucket_name, source_file_path, local_dest_path):
         raise
 
 
-def upload_to_gcp(bucket_name, source_folder_path, destination_folder_path):
+def _upload_jobs(bucket, bucket_name, source_folder_path, destination_folder_path):
+    """
+    Build one upload job per file of a local folder, mirroring its layout under the destination.
+
+    Files larger than the upload chunk size use a chunked resumable upload, so a transient
+    failure retries the current chunk instead of restarting the whole file. Uploads are
+    retried on transient errors.
+    """
+
+    def upload_job(source_file_path):
+        relative_path = os.path.relpath(source_file_path, source_folder_path)
+        destination_blob_name = os.path.join(
+            destination_folder_path, relative_path
+        ).replace("\\", "/")
+        chunk_size = (
+            _UPLOAD_CHUNK_SIZE
+            if os.path.getsize(source_file_path) > _UPLOAD_CHUNK_SIZE
+            else None
+        )
+        blob = bucket.blob(destination_blob_name, chunk_size=chunk_size)
+        return lambda: _timed_transfer(
+            "upload",
+            f"{bucket_name}/{destination_blob_name}",
+            lambda: blob.upload_from_filename(source_file_path, retry=DEFAULT_RETRY),
+            source_file_path,
+        )
+
+    return [
+        upload_job(os.path.join(root, filename))
+        for root, dirs, files in os.walk(source_folder_path)
+        for filename in files
+    ]
+
+
+def upload_to_gcp(
+    bucket_name, source_folder_path, destination_folder_path, concurrency=GCS_TRANSFER_CONCURRENCY
+):
     """
     Uploads all files from a local folder to a specified folder in the Google Cloud Storage bucket.
 
     :param bucket_name: The name of the GCS bucket.
     :param source_folder_path: The path to the local folder containing files and subfolders.
     :param destination_folder_path: The destination folder path in the bucket.
+    :param concurrency: The maximum number of files uploaded at once.
+    :return: The timing of every transfer.
     """
-    client = storage.Client()
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
 
     try:
-        for root, dirs, files in os.walk(source_folder_path):
-            for filename in files:
-                source_file_path = os.path.join(root, filename)
-                # Construct the destination blob name relative to the source folder
-                relative_path = os.path.relpath(source_file_path, source_folder_path)
-                destination_blob_name = os.path.join(
-                    destination_folder_path, relative_path
-                ).replace("\\", "/")
-                blob = bucket.blob(destination_blob_name)
-                blob.upload_from_filename(source_file_path)
-                logger.info(
-                    f"Uploaded {source_file_path} to {bucket_name}/{destination_blob_name}"
+        jobs = _upload_jobs(bucket, bucket_name, source_folder_path, destination_folder_path)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            return list(executor.map(lambda job: job(), jobs))
+    except GoogleCloudError as e:
+        logger.error(
+            f"Failed to upload files to {bucket_name}/{destination_folder_path}: {e}"
+        )
+        raise RuntimeError(
+            f"Failed to upload files to {bucket_name}/{destination_folder_path}"
+        ) from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+
+async def download_from_gcp_async(
+    bucket_name, source_folder_path, local_dest_path, concurrency=GCS_TRANSFER_CONCURRENCY
+):
+    """
+    Download files from a Google Cloud Storage bucket folder concurrently without blocking the event loop.
+
+    :param bucket_name: The name of the GCS bucket.
+    :param source_folder_path: The path to the folder in the bucket to download files from.
+    :param local_dest_path: The local directory to download files to.
+    :param concurrency: The maximum number of blobs transferred at once.
+    :return: The timing of every transfer.
+    """
+    client = get_storage_client()
+
+    try:
+        bucket = client.bucket(bucket_name)
+        blobs = await asyncio.to_thread(
+            lambda: [
+                blob
+                for blob in bucket.list_blobs(prefix=source_folder_path)
+                if not blob.name.endswith("/")  # Skip "folders"
+            ]
+        )
+
+        if not blobs:
+            logger.warning(f"No blobs found in {bucket_name}/{source_folder_path}")
+            return []
+
+        def download_job(blob):
+            dest_file_path = os.path.join(
+                local_dest_path, os.path.relpath(blob.name, source_folder_path)
+            )
+            os.makedirs(os.path.dirname(dest_file_path), exist_ok=True)
+            return lambda: _timed_transfer(
+                "download",
+                blob.name,
+                lambda: blob.download_to_filename(dest_file_path),
+                dest_file_path,
+            )
+
+        return await _run_bounded([download_job(blob) for blob in blobs], concurrency)
+    except GoogleCloudError as e:
+        logger.error(
+            f"Failed to download files from {bucket_name}/{source_folder_path}: {e}"
+        )
+        raise RuntimeError(
+            f"Failed to download files from {bucket_name}/{source_folder_path}"
+        ) from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+
+async def download_files_from_gcp_async(
+    bucket_name, source_file_paths, local_dest_path, concurrency=GCS_TRANSFER_CONCURRENCY
+):
+    """
+    Download specific files from a Google Cloud Storage bucket concurrently.
+
+    :param bucket_name: The name of the GCS bucket.
+    :param source_file_paths: The paths of the files in the bucket to download.
+    :param local_dest_path: The local directory to download the files to.
+    :param concurrency: The maximum number of blobs transferred at once.
+    :return: The timing of every transfer, missing files are skipped.
+    """
+    client = get_storage_client()
+    os.makedirs(local_dest_path, exist_ok=True)
+
+    try:
+        bucket = client.bucket(bucket_name)
+
+        def download_job(source_file_path):
+            def run():
+                blob = bucket.blob(source_file_path)
+                if not blob.exists():
+                    logger.warning(f"File {source_file_path} not found in {bucket_name}")
+                    return None
+                dest_file_path = os.path.join(
+                    local_dest_path, os.path.basename(source_file_path)
+                )
+                return _timed_transfer(
+                    "download",
+                    blob.name,
+                    lambda: blob.download_to_filename(dest_file_path),
+                    dest_file_path,
                 )
+
+            return run
+
+        results = await _run_bounded(
+            [download_job(path) for path in source_file_paths], concurrency
+        )
+        return [result for result in results if result is not None]
+    except GoogleCloudError as e:
+        logger.error(f"Failed to download files from {bucket_name}: {e}")
+        raise RuntimeError(f"Failed to download files from {bucket_name}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+
+async def upload_to_gcp_async(
+    bucket_name, source_folder_path, destination_folder_path, concurrency=GCS_TRANSFER_CONCURRENCY
+):
+    """
+    Upload all files from a local folder to a folder in the Google Cloud Storage bucket concurrently.
+
+    :param bucket_name: The name of the GCS bucket.
+    :param source_folder_path: The path to the local folder containing files and subfolders.
+    :param destination_folder_path: The destination folder path in the bucket.
+    :param concurrency: The maximum number of blobs transferred at once.
+    :return: The timing of every transfer.
+    """
+    client = get_storage_client()
+    bucket = client.bucket(bucket_name)
+
+    try:
+        jobs = _upload_jobs(bucket, bucket_name, source_folder_path, destination_folder_path)
+        return await _run_bounded(jobs, concurrency)
     except GoogleCloudError as e:
         logger.error(
             f"Failed to upload files to {bucket_name}/{destination_folder_path}: {e}"
@@ -138,7 +379,7 @@ def create_folder_in_gcp(user_email: str):
     bucket_name = BUCKET_NAME
     folder_path = f"data/{user_email}/"  # Ensure the path has a trailing slash it creates a "folder"
 
-    client = storage.Client()
+    client = get_storage_client()
 
     try:
         bucket = client.bucket(bucket_name)
@@ -187,7 +428,7 @@ def delete_pdf_from_gcp(user_email, pdf_file_names, bucket_name=BUCKET_NAME):
     :param bucket_name: The name of the GCS bucket.
     :param file_path: The path to the PDF file in the bucket.
     """
-    client = storage.Client()
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
 
     for pdf_file_name in pdf_file_names:
@@ -212,7 +453,7 @@ def list_pdfs(user_email, bucket_name=BUCKET_NAME):
     """
     FILE_PATH = f"data/{user_email}/resources"
 
-    client = storage.Client()
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
 
     try:
@@ -234,3 +475,187 @@ def list_pdfs(user_email, bucket_name=BUCKET_NAME):
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
         raise
+
+
+def _read_current_version(bucket, folder_path):
+    blob = bucket.get_blob(f"{folder_path}/{CURRENT_VERSION_BLOB}")
+    if blob is None:
+        return None
+    return blob.download_as_text().strip() or None
+
+
+def resolve_vector_store_folder(folder_path, version=None, bucket_name=BUCKET_NAME):
+    """
+    Resolve the bucket folder holding the files of a vector store.
+
+    :param folder_path: The vector store folder in the bucket.
+    :param version: The published version to read, the current version if None.
+    :param bucket_name: The name of the GCS bucket.
+    :return: The folder of the published version, or folder_path itself for vector stores
+        uploaded before versions were published.
+    :raises FileNotFoundError: If the requested version was deleted by a later publish.
+    """
+    client = get_storage_client()
+
+    try:
+        bucket = client.bucket(bucket_name)
+        if version and bucket.get_blob(
+            f"{folder_path}/{VERSIONS_FOLDER}/{version}/index.faiss"
+        ):
+            return f"{folder_path}/{VERSIONS_FOLDER}/{version}"
+        current = _read_current_version(bucket, folder_path)
+        if current is None:
+            # Vector stores uploaded before versions were published are versioned by content
+            return folder_path
+        if version and version != current:
+            raise FileNotFoundError(
+                f"Vector store version {version} no longer exists in {bucket_name}/{folder_path}"
+            )
+        return f"{folder_path}/{VERSIONS_FOLDER}/{current}"
+
+    except GoogleCloudError as e:
+        logger.error(f"Failed to resolve vector store in {bucket_name}/{folder_path}: {e}")
+        raise RuntimeError(
+            f"Failed to resolve vector store in {bucket_name}/{folder_path}"
+        ) from e
+
+
+def _prune_vector_store_versions(bucket, folder_path, current):
+    """Delete versions older than the VECTOR_STORE_KEEP_VERSIONS newest, and legacy files."""
+    versions = {}
+    stale = []
+    for blob in bucket.list_blobs(prefix=f"{folder_path}/"):
+        relative_path = blob.name[len(folder_path) + 1 :]
+        if not relative_path or relative_path.endswith("/"):
+            continue  # Skip "folders"
+        if relative_path.startswith(f"{VERSIONS_FOLDER}/"):
+            versions.setdefault(relative_path.split("/")[1], []).append(blob)
+        elif relative_path != CURRENT_VERSION_BLOB:
+            # Files of the layout before versions were published, superseded by CURRENT
+            stale.append(blob)
+
+    # Version names start with their publication time, so they sort oldest first
+    kept = set(sorted(versions)[-max(1, VECTOR_STORE_KEEP_VERSIONS) :]) | {current}
+    for version in versions:
+        if version not in kept:
+            stale.extend(versions[version])
+
+    for blob in stale:
+        blob.delete()
+    if stale:
+        logger.info(f"Deleted {len(stale)} superseded vector store files in {folder_path}")
+
+
+def publish_vector_store(
+    bucket_name, source_folder_path, destination_folder_path, concurrency=GCS_TRANSFER_CONCURRENCY
+):
+    """
+    Upload a vector store as a new version and make it current once every file is in place.
+
+    The files are uploaded concurrently to a folder of their own, then the CURRENT blob is
+    overwritten with the version name in a single write. Readers resolving the folder through
+    resolve_vector_store_folder see either the previous version or the complete new one, never
+    a mix. Older versions beyond VECTOR_STORE_KEEP_VERSIONS are deleted afterwards.
+
+    :param bucket_name: The name of the GCS bucket.
+    :param source_folder_path: The local folder holding the vector store files.
+    :param destination_folder_path: The vector store folder in the bucket.
+    :param concurrency: The maximum number of files uploaded at once.
+    :return: The published version.
+    """
+    version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    version_folder = f"{destination_folder_path}/{VERSIONS_FOLDER}/{version}"
+    upload_to_gcp(bucket_name, source_folder_path, version_folder, concurrency)
+
+    client = get_storage_client()
+    bucket = client.bucket(bucket_name)
+
+    try:
+        bucket.blob(f"{destination_folder_path}/{CURRENT_VERSION_BLOB}").upload_from_string(
+            version, retry=DEFAULT_RETRY
+        )
+        logger.info(f"Published vector store {bucket_name}/{version_folder}")
+    except GoogleCloudError as e:
+        logger.error(f"Failed to publish vector store {bucket_name}/{version_folder}: {e}")
+        raise RuntimeError(
+            f"Failed to publish vector store {bucket_name}/{version_folder}"
+        ) from e
+
+    try:
+        _prune_vector_store_versions(bucket, destination_folder_path, version)
+    except Exception as e:
+        # The new version is live, leftovers are removed by the next publish
+        logger.warning(
+            f"Failed to delete old vector store versions in {bucket_name}/{destination_folder_path}: {e}"
+        )
+    return version
+
+
+def get_vector_store_version(user_email, bucket_name=BUCKET_NAME):
+    """
+    Return the current version of a user's vector store.
+
+    Published vector stores are versioned by their CURRENT blob. For vector stores uploaded
+    before versions were published, a content-derived version is computed from the GCS object
+    checksums.
+
+    :param user_email: The email of the user owning the vector store.
+    :param bucket_name: The name of the GCS bucket.
+    :return: The version string, or None if the vector store files do not exist.
+    """
+    folder_path = f"{DATA_FOLDER}/{user_email}/{VECTOR_STORE_FOLDER}"
+
+    client = get_storage_client()
+
+    try:
+        bucket = client.bucket(bucket_name)
+        current = _read_current_version(bucket, folder_path)
+        if current is not None:
+            return current
+
+        checksums = {
+            blob.name: blob.crc32c
+            for blob in bucket.list_blobs(prefix=f"{folder_path}/")
+            if not blob.name.endswith("/")
+        }
+        if f"{folder_path}/index.faiss" not in checksums:
+            logger.warning(f"index.faiss not found in {bucket_name}/{folder_path}")
+            return None
+
+        fingerprint = ":".join(f"{name}={checksums[name]}" for name in sorted(checksums))
+        return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    except GoogleCloudError as e:
+        logger.error(
+            f"Failed to read vector store version from {bucket_name}/{folder_path}: {e}"
+        )
+        raise RuntimeError(
+            f"Failed to read vector store version from {bucket_name}/{folder_path}"
+        ) from e
+
+
+def list_resource_fingerprints(user_email, bucket_name=BUCKET_NAME):
+    """
+    List the PDFs of a user with the GCS checksums used to detect changed files.
+
+    :param user_email: The email of the user.
+    :param bucket_name: The name of the GCS bucket.
+    :return: A dict mapping PDF file names to their crc32c checksums.
+    """
+    folder_path = f"{DATA_FOLDER}/{user_email}/{RESOURCE_FOLDER}"
+
+    client = get_storage_client()
+
+    try:
+        bucket = client.bucket(bucket_name)
+        return {
+            os.path.basename(blob.name): blob.crc32c
+            for blob in bucket.list_blobs(prefix=f"{folder_path}/", delimiter="/")
+            if blob.name.endswith(".pdf")
+        }
+
+    except GoogleCloudError as e:
+        logger.error(f"Failed to list PDF files from {bucket_name}/{folder_path}: {e}")
+        raise RuntimeError(
+            f"Failed to list PDF files from {bucket_name}/{folder_path}"
+        ) from e
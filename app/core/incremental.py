@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import faiss
+import numpy as np
+from logging_config import logger
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_fingerprint(path):
+    """
+    Compute the content fingerprint of a local file.
+
+    :param path: The path to the file.
+    :return: The hex sha256 digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(db_path):
+    """
+    Load the manifest saved next to index.faiss.
+
+    :param db_path: The directory holding the vector store files.
+    :return: The manifest dict, or None if the vector store has no manifest.
+    """
+    path = os.path.join(db_path, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning(f"Ignoring manifest {path} with unsupported version")
+        return None
+    return manifest
+
+
+def save_manifest(db_path, manifest):
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+
+
+def new_manifest(fingerprints, index_type, built_index_type, embedding_model):
+    """
+    Create the manifest of a vector store that has no chunks yet.
+
+    :param fingerprints: A dict mapping every file to index to its content fingerprint.
+    :param index_type: The index type requested for the tenant.
+    :param built_index_type: The index type actually built, flat below the training threshold.
+    :param embedding_model: The name of the embedding model, see embeddings.embedding_model_name.
+    :return: The manifest dict.
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "index_type": index_type,
+        "built_index_type": built_index_type,
+        "embedding_model": embedding_model,
+        "next_label": 0,
+        "files": {},
+    }
+    track_files(manifest, fingerprints)
+    return manifest
+
+
+def track_files(manifest, fingerprints):
+    """Register files in a manifest before their chunks are added."""
+    for filename, fingerprint in fingerprints.items():
+        manifest["files"][filename] = {"fingerprint": fingerprint, "labels": []}
+
+
+def assign_labels(manifest, documents):
+    """
+    Hand out the next labels to chunks and record them under the file each came from.
+
+    Labels of removed chunks are never reused.
+
+    :param manifest: The manifest, updated in place.
+    :param documents: The chunks, their "source" metadata names the file they came from.
+    :return: The int64 array of labels.
+    """
+    start = manifest["next_label"]
+    labels = np.arange(start, start + len(documents), dtype=np.int64)
+    for label, document in zip(labels.tolist(), documents):
+        filename = os.path.basename(document.metadata["source"])
+        manifest["files"].setdefault(filename, {"fingerprint": None, "labels": []})
+        manifest["files"][filename]["labels"].append(label)
+    manifest["next_label"] = start + len(documents)
+    return labels
+
+
+def plan_update(manifest, fingerprints):
+    """
+    Compare the files indexed in a manifest with the files that should be indexed.
+
+    Changed files are both removed and added again.
+
+    :param manifest: The manifest of the existing vector store.
+    :param fingerprints: A dict mapping the file names to index to their content fingerprints.
+    :return: A tuple of (added, removed) sorted file name lists.
+    """
+    indexed = manifest["files"]
+    added = sorted(
+        filename
+        for filename, fingerprint in fingerprints.items()
+        if filename not in indexed or indexed[filename]["fingerprint"] != fingerprint
+    )
+    removed = sorted(
+        filename
+        for filename, entry in indexed.items()
+        if fingerprints.get(filename) != entry["fingerprint"]
+    )
+    return added, removed
+
+
+def supports_removal(index):
+    """Return whether vectors can be removed from a FAISS index by label."""
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return not isinstance(index, faiss.IndexHNSW)
+
+
+def rebuild_reason(manifest, index, index_type, embedding_model, train_threshold):
+    """
+    Decide whether an existing vector store has to be rebuilt instead of updated in place.
+
+    :param manifest: The manifest of the existing vector store, or None.
+    :param index: The FAISS index of the existing vector store.
+    :param index_type: The index type currently requested for the tenant.
+    :param embedding_model: The name of the current embedding model.
+    :param train_threshold: The number of vectors from which index_type is used.
+    :return: A short reason, or None if the store can be updated incrementally.
+    """
+    if manifest is None:
+        return "no manifest"
+    if manifest["embedding_model"] != embedding_model:
+        return "embedding model changed"
+    if manifest["index_type"] != index_type:
+        return "index type changed"
+    if not supports_removal(index):
+        return "index does not support removal"
+    if manifest["built_index_type"] != index_type and index.ntotal >= train_threshold:
+        # The store has outgrown the flat index it started with
+        return "training threshold reached"
+    return None
+
+
+def remove_files(vectorstore, manifest, filenames):
+    """
+    Remove the chunks of files from a vector store and its manifest.
+
+    :param vectorstore: The LangChain FAISS vector store, updated in place.
+    :param manifest: The manifest of the vector store, updated in place.
+    :param filenames: The names of the files to remove.
+    :return: The number of chunks removed.
+    """
+    labels = [
+        label
+        for filename in filenames
+        for label in manifest["files"].get(filename, {}).get("labels", [])
+    ]
+    if labels:
+        vectorstore.index.remove_ids(np.array(labels, dtype=np.int64))
+        vectorstore.docstore.delete(
+            [vectorstore.index_to_docstore_id[label] for label in labels]
+        )
+        for label in labels:
+            del vectorstore.index_to_docstore_id[label]
+
+    for filename in filenames:
+        manifest["files"].pop(filename, None)
+    return len(labels)
+
+
+def add_documents(vectorstore, manifest, documents, vectors):
+    """
+    Append embedded chunks to a vector store and its manifest.
+
+    :param vectorstore: The LangChain FAISS vector store, updated in place.
+    :param manifest: The manifest of the vector store, updated in place.
+    :param documents: The chunks, their files must already be tracked in the manifest.
+    :param vectors: The embeddings of the chunks.
+    :return: The number of chunks added.
+    """
+    if not documents:
+        return 0
+
+    labels = assign_labels(manifest, documents)
+    vectorstore.index.add_with_ids(np.asarray(vectors, dtype=np.float32), labels)
+    vectorstore.docstore.add(
+        {str(label): document for label, document in zip(labels.tolist(), documents)}
+    )
+    for label in labels.tolist():
+        vectorstore.index_to_docstore_id[label] = str(label)
+    return len(documents)
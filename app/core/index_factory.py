@@ -0,0 +1,153 @@
+import json
+import math
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from logging_config import logger
+from .config import (
+    VECTOR_INDEX_TYPE,
+    VECTOR_INDEX_TENANT_TYPES,
+    VECTOR_INDEX_TRAIN_THRESHOLD,
+    VECTOR_INDEX_NPROBE,
+    VECTOR_INDEX_EF_SEARCH,
+)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "sq8", "hnsw")
+
+# Enough points per centroid for k-means to be meaningful
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS_PER_CENTROID = 256
+ADD_BLOCK_SIZE = 65536
+
+
+def resolve_index_type(user_email=None):
+    """
+    Return the index type configured for a tenant.
+
+    VECTOR_INDEX_TENANT_TYPES maps a user email, or an "@domain" suffix, to an index type and
+    takes precedence over VECTOR_INDEX_TYPE.
+
+    :param user_email: The email of the user the index is built for.
+    :return: One of INDEX_TYPES.
+    """
+    overrides = json.loads(VECTOR_INDEX_TENANT_TYPES or "{}")
+    if user_email:
+        if user_email in overrides:
+            return overrides[user_email]
+        domain = "@" + user_email.split("@")[-1]
+        if domain in overrides:
+            return overrides[domain]
+    return VECTOR_INDEX_TYPE
+
+
+def index_factory_string(index_type, dimension, count):
+    """
+    Build the faiss.index_factory description for an index type and corpus size.
+
+    :param index_type: One of INDEX_TYPES.
+    :param dimension: The embedding dimension.
+    :param count: The number of vectors the index is trained on.
+    :return: The factory string.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type}, expected one of {INDEX_TYPES}")
+
+    nlist = max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        # Largest sub-quantizer count up to d/8 that divides the dimension
+        m = max(m for m in range(1, max(1, dimension // 8) + 1) if dimension % m == 0)
+        return f"IVF{nlist},PQ{m}x8"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "hnsw":
+        return "HNSW32"
+    return "Flat"
+
+
+def effective_index_type(index_type, count, train_threshold=VECTOR_INDEX_TRAIN_THRESHOLD):
+    """Return the index type built for a corpus, flat below the training threshold."""
+    return "flat" if count < train_threshold else index_type
+
+
+def build_index(
+    vectors, index_type="flat", train_threshold=VECTOR_INDEX_TRAIN_THRESHOLD, ids=None
+):
+    """
+    Build a FAISS index over the vectors, training it when the index type needs it.
+
+    Corpora smaller than train_threshold always get a flat index, compressed indexes only
+    pay off, and only train well, once there are enough vectors. Vectors are stored under
+    explicit labels so chunks keep them when other chunks are added or removed later: IVF
+    indexes hold the labels themselves, every other type is wrapped in an IndexIDMap2.
+
+    :param vectors: A float32 array of shape (n, d), may be memory-mapped.
+    :param index_type: One of INDEX_TYPES.
+    :param train_threshold: The number of vectors from which index_type is used.
+    :param ids: The int64 labels of the vectors, 0..n-1 by default.
+    :return: The populated FAISS index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    index_type = effective_index_type(index_type, count, train_threshold)
+    if ids is None:
+        ids = np.arange(count, dtype=np.int64)
+
+    description = index_factory_string(index_type, dimension, count)
+    base = faiss.index_factory(dimension, description)
+
+    if not base.is_trained:
+        ivf = faiss.try_extract_index_ivf(base)
+        training_size = count
+        if ivf is not None:
+            training_size = min(count, ivf.nlist * MAX_TRAINING_POINTS_PER_CENTROID)
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(count, training_size, replace=False))]
+        base.train(sample)
+
+    # Search-time parameters are saved with the index
+    ivf = faiss.try_extract_index_ivf(base)
+    if ivf is not None:
+        ivf.nprobe = min(ivf.nlist, VECTOR_INDEX_NPROBE)
+        # Lets vectors be reconstructed and removed by label
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = VECTOR_INDEX_EF_SEARCH
+
+    # IndexIDMap2 does not renumber the inverted lists of an IVF index on removal
+    index = base if ivf is not None else faiss.IndexIDMap2(base)
+    ids = np.asarray(ids, dtype=np.int64)
+    for start in range(0, count, ADD_BLOCK_SIZE):
+        # Blocks keep memory-mapped vectors from being paged in all at once
+        index.add_with_ids(
+            np.ascontiguousarray(vectors[start : start + ADD_BLOCK_SIZE]),
+            ids[start : start + ADD_BLOCK_SIZE],
+        )
+
+    logger.info(f"Built {description} index over {count} vectors")
+    return index
+
+
+def create_faiss_vectorstore(documents, embeddings, index_type="flat"):
+    """
+    Embed documents and build a LangChain FAISS vector store on the configured index type.
+
+    Chunks are labelled 0..n-1 in the order given and stored under str(label) in the docstore.
+
+    :param documents: The chunks to index.
+    :param embeddings: The embeddings used for the chunks and later queries.
+    :param index_type: One of INDEX_TYPES.
+    :return: The vector store.
+    """
+    vectors = np.array(
+        embeddings.embed_documents([doc.page_content for doc in documents]),
+        dtype=np.float32,
+    )
+    index = build_index(vectors, index_type)
+
+    ids = [str(label) for label in range(len(documents))]
+    docstore = InMemoryDocstore(dict(zip(ids, documents)))
+    index_to_docstore_id = dict(enumerate(ids))
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
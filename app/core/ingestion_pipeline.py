@@ -0,0 +1,277 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from logging_config import logger
+from .config import INGESTION_QUEUE_SIZE, INGESTION_EMBED_BATCH_SIZE
+from .docstore import DOCSTORE_FILENAME, CompactDocstoreWriter
+from .sparse_index import SPARSE_INDEX_FILENAME, SparseIndexBuilder
+from .incremental import assign_labels, new_manifest, save_manifest
+from .index_factory import build_index, effective_index_type
+from .pdf_parser import iter_parse_pdfs
+
+_DONE = object()
+
+
+def _new_stats():
+    return {"items": 0, "seconds": 0.0, "wait_seconds": 0.0}
+
+
+class _Pipeline:
+    def __init__(self, stats, on_progress=None):
+        self.stop = threading.Event()
+        self.errors = []
+        self.stats = stats
+        self.on_progress = on_progress
+
+    def _get(self, inbox):
+        while not self.stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _put(self, outbox, item):
+        while not self.stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def iter_queue(self, inbox, stats):
+        """Iterate over a stage's output, charging the time spent blocked to the consumer."""
+        while True:
+            start = time.perf_counter()
+            item = self._get(inbox)
+            stats["wait_seconds"] += time.perf_counter() - start
+            if item is _DONE:
+                return
+            yield item
+
+    def run_stage(self, stage, inputs, outbox, stats):
+        start = time.perf_counter()
+        outputs = iter(stage(inputs))
+        try:
+            for item in outputs:
+                stats["items"] += 1
+                put_start = time.perf_counter()
+                self._put(outbox, item)
+                stats["wait_seconds"] += time.perf_counter() - put_start
+                if self.on_progress is not None:
+                    self.on_progress(self.stats)
+                if self.stop.is_set():
+                    break
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            # Runs the generator's cleanup, such as shutting down its worker pool
+            close = getattr(outputs, "close", None)
+            if close is not None:
+                close()
+            self._put(outbox, _DONE)
+            stats["seconds"] = time.perf_counter() - start - stats["wait_seconds"]
+
+
+def run_pipeline(source, stages, sink, queue_size=INGESTION_QUEUE_SIZE, on_progress=None):
+    """
+    Run generator stages concurrently, each on its own thread, connected by bounded queues.
+
+    Every stage is a function taking the iterable of its inputs and returning an iterable of
+    outputs. A stage that gets ahead of the next one blocks once queue_size items are waiting,
+    so memory stays bounded whatever the size of the input. The first error raised by any
+    stage stops the pipeline and is re-raised.
+
+    :param source: An iterable feeding the first stage.
+    :param stages: A list of (name, stage) pairs.
+    :param sink: A function consuming the output iterable of the last stage, run on the
+        calling thread.
+    :param on_progress: A function called with the live stats every time a stage outputs an
+        item, from the thread of that stage.
+    :return: A tuple of (sink result, stats), stats maps every stage and "sink" to its item
+        count, busy seconds and seconds spent blocked on its neighbours.
+    """
+    stats = {name: _new_stats() for name, _ in stages}
+    stats["sink"] = _new_stats()
+    pipeline = _Pipeline(stats, on_progress)
+
+    threads = []
+    inputs = source
+    consumers = [name for name, _ in stages[1:]] + ["sink"]
+    for (name, stage), consumer in zip(stages, consumers):
+        outbox = queue.Queue(maxsize=queue_size)
+        threads.append(
+            threading.Thread(
+                target=pipeline.run_stage,
+                args=(stage, inputs, outbox, stats[name]),
+                name=f"ingestion-{name}",
+                daemon=True,
+            )
+        )
+        inputs = pipeline.iter_queue(outbox, stats[consumer])
+
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    try:
+        result = sink(inputs)
+    except BaseException:
+        pipeline.stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        sink_stats = stats["sink"]
+        if stages:
+            sink_stats["items"] = stats[stages[-1][0]]["items"]
+        sink_stats["seconds"] = time.perf_counter() - start - sink_stats["wait_seconds"]
+
+    if pipeline.errors:
+        raise pipeline.errors[0]
+    return result, stats
+
+
+def fetch_stage(fetch, concurrency):
+    """
+    Stage fetching files through fetch(filename) -> local path, several at a time, in order.
+
+    Files that fetch returns None for are skipped.
+    """
+
+    def stage(filenames):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = deque()
+            for filename in filenames:
+                in_flight.append(executor.submit(fetch, filename))
+                if len(in_flight) >= concurrency:
+                    path = in_flight.popleft().result()
+                    if path is not None:
+                        yield path
+            while in_flight:
+                path = in_flight.popleft().result()
+                if path is not None:
+                    yield path
+
+    return stage
+
+
+def parse_stage(workers=None):
+    """Stage parsing PDF paths into lists of page Documents, see pdf_parser.iter_parse_pdfs."""
+    if workers is None:
+        return iter_parse_pdfs
+    return lambda pdf_paths: iter_parse_pdfs(pdf_paths, workers)
+
+
+def split_stage(splitter, batch_size=INGESTION_EMBED_BATCH_SIZE):
+    """Stage splitting pages into chunks, regrouped into batches of batch_size chunks."""
+
+    def stage(page_lists):
+        batch = []
+        for pages in page_lists:
+            batch.extend(splitter.split_documents(pages))
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        if batch:
+            yield batch
+
+    return stage
+
+
+def embed_stage(embeddings):
+    """Stage embedding batches of chunks into (chunks, vectors) pairs."""
+
+    def stage(batches):
+        for documents in batches:
+            yield documents, embeddings.embed_documents(
+                [document.page_content for document in documents]
+            )
+
+    return stage
+
+
+class VectorStoreWriter:
+    """
+    Sink streaming embedded chunks into the files of a new vector store.
+
+    A flat index is filled as batches arrive. Index types that need training only know their
+    training set at the end, so their vectors are spilled to a file in spill_dir and the index
+    is built from it memory-mapped. The docstore is written with a CompactDocstoreWriter and
+    the chunks are indexed for BM25 as they arrive.
+    """
+
+    def __init__(self, db_path, index_type, fingerprints, embedding_model, spill_dir):
+        os.makedirs(db_path, exist_ok=True)
+        self.db_path = db_path
+        self.index_type = index_type
+        self.manifest = new_manifest(fingerprints, index_type, None, embedding_model)
+        self.docstore = CompactDocstoreWriter(os.path.join(db_path, DOCSTORE_FILENAME))
+        self.sparse_index = SparseIndexBuilder()
+        self.index = None
+        self.dimension = None
+        self._spill = None
+        if index_type != "flat":
+            self._spill = open(os.path.join(spill_dir, "vectors.f32"), "wb+")
+
+    def add(self, documents, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.dimension = vectors.shape[1]
+        labels = assign_labels(self.manifest, documents)
+        if self._spill is not None:
+            self._spill.write(vectors.tobytes())
+        else:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+            self.index.add_with_ids(vectors, labels)
+        for label, document in zip(labels.tolist(), documents):
+            self.docstore.add(label, document)
+            self.sparse_index.add(label, document.page_content)
+
+    def write(self, batches):
+        """
+        Consume (chunks, vectors) batches and write the vector store.
+
+        :return: The number of chunks written.
+        :raises ValueError: If there was nothing to index.
+        """
+        for documents, vectors in batches:
+            self.add(documents, vectors)
+
+        count = self.manifest["next_label"]
+        if count == 0:
+            raise ValueError("No text found to index")
+
+        built_index_type = effective_index_type(self.index_type, count)
+        if self._spill is not None:
+            self._spill.flush()
+            vectors = np.memmap(
+                self._spill.name, dtype=np.float32, mode="r", shape=(count, self.dimension)
+            )
+            self.index = build_index(vectors, self.index_type)
+            del vectors
+            self._spill.close()
+
+        faiss.write_index(self.index, os.path.join(self.db_path, "index.faiss"))
+        self.docstore.close()
+        self.sparse_index.write(os.path.join(self.db_path, SPARSE_INDEX_FILENAME))
+        self.manifest["built_index_type"] = built_index_type
+        save_manifest(self.db_path, self.manifest)
+        return count
+
+
+def log_pipeline_stats(stats):
+    logger.info(
+        "Ingestion stages: "
+        + ", ".join(
+            f"{name} {values['items']} items {values['seconds']:.2f}s busy "
+            f"{values['wait_seconds']:.2f}s waiting"
+            for name, values in stats.items()
+        )
+    )
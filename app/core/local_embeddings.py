@@ -0,0 +1,172 @@
+import threading
+import time
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+from logging_config import logger
+from .config import (
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_RUNTIME,
+    LOCAL_EMBEDDING_THREADS,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_MAX_WAIT_MS,
+)
+from .metrics import register_metrics
+
+LOCAL_RUNTIMES = ("torch", "int8", "onnx")
+
+local_embedding_stats = {"batches": 0, "texts": 0, "seconds": 0.0, "coalesced_queries": 0}
+_stats_lock = threading.Lock()
+register_metrics("local_embeddings", lambda: dict(local_embedding_stats))
+
+
+def load_sentence_transformer(model_name, runtime, threads):
+    """
+    Load a sentence-transformers model for CPU inference.
+
+    "torch" runs the model as published, "int8" quantizes its linear layers dynamically, and
+    "onnx" runs it with ONNX Runtime (needs sentence-transformers[onnx]).
+
+    :param model_name: The Hugging Face name of the model.
+    :param runtime: One of LOCAL_RUNTIMES.
+    :param threads: The number of intra-op threads, 0 to keep the library default.
+    :return: The SentenceTransformer.
+    """
+    if runtime not in LOCAL_RUNTIMES:
+        raise ValueError(
+            f"Unknown local embedding runtime {runtime}, expected one of {LOCAL_RUNTIMES}"
+        )
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    if runtime == "onnx":
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        return SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"session_options": session_options},
+        )
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if runtime == "int8":
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    model.eval()
+    return model
+
+
+class _QueryBatcher:
+    """
+    Coalesces queries embedded concurrently into one forward pass.
+
+    The first query waits up to max_wait seconds for others to join, so a burst of requests
+    costs one batch instead of one model call each.
+    """
+
+    def __init__(self, encode, max_batch_size, max_wait):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._pending = []
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        future = Future()
+        with self._condition:
+            self._pending.append((text, future))
+            self._condition.notify()
+        return future
+
+    def _take_batch(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending)
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            with _stats_lock:
+                local_embedding_stats["coalesced_queries"] += len(batch) - 1
+            try:
+                vectors = self.encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Sentence-transformers embeddings computed on the local CPU, without network calls.
+
+    Documents are sorted by length before batching so every batch pads to similar lengths,
+    and concurrent queries are coalesced into shared batches. The model name includes the
+    runtime, int8 and ONNX vectors differ slightly from the original model's.
+    """
+
+    def __init__(
+        self,
+        model_name=LOCAL_EMBEDDING_MODEL,
+        runtime=LOCAL_EMBEDDING_RUNTIME,
+        threads=LOCAL_EMBEDDING_THREADS,
+        batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+        max_wait_ms=LOCAL_EMBEDDING_MAX_WAIT_MS,
+    ):
+        self.model = f"{model_name}:{runtime}"
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        start = time.perf_counter()
+        self._model = load_sentence_transformer(model_name, runtime, threads)
+        self.size = self._model.get_sentence_embedding_dimension()
+        logger.info(
+            f"Loaded local embedding model {self.model} ({self.size} dimensions) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        self._queries = _QueryBatcher(self._encode, batch_size, max_wait_ms / 1000.0)
+
+    def _encode(self, texts):
+        start = time.perf_counter()
+        # The model is not safe to call from several threads at once
+        with self._lock:
+            vectors = self._model.encode(
+                texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False
+            )
+        with _stats_lock:
+            local_embedding_stats["batches"] += 1
+            local_embedding_stats["texts"] += len(texts)
+            local_embedding_stats["seconds"] += time.perf_counter() - start
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                results[i] = vector
+        return results
+
+    def embed_query(self, text):
+        return self._queries.submit(text).result()
@@ -0,0 +1,26 @@
+import threading
+
+_lock = threading.Lock()
+_providers = {}
+
+
+def register_metrics(name, provider):
+    """
+    Register a callable that returns a dict of counters for the metrics endpoint.
+
+    :param name: The name the counters are reported under.
+    :param provider: A zero-argument callable returning a JSON serialisable dict.
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_metrics():
+    """
+    Collect the current counters from every registered provider.
+
+    :return: A dict mapping provider names to their counters.
+    """
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
@@ -1,22 +1,83 @@
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from google.cloud import storage
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
-from .config import redis_client
+from .config import redis_client, redis_sync_client
 from pathlib import Path
 from dotenv import load_dotenv
-from .gcp_utils import download_from_gcp, upload_to_gcp, download_file_from_gcp
+from .gcp_utils import (
+    download_from_gcp,
+    download_from_gcp_async,
+    publish_vector_store,
+    resolve_vector_store_folder,
+    download_file_from_gcp,
+    get_vector_store_version,
+    list_resource_fingerprints,
+    GCS_TRANSFER_CONCURRENCY,
+)
 from logging_config import logger
 from google.cloud.exceptions import GoogleCloudError
 from .config import BUCKET_NAME, DATA_FOLDER, VECTOR_STORE_FOLDER, RESOURCE_FOLDER
+from .config import VECTOR_STORE_VERSION_TTL, VECTOR_STORE_LOAD_LOCK_TIMEOUT
+from .config import VECTOR_INDEX_TRAIN_THRESHOLD
+from .disk_cache import vector_store_disk_cache, read_index_mmap
+from .docstore import (
+    DOCSTORE_FILENAME,
+    serialize_docstore,
+    load_docstore,
+    load_docstore_file,
+    find_docstore_file,
+    docstore_filename,
+)
+from .sparse_index import (
+    SPARSE_INDEX_FILENAME,
+    build_sparse_index,
+    load_sparse_index,
+    load_sparse_index_file,
+)
+from .metrics import register_metrics
+from .embeddings import (
+    get_embeddings,
+    get_embeddings_for_model,
+    get_ingestion_embeddings,
+    embedding_model_name,
+    resolve_embedding_backend,
+)
+from .embedding_store import chunk_embedding_store
+from .index_factory import resolve_index_type
+from .incremental import (
+    MANIFEST_FILENAME,
+    add_documents,
+    file_fingerprint,
+    load_manifest,
+    plan_update,
+    rebuild_reason,
+    remove_files,
+    save_manifest,
+    track_files,
+)
+from .chunker import get_chunker
+from .ingestion_pipeline import (
+    VectorStoreWriter,
+    embed_stage,
+    fetch_stage,
+    log_pipeline_stats,
+    parse_stage,
+    run_pipeline,
+    split_stage,
+)
+from .vector_cache import (
+    vector_store_cache,
+    vector_store_key,
+    vector_store_version_key,
+    session_vector_store_key,
+)
+import json
 import tempfile
-import pickle
 import shutil
 import faiss
 import asyncio
+import uuid
 import numpy as np
 
 load_dotenv()
@@ -24,198 +85,716 @@ load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
 
+def load_vectorstore_from_bytes(index_data, metadata_data, embeddings, sparse_data=None):
+    """
+    Build a FAISS vector store directly from serialized index and docstore bytes.
+
+    :param index_data: The FAISS index as produced by faiss.serialize_index or write_index.
+    :param metadata_data: The docstore, either compact (index.docs) or pickled (index.pkl).
+    :param embeddings: The embeddings used to embed queries against the store.
+    :param sparse_data: The BM25 index (index.bm25), None for stores built without one.
+    :return: The loaded vector store, with the BM25 index as its sparse_index attribute.
+    """
+    index = faiss.deserialize_index(np.frombuffer(index_data, dtype=np.uint8))
+    docstore, index_to_docstore_id = load_docstore(metadata_data)
+    vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    vectorstore.sparse_index = load_sparse_index(sparse_data)
+    return vectorstore
+
+
+def load_vectorstore_from_dir(db_path, embeddings):
+    """
+    Load a FAISS vector store from a directory, memory-mapping the index and docstore.
+
+    :param db_path: The directory holding index.faiss and index.docs (or a legacy index.pkl),
+        and index.bm25 if the store was built with one.
+    :param embeddings: The embeddings used to embed queries against the store.
+    :return: The loaded vector store, with the BM25 index as its sparse_index attribute.
+    """
+    index = read_index_mmap(os.path.join(db_path, "index.faiss"))
+    docstore, index_to_docstore_id = load_docstore_file(db_path)
+    vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    vectorstore.sparse_index = load_sparse_index_file(db_path)
+    return vectorstore
+
+
+def save_vectorstore(vectorstore, db_path):
+    """
+    Save a FAISS vector store as index.faiss plus a compact index.docs docstore and the
+    index.bm25 BM25 index of its chunks.
+
+    :param vectorstore: The vector store to save.
+    :param db_path: The directory to save the files in.
+    """
+    os.makedirs(db_path, exist_ok=True)
+    index_path = os.path.join(db_path, "index.faiss")
+    docstore_path = os.path.join(db_path, DOCSTORE_FILENAME)
+    # Write next to the targets and rename, the docstore being serialized may be mapped from them
+    faiss.write_index(vectorstore.index, f"{index_path}.tmp")
+    with open(f"{docstore_path}.tmp", "wb") as f:
+        f.write(
+            serialize_docstore(vectorstore.docstore, vectorstore.index_to_docstore_id)
+        )
+    build_sparse_index(vectorstore.docstore, vectorstore.index_to_docstore_id).write(
+        os.path.join(db_path, SPARSE_INDEX_FILENAME)
+    )
+    os.replace(f"{index_path}.tmp", index_path)
+    os.replace(f"{docstore_path}.tmp", docstore_path)
+
+
+async def resolve_vector_store_version(user_email, refresh=False):
+    """
+    Resolve the current version of a user's vector store, caching it in Redis.
+
+    :param user_email: The user email to locate the vectorstore in GCS.
+    :param refresh: Read the version from GCS even if Redis has one, which may be stale.
+    :return: The version string.
+    :raises FileNotFoundError: If the user has no vector store in GCS.
+    """
+    version_key = vector_store_version_key(user_email)
+    version = None if refresh else await redis_client.get(version_key)
+    if version:
+        return version.decode()
+
+    version = await asyncio.to_thread(get_vector_store_version, user_email)
+    if version is None:
+        raise FileNotFoundError(f"No vector store found for {user_email}")
+
+    await redis_client.setex(version_key, VECTOR_STORE_VERSION_TTL, version)
+    return version
+
+
+def refresh_vector_store_version(user_email):
+    """
+    Record the version of a freshly uploaded vector store so readers stop using the old one.
+
+    :param user_email: The email of the user whose vector store was rebuilt.
+    """
+    version = get_vector_store_version(user_email)
+    if version is None:
+        return
+
+    try:
+        redis_sync_client.setex(
+            vector_store_version_key(user_email), VECTOR_STORE_VERSION_TTL, version
+        )
+        logger.info(f"Vector store version for {user_email} is now {version}")
+    except Exception as e:
+        logger.warning(f"Failed to record vector store version for {user_email}: {e}")
+
+
+_inflight_loads = {}
+load_stats = {"cold_loads": 0, "coalesced": 0, "lock_waits": 0}
+register_metrics("vector_store_loads", lambda: dict(load_stats))
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
 async def load_vector_db(session_id, user_email):
     """
-    Load the vector database from Redis cache or Google Cloud Storage if not cached.
+    Load the vector database from the worker cache, the local disk cache, Redis cache or
+    Google Cloud Storage, in that order.
 
-    :param session_id: The session ID used as the key for caching.
+    Cached copies are shared by every session of the user and keyed by the vector store version,
+    the session only keeps a pointer to the version it is using. Concurrent cold loads of the
+    same version are coalesced so only one request per worker, and one worker per cluster,
+    downloads it.
+
+    :param session_id: The session ID that points at the cached vector store.
     :param user_email: The user email to locate the vectorstore in GCS.
     :return: The loaded vector store.
     :raises RuntimeError: If loading the vector store fails.
     """
+    try:
+        version = await resolve_vector_store_version(user_email)
+    except Exception as e:
+        logger.error(f"Failed to resolve vectorstore version for {user_email}: {e}")
+        raise RuntimeError("Failed to load vectorstore") from e
 
-    cached_index = await redis_client.get(f"{session_id}_index")
-    cached_metadata = await redis_client.get(f"{session_id}_metadata")
-    if cached_index and cached_metadata:
-        try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Deserialize index and metadata
-                index_data = np.frombuffer(cached_index, dtype=np.uint8)
-                index = faiss.deserialize_index(index_data)
-                metadata = pickle.loads(cached_metadata)
-
-                # Write the deserialized index and metadata to temporary files
-                index_path = os.path.join(temp_dir, "index.faiss")
-                metadata_path = os.path.join(temp_dir, "index.pkl")
-
-                with open(index_path, "wb") as f:
-                    f.write(index_data)
-
-                with open(metadata_path, "wb") as f:
-                    f.write(cached_metadata)
-
-                # Load the vector store from the files
-                vectorstore = FAISS.load_local(
-                    temp_dir, OpenAIEmbeddings(), allow_dangerous_deserialization=True
-                )
-                logger.info(
-                    f"Loaded vectorstore from cache for session_id: {session_id}"
-                )
-                return vectorstore
+    try:
+        return await _load_vector_db_version(session_id, user_email, version)
+    except FileNotFoundError as e:
+        # The recorded version was deleted by a publish the record has not caught up with
+        logger.warning(f"{e}, loading the current version instead")
 
-        except Exception as e:
-            logger.error(
-                f"Failed to load vectorstore from cache for session_id: {session_id}: {e}"
-            )
-            raise RuntimeError("Failed to load vectorstore from cache") from e
+    try:
+        version = await resolve_vector_store_version(user_email, refresh=True)
+        return await _load_vector_db_version(session_id, user_email, version)
+    except FileNotFoundError as e:
+        logger.error(f"Failed to load vectorstore for {user_email}: {e}")
+        raise RuntimeError("Failed to load vectorstore") from e
+
+
+async def _load_vector_db_version(session_id, user_email, version):
+    cache_key = vector_store_key(user_email, version)
+    await redis_client.setex(session_vector_store_key(session_id), 3600, cache_key)
+
+    vectorstore = vector_store_cache.get(cache_key)
+    if vectorstore is not None:
+        logger.info(f"Loaded vectorstore {cache_key} from worker cache")
+        vectorstore.cache_key = cache_key
+        return vectorstore
+
+    load = _inflight_loads.get(cache_key)
+    if load is None:
+        load = asyncio.ensure_future(
+            _load_uncached_vector_db(cache_key, user_email, version)
+        )
+        _inflight_loads[cache_key] = load
+        load.add_done_callback(lambda _: _inflight_loads.pop(cache_key, None))
     else:
-        with tempfile.TemporaryDirectory() as temp_dir:
+        load_stats["coalesced"] += 1
+        logger.info(f"Waiting for in-flight load of vectorstore {cache_key}")
+
+    # Shield the shared load so one cancelled request does not cancel it for the others
+    vectorstore = await asyncio.shield(load)
+    # Lets results computed against this version be cached under its key
+    vectorstore.cache_key = cache_key
+    return vectorstore
+
+
+def _query_embeddings(manifest, user_email):
+    """
+    Return the embeddings to embed queries against a vector store with.
+
+    Queries must be embedded by the model the store was built with, recorded in its manifest,
+    which is not the tenant's configured backend after a switch until the store is rebuilt.
+
+    :param manifest: The manifest of the vector store, or None for stores built without one.
+    :param user_email: The owner of the vector store.
+    :return: A LangChain Embeddings instance.
+    """
+    model = manifest.get("embedding_model") if manifest else None
+    return get_embeddings_for_model(model, resolve_embedding_backend(user_email))
+
+
+def _load_vector_db_from_disk(cache_key, user_email):
+    disk_path = vector_store_disk_cache.get(cache_key)
+    if not disk_path:
+        return None
+    try:
+        vectorstore = load_vectorstore_from_dir(
+            disk_path, _query_embeddings(load_manifest(disk_path), user_email)
+        )
+        vector_store_cache.put(cache_key, vectorstore)
+        logger.info(f"Loaded vectorstore {cache_key} from disk cache")
+        return vectorstore
+    except Exception as e:
+        logger.warning(f"Failed to load vectorstore {cache_key} from disk cache: {e}")
+        return None
+
+
+async def _load_uncached_vector_db(cache_key, user_email, version):
+    # File I/O and deserialization block, every tier runs them off the event loop
+    vectorstore = await asyncio.to_thread(_load_vector_db_from_disk, cache_key, user_email)
+    if vectorstore is not None:
+        return vectorstore
+
+    vectorstore = await _load_vector_db_from_redis(cache_key, user_email)
+    if vectorstore is not None:
+        return vectorstore
+
+    # Only one worker downloads from GCS, the others wait for it to fill Redis
+    lock_key = f"{cache_key}:lock"
+    token = str(uuid.uuid4())
+    acquired = await redis_client.set(
+        lock_key, token, nx=True, ex=VECTOR_STORE_LOAD_LOCK_TIMEOUT
+    )
+    if not acquired:
+        load_stats["lock_waits"] += 1
+        vectorstore = await _wait_for_vector_db_in_redis(cache_key, lock_key, user_email)
+        if vectorstore is not None:
+            return vectorstore
+        logger.warning(f"Gave up waiting for vectorstore {cache_key}, loading it from GCS")
+
+    try:
+        return await _load_vector_db_from_gcp(cache_key, user_email, version)
+    finally:
+        if acquired:
             try:
-                source_file_path = f"{DATA_FOLDER}/{user_email}/{VECTOR_STORE_FOLDER}"
-                download_from_gcp(BUCKET_NAME, source_file_path, temp_dir)
-
-                db_path = temp_dir
-                if not (
-                    os.path.exists(os.path.join(db_path, "index.faiss"))
-                    and os.path.exists(os.path.join(db_path, "index.pkl"))
-                ):
-                    raise FileNotFoundError(f"Required files not found in {db_path}")
-
-                vectorstore = FAISS.load_local(
-                    db_path, OpenAIEmbeddings(), allow_dangerous_deserialization=True
-                )
-
-                # Serialize the index and metadata to byte strings
-                index = vectorstore.index
-                index_data = faiss.serialize_index(index).tobytes()
-
-                with open(os.path.join(db_path, "index.pkl"), "rb") as f:
-                    metadata = pickle.load(f)
-                metadata_data = pickle.dumps(metadata)
-
-                # metadata_data = pickle.dumps(metadata)
-
-                await redis_client.setex(
-                    f"{session_id}_metadata", 3600, metadata_data
-                )  # Cache with TTL of 1 hour
-
-                await redis_client.setex(
-                    f"{session_id}_index", 3600, index_data
-                )  # Cache with TTL of 1 hour
-
-                logger.info(
-                    f"Loaded vectorstore from GCS and cached for session_id: {session_id}"
-                )
-                return vectorstore
-            except GoogleCloudError as e:
-                logger.error(
-                    f"Failed to download vectorstore from GCS for session_id: {session_id}: {e}"
-                )
-                raise RuntimeError("Failed to download vectorstore from GCS") from e
+                await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
             except Exception as e:
-                logger.error(
-                    f"Failed to load vectorstore for session_id: {session_id}: {e}"
-                )
-                raise RuntimeError("Failed to load vectorstore") from e
+                # The lock expires on its own
+                logger.warning(f"Failed to release load lock for {cache_key}: {e}")
+
+
+async def _load_vector_db_from_redis(cache_key, user_email):
+    cached_index = await redis_client.get(f"{cache_key}:index")
+    cached_metadata = await redis_client.get(f"{cache_key}:metadata")
+    if not (cached_index and cached_metadata):
+        return None
+    cached_sparse = await redis_client.get(f"{cache_key}:sparse") or b""
+    cached_manifest = await redis_client.get(f"{cache_key}:manifest") or b""
+
+    def load():
+        manifest = json.loads(cached_manifest) if cached_manifest else None
+        vectorstore = load_vectorstore_from_bytes(
+            cached_index,
+            cached_metadata,
+            _query_embeddings(manifest, user_email),
+            cached_sparse,
+        )
+        vector_store_cache.put(
+            cache_key,
+            vectorstore,
+            len(cached_index) + len(cached_metadata) + len(cached_sparse),
+        )
+        files = {
+            "index.faiss": cached_index,
+            docstore_filename(cached_metadata): cached_metadata,
+        }
+        if cached_sparse:
+            files[SPARSE_INDEX_FILENAME] = cached_sparse
+        if cached_manifest:
+            files[MANIFEST_FILENAME] = cached_manifest
+        vector_store_disk_cache.put_files(cache_key, files)
+        return vectorstore
 
+    try:
+        vectorstore = await asyncio.to_thread(load)
+        logger.info(f"Loaded vectorstore {cache_key} from cache")
+        return vectorstore
+
+    except Exception as e:
+        logger.error(f"Failed to load vectorstore {cache_key} from cache: {e}")
+        raise RuntimeError("Failed to load vectorstore from cache") from e
+
+
+async def _wait_for_vector_db_in_redis(cache_key, lock_key, user_email):
+    """Poll Redis until the lock holder has cached the vector store or released the lock."""
+    delay = 0.05
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + VECTOR_STORE_LOAD_LOCK_TIMEOUT
+    while loop.time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        if await redis_client.exists(f"{cache_key}:index"):
+            return await _load_vector_db_from_redis(cache_key, user_email)
+        if not await redis_client.exists(lock_key):
+            # The holder failed or finished without caching, try Redis one last time
+            return await _load_vector_db_from_redis(cache_key, user_email)
+    return None
+
+
+def _read_vector_store_files(db_path):
+    """
+    Read the files of a downloaded vector store, already in the serialized form we cache.
 
-def create_vector_db_locally(data_path, db_faiss_path):
+    :return: The index, docstore, sparse index and manifest bytes, the last two empty for
+        vector stores built without them.
+    """
+    docstore_path = find_docstore_file(db_path)
+    if not (os.path.exists(os.path.join(db_path, "index.faiss")) and docstore_path):
+        raise FileNotFoundError(f"Required files not found in {db_path}")
+
+    with open(os.path.join(db_path, "index.faiss"), "rb") as f:
+        index_data = f.read()
+
+    with open(docstore_path, "rb") as f:
+        metadata_data = f.read()
+
+    sparse_data = b""
+    if os.path.exists(os.path.join(db_path, SPARSE_INDEX_FILENAME)):
+        with open(os.path.join(db_path, SPARSE_INDEX_FILENAME), "rb") as f:
+            sparse_data = f.read()
+
+    manifest_data = b""
+    if os.path.exists(os.path.join(db_path, MANIFEST_FILENAME)):
+        with open(os.path.join(db_path, MANIFEST_FILENAME), "rb") as f:
+            manifest_data = f.read()
+
+    return index_data, metadata_data, sparse_data, manifest_data
+
+
+def _cache_downloaded_vector_db(cache_key, db_path, user_email, size):
+    disk_path = vector_store_disk_cache.put_dir(cache_key, db_path)
+    vectorstore = load_vectorstore_from_dir(
+        disk_path, _query_embeddings(load_manifest(disk_path), user_email)
+    )
+    vector_store_cache.put(cache_key, vectorstore, size)
+    return vectorstore
+
+
+async def _load_vector_db_from_gcp(cache_key, user_email, version):
+    load_stats["cold_loads"] += 1
+    # Only the version the cache key names may be cached under it, if it was deleted since
+    # the FileNotFoundError tells load_vector_db to resolve the current one
+    source_file_path = await asyncio.to_thread(
+        resolve_vector_store_folder,
+        f"{DATA_FOLDER}/{user_email}/{VECTOR_STORE_FOLDER}",
+        version,
+    )
+    with vector_store_disk_cache.staging() as temp_dir:
+        try:
+            db_path = os.path.join(temp_dir, VECTOR_STORE_FOLDER)
+            await download_from_gcp_async(BUCKET_NAME, source_file_path, db_path)
+
+            index_data, metadata_data, sparse_data, manifest_data = await asyncio.to_thread(
+                _read_vector_store_files, db_path
+            )
+
+            # Write the docstore first, waiters start loading once the index key appears
+            await redis_client.setex(
+                f"{cache_key}:manifest", 3600, manifest_data
+            )  # Cache with TTL of 1 hour
+
+            await redis_client.setex(
+                f"{cache_key}:sparse", 3600, sparse_data
+            )  # Cache with TTL of 1 hour
+
+            await redis_client.setex(
+                f"{cache_key}:metadata", 3600, metadata_data
+            )  # Cache with TTL of 1 hour
+
+            await redis_client.setex(
+                f"{cache_key}:index", 3600, index_data
+            )  # Cache with TTL of 1 hour
+
+            # Keep the downloaded files on the disk tier instead of discarding them
+            vectorstore = await asyncio.to_thread(
+                _cache_downloaded_vector_db,
+                cache_key,
+                db_path,
+                user_email,
+                len(index_data) + len(metadata_data) + len(sparse_data),
+            )
+
+            logger.info(f"Loaded vectorstore {cache_key} from GCS and cached")
+            return vectorstore
+        except GoogleCloudError as e:
+            logger.error(f"Failed to download vectorstore from GCS for {cache_key}: {e}")
+            raise RuntimeError("Failed to download vectorstore from GCS") from e
+        except Exception as e:
+            logger.error(f"Failed to load vectorstore {cache_key}: {e}")
+            raise RuntimeError("Failed to load vectorstore") from e
+
+
+def _ingestion_stages(fetch, fetch_concurrency, embeddings):
+    return [
+        ("fetch", fetch_stage(fetch, fetch_concurrency)),
+        ("parse", parse_stage()),
+        ("split", split_stage(get_chunker())),
+        ("embed", embed_stage(embeddings)),
+    ]
+
+
+def build_vector_db(
+    filenames,
+    fetch,
+    db_faiss_path,
+    index_type,
+    fingerprints,
+    fetch_concurrency=1,
+    on_progress=None,
+    embedding_backend=None,
+):
+    """
+    Build a vector database by streaming files through the ingestion pipeline.
+
+    Files are fetched, parsed, split, embedded and written to the index concurrently, with
+    bounded buffers between the stages, so memory does not grow with the number of files.
+
+    :param filenames: The names of the PDF files to index, chunks keep their order.
+    :param fetch: A function returning the local path of a file from its name, or None to
+        skip it.
+    :param db_faiss_path: The path where the vector database will be saved.
+    :param index_type: The FAISS index type, see app.core.index_factory.INDEX_TYPES.
+    :param fingerprints: A dict mapping the file names to their content fingerprints.
+    :param fetch_concurrency: The number of files fetched at a time.
+    :param on_progress: A function called with the live per-stage stats as files go through.
+    :param embedding_backend: The embedding backend, see embeddings.EMBEDDING_BACKENDS.
+    :return: The per-stage stats of the pipeline, see ingestion_pipeline.run_pipeline.
+    """
+    embeddings = chunk_embedding_store.wrap(get_ingestion_embeddings(embedding_backend))
+    with tempfile.TemporaryDirectory() as spill_dir:
+        writer = VectorStoreWriter(
+            db_faiss_path,
+            index_type,
+            fingerprints,
+            embedding_model_name(embeddings),
+            spill_dir,
+        )
+        count, stats = run_pipeline(
+            filenames,
+            _ingestion_stages(fetch, fetch_concurrency, embeddings),
+            writer.write,
+            on_progress=on_progress,
+        )
+    log_pipeline_stats(stats)
+    logger.info(f"Created vector database with {count} chunks at {db_faiss_path}")
+    return stats
+
+
+def update_vector_db(
+    filenames,
+    fetch,
+    source_db_path,
+    db_faiss_path,
+    removed,
+    fingerprints,
+    fetch_concurrency=1,
+    on_progress=None,
+    embedding_backend=None,
+):
+    """
+    Update a vector database in place of a rebuild, streaming only the added files through
+    the ingestion pipeline.
+
+    :param filenames: The names of the files to add.
+    :param fetch: A function returning the local path of a file from its name, or None to
+        skip it.
+    :param source_db_path: The folder holding the existing vector database and its manifest.
+    :param db_faiss_path: The path where the updated vector database will be saved, may be
+        the same as source_db_path.
+    :param removed: The names of the files to remove.
+    :param fingerprints: A dict mapping the added file names to their content fingerprints.
+    :param fetch_concurrency: The number of files fetched at a time.
+    :param on_progress: A function called with the live per-stage stats as files go through.
+    :param embedding_backend: The embedding backend, see embeddings.EMBEDDING_BACKENDS.
+    :return: The per-stage stats of the pipeline, see ingestion_pipeline.run_pipeline.
+    """
+    manifest = load_manifest(source_db_path)
+    embeddings = chunk_embedding_store.wrap(get_ingestion_embeddings(embedding_backend))
+    # Read fully, the index is modified before it is written back
+    index = faiss.read_index(os.path.join(source_db_path, "index.faiss"))
+    docstore, index_to_docstore_id = load_docstore_file(source_db_path)
+    vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    removed_count = remove_files(vectorstore, manifest, removed)
+    track_files(manifest, {filename: fingerprints[filename] for filename in filenames})
+
+    def add_batches(batches):
+        return sum(
+            add_documents(vectorstore, manifest, documents, vectors)
+            for documents, vectors in batches
+        )
+
+    added_count, stats = run_pipeline(
+        filenames,
+        _ingestion_stages(fetch, fetch_concurrency, embeddings),
+        add_batches,
+        on_progress=on_progress,
+    )
+
+    save_vectorstore(vectorstore, db_faiss_path)
+    save_manifest(db_faiss_path, manifest)
+    log_pipeline_stats(stats)
+    logger.info(
+        f"Updated vector database at {db_faiss_path}: "
+        f"{added_count} chunks added from {len(filenames)} files, "
+        f"{removed_count} chunks removed from {len(removed)} files"
+    )
+    return stats
+
+
+def _list_pdfs_locally(data_path):
+    return sorted(filename for filename in os.listdir(data_path) if filename.endswith(".pdf"))
+
+
+def create_vector_db_locally(data_path, db_faiss_path, index_type="flat", fingerprints=None):
     """
     Create a vector database from documents in the specified data path and save it locally.
 
+    A manifest of the chunk labels of every file is saved with it so the database can later be
+    updated with update_vector_db_locally.
+
     :param data_path: The path to the data folder containing documents.
     :param db_faiss_path: The path where the vector database will be saved.
+    :param index_type: The FAISS index type, see app.core.index_factory.INDEX_TYPES.
+    :param fingerprints: A dict mapping the PDF file names to their content fingerprints,
+        computed from the files if not given.
+    :return: The per-stage stats of the ingestion pipeline.
     :raises RuntimeError: If creating the vector database fails.
     """
     try:
-        loader = DirectoryLoader(data_path, glob="*.pdf", loader_cls=PyPDFLoader)
-        documents = loader.load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        texts = splitter.split_documents(documents)
-        embeddings = OpenAIEmbeddings()
-        vectorstore = FAISS.from_documents(texts, embeddings)
-        vectorstore.save_local(db_faiss_path)
-        logger.info(f"Created vector database and saved at {db_faiss_path}")
+        filenames = _list_pdfs_locally(data_path)
+        if fingerprints is None:
+            fingerprints = {
+                filename: file_fingerprint(os.path.join(data_path, filename))
+                for filename in filenames
+            }
+        return build_vector_db(
+            filenames,
+            lambda filename: os.path.join(data_path, filename),
+            db_faiss_path,
+            index_type,
+            fingerprints,
+        )
     except Exception as e:
         logger.error(f"Failed to create vector database: {e}")
         raise RuntimeError("Failed to create vector database") from e
 
 
-def create_vector_db_gcp(user_email):
+def update_vector_db_locally(
+    data_path, source_db_path, db_faiss_path, added, removed, fingerprints
+):
+    """
+    Update a vector database in place of a rebuild, embedding only the added files.
+
+    :param data_path: The folder containing the added PDFs.
+    :param source_db_path: The folder holding the existing vector database and its manifest.
+    :param db_faiss_path: The path where the updated vector database will be saved, may be
+        the same as source_db_path.
+    :param added: The names of the files to add.
+    :param removed: The names of the files to remove.
+    :param fingerprints: A dict mapping the added file names to their content fingerprints.
+    :return: The per-stage stats of the ingestion pipeline.
+    :raises RuntimeError: If updating the vector database fails.
     """
-    Process user data by downloading resources from GCP, creating a vector database, and uploading it back to GCP.
+    try:
+        return update_vector_db(
+            added,
+            lambda filename: os.path.join(data_path, filename),
+            source_db_path,
+            db_faiss_path,
+            removed,
+            fingerprints,
+        )
+    except Exception as e:
+        logger.error(f"Failed to update vector database: {e}")
+        raise RuntimeError("Failed to update vector database") from e
+
+
+def _sync_vector_db_gcp(user_email, pdf_list=None, on_progress=None):
+    """
+    Bring a user's vector database in GCS in line with their PDFs.
+
+    Only files that are new or changed since the last build are downloaded and embedded, and
+    the chunks of deleted files are removed. The database is rebuilt from scratch when it has
+    no manifest or can no longer be updated in place. Files are downloaded as the ingestion
+    pipeline asks for them, so parsing and embedding start with the first file.
 
     :param user_email: The email of the user.
-    :raises RuntimeError: If any step in processing user data fails.
+    :param pdf_list: The names of the PDFs to index, all PDFs of the user if not given.
+    :param on_progress: A function called with the current phase ("planning", "ingesting",
+        "uploading") and, once ingestion started, the per-stage stats of the pipeline.
     """
+    report = on_progress or (lambda phase, stats=None: None)
     user_folder = f"{DATA_FOLDER}/{user_email}"
     resources_folder = f"{user_folder}/{RESOURCE_FOLDER}"
     user_vector_store_folder = f"{user_folder}/{VECTOR_STORE_FOLDER}"
 
+    fingerprints = list_resource_fingerprints(user_email)
+    if pdf_list is not None:
+        for pdf in pdf_list:
+            if pdf not in fingerprints:
+                logger.warning(f"File {pdf} not found for {user_email}")
+        fingerprints = {pdf: fingerprints[pdf] for pdf in pdf_list if pdf in fingerprints}
+
     with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            # Download the data from the GCS bucket
-            download_from_gcp(BUCKET_NAME, resources_folder, temp_dir)
-            logger.info(f"Downloaded user data for {user_email} to {temp_dir}")
-
-            # Create a local vector database
-            db_faiss_path = Path(temp_dir, VECTOR_STORE_FOLDER)
-            create_vector_db_locally(temp_dir, db_faiss_path)
-
-            # Upload the vector database to the GCS bucket
-            upload_to_gcp(BUCKET_NAME, db_faiss_path, user_vector_store_folder)
-            logger.info(
-                f"Uploaded vector database for {user_email} to {BUCKET_NAME}/{user_vector_store_folder}"
+        pdf_dir = os.path.join(temp_dir, RESOURCE_FOLDER)
+        existing_db_path = os.path.join(temp_dir, "existing")
+        db_faiss_path = Path(temp_dir, VECTOR_STORE_FOLDER)
+        index_type = resolve_index_type(user_email)
+        embedding_backend = resolve_embedding_backend(user_email)
+
+        def fetch(pdf):
+            download_file_from_gcp(BUCKET_NAME, f"{resources_folder}/{pdf}", pdf_dir)
+            path = os.path.join(pdf_dir, pdf)
+            return path if os.path.exists(path) else None
+
+        report("planning")
+        download_from_gcp(
+            BUCKET_NAME,
+            resolve_vector_store_folder(user_vector_store_folder),
+            existing_db_path,
+        )
+        reason = "no existing vector database"
+        if os.path.exists(os.path.join(existing_db_path, "index.faiss")):
+            reason = rebuild_reason(
+                load_manifest(existing_db_path),
+                read_index_mmap(os.path.join(existing_db_path, "index.faiss")),
+                index_type,
+                embedding_model_name(get_embeddings(embedding_backend)),
+                VECTOR_INDEX_TRAIN_THRESHOLD,
             )
-        except RuntimeError as e:
-            logger.error(f"Failed to process data for user {user_email}: {e}")
-            raise
-        except Exception as e:
-            logger.error(
-                f"An unexpected error occurred while processing data for user {user_email}: {e}"
+
+        if reason is None:
+            added, removed = plan_update(load_manifest(existing_db_path), fingerprints)
+            if not (added or removed):
+                logger.info(f"Vector database for {user_email} is up to date")
+                return
+
+            logger.info(f"Updating vector database for {user_email} with {len(added)} files")
+            stats = update_vector_db(
+                added,
+                fetch,
+                existing_db_path,
+                db_faiss_path,
+                removed,
+                fingerprints,
+                GCS_TRANSFER_CONCURRENCY,
+                lambda stats: report("ingesting", stats),
+                embedding_backend,
+            )
+        else:
+            logger.info(f"Rebuilding vector database for {user_email}: {reason}")
+            stats = build_vector_db(
+                sorted(fingerprints),
+                fetch,
+                db_faiss_path,
+                index_type,
+                fingerprints,
+                GCS_TRANSFER_CONCURRENCY,
+                lambda stats: report("ingesting", stats),
+                embedding_backend,
             )
-            raise RuntimeError("Failed to process user data") from e
 
+        report("uploading", stats)
+        # Upload the vector database to the GCS bucket, readers switch once it is complete
+        version = publish_vector_store(BUCKET_NAME, db_faiss_path, user_vector_store_folder)
+        refresh_vector_store_version(user_email)
+        logger.info(
+            f"Uploaded vector database for {user_email} to {BUCKET_NAME}/{user_vector_store_folder} as version {version}"
+        )
 
-def create_vector_db_for_selected_pdfs(user_email, pdf_list):
+
+def create_vector_db_gcp(user_email, on_progress=None):
     """
-    Process user data by downloading resources from GCP, creating a vector database, and uploading it back to GCP.
+    Process user data by downloading resources from GCP, creating or updating the vector
+    database, and uploading it back to GCP.
 
     :param user_email: The email of the user.
+    :param on_progress: A function reporting the progress of the build, see _sync_vector_db_gcp.
     :raises RuntimeError: If any step in processing user data fails.
     """
-    user_folder = f"{DATA_FOLDER}/{user_email}"
-    resources_folder = f"{user_folder}/{RESOURCE_FOLDER}"
-    user_vector_store_folder = f"{user_folder}/{VECTOR_STORE_FOLDER}"
+    try:
+        _sync_vector_db_gcp(user_email, on_progress=on_progress)
+    except RuntimeError as e:
+        logger.error(f"Failed to process data for user {user_email}: {e}")
+        raise
+    except Exception as e:
+        logger.error(
+            f"An unexpected error occurred while processing data for user {user_email}: {e}"
+        )
+        raise RuntimeError("Failed to process user data") from e
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            # Download the data from the GCS bucket
-            for pdf in pdf_list:
-                download_file_from_gcp(
-                    BUCKET_NAME, f"{resources_folder}/{pdf}", temp_dir
-                )
-                logger.info(f"Downloaded file {pdf} for {user_email}")
-
-            logger.info(f"Downloaded user data for {user_email} to {temp_dir}")
-
-            # Create a local vector database
-            db_faiss_path = Path(temp_dir, VECTOR_STORE_FOLDER)
-            create_vector_db_locally(temp_dir, db_faiss_path)
-
-            # Upload the vector database to the GCS bucket
-            upload_to_gcp(BUCKET_NAME, db_faiss_path, user_vector_store_folder)
-            logger.info(
-                f"Uploaded vector database for {user_email} to {BUCKET_NAME}/{user_vector_store_folder}"
-            )
-        except RuntimeError as e:
-            logger.error(f"Failed to process data for user {user_email}: {e}")
-            raise
-        except Exception as e:
-            logger.error(
-                f"An unexpected error occurred while processing data for user {user_email}: {e}"
-            )
-            raise RuntimeError("Failed to process user data") from e
+
+def create_vector_db_for_selected_pdfs(user_email, pdf_list, on_progress=None):
+    """
+    Process user data by downloading the selected resources from GCP, creating or updating the
+    vector database over them, and uploading it back to GCP.
+
+    :param user_email: The email of the user.
+    :param pdf_list: The names of the PDFs to index.
+    :param on_progress: A function reporting the progress of the build, see _sync_vector_db_gcp.
+    :raises RuntimeError: If any step in processing user data fails.
+    """
+    try:
+        _sync_vector_db_gcp(user_email, pdf_list, on_progress)
+    except RuntimeError as e:
+        logger.error(f"Failed to process data for user {user_email}: {e}")
+        raise
+    except Exception as e:
+        logger.error(
+            f"An unexpected error occurred while processing data for user {user_email}: {e}"
+        )
+        raise RuntimeError("Failed to process user data") from e
 
 
 def download_vector_db(session_id, user_email):
@@ -230,18 +809,35 @@ def download_vector_db(session_id, user_email):
 
     with tempfile.TemporaryDirectory() as temp_dir:
         try:
-            source_file_path = f"{DATA_FOLDER}/{user_email}/{VECTOR_STORE_FOLDER}"
+            source_file_path = resolve_vector_store_folder(
+                f"{DATA_FOLDER}/{user_email}/{VECTOR_STORE_FOLDER}"
+            )
             download_from_gcp(BUCKET_NAME, source_file_path, temp_dir)
 
             db_path = temp_dir
             if not (
                 os.path.exists(os.path.join(db_path, "index.faiss"))
-                and os.path.exists(os.path.join(db_path, "index.pkl"))
+                and find_docstore_file(db_path)
             ):
                 raise FileNotFoundError(f"Required files not found in {db_path}")
 
-            vectorstore = FAISS.load_local(
-                db_path, OpenAIEmbeddings(), allow_dangerous_deserialization=True
+            # Read the files fully, the temporary directory is removed on return
+            with open(os.path.join(db_path, "index.faiss"), "rb") as f:
+                index_data = f.read()
+
+            with open(find_docstore_file(db_path), "rb") as f:
+                metadata_data = f.read()
+
+            sparse_data = None
+            if os.path.exists(os.path.join(db_path, SPARSE_INDEX_FILENAME)):
+                with open(os.path.join(db_path, SPARSE_INDEX_FILENAME), "rb") as f:
+                    sparse_data = f.read()
+
+            vectorstore = load_vectorstore_from_bytes(
+                index_data,
+                metadata_data,
+                _query_embeddings(load_manifest(db_path), user_email),
+                sparse_data,
             )
 
             return vectorstore
@@ -0,0 +1,115 @@
+import os
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
+from langchain_core.documents import Document
+from logging_config import logger
+from .config import PDF_PARSE_WORKERS, PDF_PAGES_PER_TASK
+
+
+def parse_worker_count(workers=PDF_PARSE_WORKERS):
+    """Return the number of parsing processes, one per CPU when not configured."""
+    return workers or os.cpu_count() or 1
+
+
+def _parse_page_range(pdf_path, start, end):
+    """
+    Extract the text of a range of pages, as PyPDFLoader does.
+
+    :return: A list of (text, page number) tuples.
+    """
+    reader = pypdf.PdfReader(pdf_path)
+    return [(reader.pages[page].extract_text(), page) for page in range(start, end)]
+
+
+def _page_count(pdf_path):
+    return len(pypdf.PdfReader(pdf_path).pages)
+
+
+def plan_parse_tasks(pdf_path, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Split a PDF into page ranges small enough to balance the work across processes.
+
+    :param pdf_path: The path of the PDF file.
+    :param pages_per_task: The maximum number of pages parsed by one task.
+    :return: A list of (path, start page, end page) tuples in page order.
+    """
+    pages = _page_count(pdf_path)
+    return [
+        (pdf_path, start, min(start + pages_per_task, pages))
+        for start in range(0, pages, pages_per_task)
+    ]
+
+
+def _to_documents(pdf_path, pages):
+    return [
+        Document(page_content=text, metadata={"source": pdf_path, "page": page})
+        for text, page in pages
+    ]
+
+
+def iter_parse_pdfs(pdf_paths, workers=PDF_PARSE_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Parse PDFs into page Documents, spreading files and page ranges across processes.
+
+    Yields one list of pages per page range, in file order then page order, with the same
+    "source" and "page" metadata as PyPDFLoader whatever the number of processes. pdf_paths
+    may be a lazy iterable; at most two ranges per process are in flight, so memory stays
+    bounded however many pages are parsed. Workers are spawned rather than forked since the
+    API process runs threads.
+
+    :param pdf_paths: The paths of the PDF files.
+    :param workers: The number of processes, one per CPU if 0.
+    :param pages_per_task: The maximum number of pages parsed by one task.
+    :return: An iterator of lists of page Documents.
+    """
+    workers = parse_worker_count(workers)
+    tasks = (
+        task
+        for pdf_path in pdf_paths
+        for task in plan_parse_tasks(str(pdf_path), pages_per_task)
+    )
+    # Plan up to one task per process before starting the pool, so a handful of pages is
+    # parsed in-process rather than paying for the pool startup, and no idle process is
+    # spawned
+    planned = list(itertools.islice(tasks, workers))
+    workers = min(workers, len(planned)) or 1
+    tasks = itertools.chain(planned, tasks)
+
+    if workers <= 1:
+        for task in tasks:
+            yield _to_documents(task[0], _parse_page_range(*task))
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append((task[0], executor.submit(_parse_page_range, *task)))
+            if len(in_flight) >= 2 * workers:
+                pdf_path, future = in_flight.popleft()
+                yield _to_documents(pdf_path, future.result())
+        while in_flight:
+            pdf_path, future = in_flight.popleft()
+            yield _to_documents(pdf_path, future.result())
+
+
+def parse_pdfs(pdf_paths, workers=PDF_PARSE_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Parse PDFs into one Document per page, see iter_parse_pdfs.
+
+    :param pdf_paths: The paths of the PDF files.
+    :param workers: The number of processes, one per CPU if 0.
+    :param pages_per_task: The maximum number of pages parsed by one task.
+    :return: The list of page Documents.
+    """
+    pdf_paths = [str(pdf_path) for pdf_path in pdf_paths]
+    documents = [
+        document
+        for pages in iter_parse_pdfs(pdf_paths, workers, pages_per_task)
+        for document in pages
+    ]
+    logger.info(f"Parsed {len(documents)} pages from {len(pdf_paths)} PDFs")
+    return documents
@@ -4,11 +4,17 @@ from langchain_core.prompts import PromptTemplate
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import CTransformers
 from .openAI_embeddings import load_vector_db
+from .query_embedding_cache import query_embedding_cache
+from .retrieval import batch_search, retrieval_mode
+from .retrieval_cache import retrieval_cache
+from .answer_cache import answer_cache
 from langchain_core.output_parsers import StrOutputParser
 from langchain.memory import ConversationBufferMemory
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from pathlib import Path
 import uuid
+import time
+import hashlib
 
 from langchain_core.prompts import (
     SystemMessagePromptTemplate,
@@ -19,7 +25,7 @@ from langchain_core.prompts import (
 from langchain.callbacks.base import BaseCallbackHandler
 from logging_config import logger
 from typing import Any, Dict, List
-from app.core.config import templates
+from app.core.config import templates, RETRIEVAL_MMR_LAMBDA, ANSWER_CACHE_ENABLED
 
 qa_template = templates["qa"]
 
@@ -43,24 +49,32 @@ def set_custom_prompt():
     return chat_prompt
 
 
+qa_model_name = "gpt-3.5-turbo"
+_answer_fingerprint = hashlib.sha256(
+    f"{qa_model_name}\n{system_template}\n{human_template}".encode("utf-8")
+).hexdigest()[:16]
+
+
 def load_llm():
-    llm = ChatOpenAI(model="gpt-3.5-turbo", verbose=True)
+    llm = ChatOpenAI(model=qa_model_name, verbose=True)
     return llm
 
 
-async def get_context_from_vector_db(query: str, request: Request, user_email: str):
+def _session_id(request: Request):
     session_id = request.state.session_id
     if not session_id:
         session_id = str(uuid.uuid4())
         request.state.session_id = session_id
+    return session_id
 
-    db = await load_vector_db(session_id, user_email)
-
-    docs_with_scores = db.similarity_search_with_score(query, k=4)
 
-    # Sort results by score (lower is better) and select top 2
-    docs_with_scores.sort(key=lambda x: x[1])
-    top_results = docs_with_scores[:2]
+async def get_context_from_vector_db(query: str, db):
+    # Fuse BM25 and dense rankings, then pick the context chunks by maximal marginal relevance
+    # so near duplicates do not fill it. Repeated questions against the same vector store
+    # version skip the embedding and the search.
+    top_results = await retrieval_cache.search(
+        db, query, k=2, lambda_mult=RETRIEVAL_MMR_LAMBDA
+    )
 
     if top_results:
         context = "\n".join(
@@ -71,6 +85,28 @@ async def get_context_from_vector_db(query: str, request: Request, user_email: s
     return ""
 
 
+async def search_vector_db_batch(
+    queries: List[str], request: Request, user_email: str, k: int = 4
+):
+    """
+    Search a user's vector store for several queries at once.
+
+    The queries are embedded in one request and searched with one FAISS matrix search, so a
+    topic sweep costs one round trip instead of one per query.
+
+    :param queries: The query texts.
+    :param request: The request carrying the session.
+    :param user_email: The user whose vector store is searched.
+    :param k: The number of chunks returned per query.
+    :return: The retrieval mode the scores come from, see retrieval_mode, and a list with,
+        for every query, a list of (Document, score) tuples, best first.
+    """
+    db = await load_vector_db(_session_id(request), user_email)
+    embeddings = await query_embedding_cache.embed_queries(db.embedding_function, queries)
+    mode = retrieval_mode(db)
+    return mode, batch_search(db, queries, embeddings, k=k, mode=mode)
+
+
 def debuggingLLM(data: dict):
     print("========debugging start==========\n\n")
     print(f"chat history: {data['chat_history']}\n\n")
@@ -99,11 +135,28 @@ class CustomHandler(BaseCallbackHandler):
 
 
 async def final_result(query, chat_history, request: Request, user_email: str):
-    context = await get_context_from_vector_db(query, request, user_email)
+    # Questions without history may be answered from the semantic cache, the answer depends on
+    # the vector store version, the model and the prompt
+    db = await load_vector_db(_session_id(request), user_email)
+    cache_key = None
+    if ANSWER_CACHE_ENABLED and not (chat_history or "").strip():
+        if getattr(db, "cache_key", None):
+            cache_key = f"{db.cache_key}:{_answer_fingerprint}"
+            embedding = await query_embedding_cache.embed_query(db.embedding_function, query)
+            answer = await answer_cache.lookup(cache_key, embedding)
+            if answer is not None:
+                return answer
+
+    start = time.perf_counter()
+    context = await get_context_from_vector_db(query, db)
     prompt = set_custom_prompt()
     chain = qa_bot(prompt)
     input_data = {"chat_history": chat_history, "question": query, "context": context}
     chain_response = chain.invoke(input_data, config={"callbacks": [CustomHandler()]})
+    if cache_key and chain_response:
+        await answer_cache.store(
+            cache_key, embedding, chain_response, time.perf_counter() - start
+        )
 
     # debuggingLLM({"chat_history": chat_history, "question": query, "context": context, "response": chain_response})
     return chain_response
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from logging_config import logger
+from .config import (
+    redis_client,
+    redis_sync_client,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+)
+from .embeddings import embedding_model_name
+from .metrics import register_metrics
+
+
+def normalize_query(text):
+    """
+    Normalize a query so trivially different spellings of a question share one cache entry.
+
+    :param text: The raw query.
+    :return: The NFKC-normalized, case-folded query with collapsed whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Two-level cache of query embeddings: an in-process LRU in front of Redis.
+
+    Entries are keyed by the embedding model and a sha256 of the normalized query text, while
+    the model embeds the query as typed, so casing in course codes or acronyms still reaches
+    it on a miss.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, model, normalized_query):
+        digest = hashlib.sha256(normalized_query.encode("utf-8")).hexdigest()
+        return f"qemb:{model}:{digest}"
+
+    def _get_local(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def _put_local(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def embed_query(self, embeddings, query):
+        """
+        Return the embedding of a query, calling the embedding model only on a miss.
+
+        :param embeddings: The embeddings the vector store was built with.
+        :param query: The raw query text.
+        :return: The query embedding as a list of floats.
+        """
+        key = self.key(embedding_model_name(embeddings), normalize_query(query))
+
+        vector = self._get_local(key)
+        if vector is not None:
+            self.local_hits += 1
+            return vector
+
+        try:
+            cached = await redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read query embedding from Redis: {e}")
+            cached = None
+        if cached:
+            self.redis_hits += 1
+            vector = np.frombuffer(cached, dtype=np.float32).tolist()
+            self._put_local(key, vector)
+            return vector
+
+        self.misses += 1
+        vector = await asyncio.to_thread(embeddings.embed_query, query)
+        self._put_local(key, vector)
+        try:
+            await redis_client.setex(
+                key, self.ttl, np.asarray(vector, dtype=np.float32).tobytes()
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache query embedding in Redis: {e}")
+        return vector
+
+    def _plan(self, embeddings, queries):
+        """Key the queries and collect the embeddings found in process."""
+        model = embedding_model_name(embeddings)
+        keys = [self.key(model, normalize_query(query)) for query in queries]
+        # Spellings sharing a key are embedded once, as the first of them was typed
+        texts = {}
+        for key, query in zip(keys, queries):
+            texts.setdefault(key, query)
+        vectors = {}
+        for key in texts:
+            vector = self._get_local(key)
+            if vector is not None:
+                self.local_hits += 1
+                vectors[key] = vector
+        return keys, texts, vectors
+
+    def _add_cached(self, missing, cached, vectors):
+        for key, value in zip(missing, cached):
+            if value:
+                self.redis_hits += 1
+                vectors[key] = np.frombuffer(value, dtype=np.float32).tolist()
+                self._put_local(key, vectors[key])
+
+    def _add_embedded(self, missing, embedded, vectors):
+        self.misses += len(missing)
+        for key, vector in zip(missing, embedded):
+            vectors[key] = vector
+            self._put_local(key, vector)
+
+    async def embed_queries(self, embeddings, queries):
+        """
+        Return the embeddings of several queries, embedding all the misses in one request.
+
+        :param embeddings: The embeddings the vector store was built with.
+        :param queries: The raw query texts.
+        :return: The query embeddings as lists of floats, in the order of the queries.
+        """
+        keys, texts, vectors = self._plan(embeddings, queries)
+
+        missing = [key for key in texts if key not in vectors]
+        if missing:
+            try:
+                cached = await redis_client.mget(missing)
+            except Exception as e:
+                logger.warning(f"Failed to read query embeddings from Redis: {e}")
+                cached = [None] * len(missing)
+            self._add_cached(missing, cached, vectors)
+
+        missing = [key for key in texts if key not in vectors]
+        if missing:
+            embedded = await asyncio.to_thread(
+                embeddings.embed_documents, [texts[key] for key in missing]
+            )
+            self._add_embedded(missing, embedded, vectors)
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for key in missing:
+                    pipeline.setex(
+                        key, self.ttl, np.asarray(vectors[key], dtype=np.float32).tobytes()
+                    )
+                await pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Failed to cache query embeddings in Redis: {e}")
+
+        return [vectors[key] for key in keys]
+
+    def embed_queries_sync(self, embeddings, queries):
+        """
+        Blocking version of embed_queries for callers outside the event loop, such as agent
+        tools.
+        """
+        keys, texts, vectors = self._plan(embeddings, queries)
+
+        missing = [key for key in texts if key not in vectors]
+        if missing:
+            try:
+                cached = redis_sync_client.mget(missing)
+            except Exception as e:
+                logger.warning(f"Failed to read query embeddings from Redis: {e}")
+                cached = [None] * len(missing)
+            self._add_cached(missing, cached, vectors)
+
+        missing = [key for key in texts if key not in vectors]
+        if missing:
+            embedded = embeddings.embed_documents([texts[key] for key in missing])
+            self._add_embedded(missing, embedded, vectors)
+            try:
+                pipeline = redis_sync_client.pipeline(transaction=False)
+                for key in missing:
+                    pipeline.setex(
+                        key, self.ttl, np.asarray(vectors[key], dtype=np.float32).tobytes()
+                    )
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Failed to cache query embeddings in Redis: {e}")
+
+        return [vectors[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL
+)
+register_metrics("query_embedding_cache", query_embedding_cache.stats)
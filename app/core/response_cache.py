@@ -0,0 +1,138 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from logging_config import logger
+from .config import redis_sync_client, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+from .metrics import register_metrics
+
+
+def prompt_fingerprint(model, system_template, human_template):
+    """
+    Fingerprint the model and the prompt a response is generated with, so editing a template
+    or switching models stops serving the responses cached before.
+    """
+    prompt = f"{model}\n{system_template}\n{human_template}"
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Exact-match cache of LLM responses: a size-bounded in-process LRU in front of Redis.
+
+    Entries are keyed by the template name, the prompt_fingerprint and a sha256 of the input
+    text, and expire after the TTL at both levels. Concurrent requests for the same key in a
+    worker share one generation.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def key(self, template, fingerprint, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"llmresp:{template}:{fingerprint}:{digest}"
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.local_hits += 1
+            return response
+
+    def _put_local(self, key, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_generate(self, template, fingerprint, text, generate):
+        """
+        Return the cached response for an input, generating it only on a miss.
+
+        :param template: The name of the prompt template.
+        :param fingerprint: The prompt_fingerprint of the model and the resolved template.
+        :param text: The input text.
+        :param generate: A zero-argument callable producing the response on a miss.
+        :return: The response.
+        """
+        key = self.key(template, fingerprint, text)
+        response = self._get_local(key)
+        if response is not None:
+            return response
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+
+        try:
+            response = self._load_or_generate(key, generate)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load_or_generate(self, key, generate):
+        try:
+            cached = redis_sync_client.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read cached LLM response from Redis: {e}")
+            cached = None
+        if cached is not None:
+            response = cached.decode("utf-8")
+            with self._lock:
+                self.redis_hits += 1
+            self._put_local(key, response)
+            return response
+
+        with self._lock:
+            self.misses += 1
+        response = generate()
+        # Empty responses are reported as failures, let the next request try again
+        if response:
+            self._put_local(key, response)
+            try:
+                redis_sync_client.setex(key, self.ttl, response.encode("utf-8"))
+            except Exception as e:
+                logger.warning(f"Failed to cache LLM response in Redis: {e}")
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+register_metrics("response_cache", response_cache.stats)
@@ -0,0 +1,254 @@
+import threading
+import time
+import faiss
+import numpy as np
+from .config import RETRIEVAL_MODE, RETRIEVAL_FETCH_K, RETRIEVAL_RRF_K
+from .metrics import register_metrics
+from logging_config import logger
+
+retrieval_stats = {
+    "dense_queries": 0,
+    "hybrid_queries": 0,
+    "sparse_seconds": 0.0,
+    "mmr_queries": 0,
+    "mmr_seconds": 0.0,
+    "mmr_fallbacks": 0,
+}
+_stats_lock = threading.Lock()
+register_metrics("retrieval", lambda: dict(retrieval_stats))
+
+
+def reciprocal_rank_fusion(rankings, k=RETRIEVAL_RRF_K):
+    """
+    Fuse rankings with reciprocal rank fusion, each item scoring the sum of 1 / (k + rank).
+
+    :param rankings: Lists of labels, best first.
+    :param k: The RRF constant, larger values flatten the advantage of top ranks.
+    :return: A list of (label, score) tuples, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, label in enumerate(ranking, 1):
+            scores[label] = scores.get(label, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(relevance, vectors, k, lambda_mult):
+    """
+    Pick k candidates by maximal marginal relevance.
+
+    Each pick maximises lambda_mult * relevance - (1 - lambda_mult) * the highest cosine
+    similarity to a candidate already picked, so a near duplicate of a picked chunk loses to a
+    slightly less relevant chunk covering something else. The pairwise similarities are one
+    matrix product and every pick is a few vector operations over the candidates.
+
+    :param relevance: The relevance of each candidate, higher is better, rescaled to [0, 1].
+    :param vectors: The candidate vectors, one row per candidate.
+    :param k: The number of candidates to pick.
+    :param lambda_mult: 1 ranks by relevance alone, 0 by diversity alone.
+    :return: The positions of the picked candidates, in pick order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    count = min(k, len(relevance))
+    if count <= 0:
+        return []
+
+    spread = float(relevance.max() - relevance.min())
+    if spread > 0:
+        relevance = (relevance - relevance.min()) / spread
+    else:
+        relevance = np.ones_like(relevance)
+    unit = np.array(vectors, dtype=np.float32, order="C")
+    faiss.normalize_L2(unit)
+    similarity = unit @ unit.T
+
+    # Ties go to the earlier, better ranked candidate, and a picked candidate's gain drops to
+    # -inf so it is never picked again
+    picked = [int(np.argmax(relevance))]
+    gain = lambda_mult * relevance
+    gain[picked[0]] = -np.inf
+    redundancy = similarity[picked[0]].copy()
+    scores = np.empty_like(gain)
+    for _ in range(1, count):
+        np.multiply(redundancy, 1 - lambda_mult, out=scores)
+        np.subtract(gain, scores, out=scores)
+        i = int(scores.argmax())
+        picked.append(i)
+        gain[i] = -np.inf
+        np.maximum(redundancy, similarity[i], out=redundancy)
+    return picked
+
+
+def retrieval_mode(vectorstore, mode=RETRIEVAL_MODE):
+    """
+    Return the mode batch_search ranks a vector store with, "dense" in "hybrid" mode for
+    vector stores built without a sparse index.
+    """
+    if mode == "hybrid" and getattr(vectorstore, "sparse_index", None) is not None:
+        return "hybrid"
+    return "dense"
+
+
+def dense_search(vectorstore, embeddings, k):
+    """
+    Search the FAISS index of a vector store for several queries in one matrix search.
+
+    :param vectorstore: The LangChain FAISS vector store.
+    :param embeddings: The query embeddings.
+    :param k: The number of results per query.
+    :return: A list with, for every query, a list of (label, distance) tuples, nearest first.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    distances, labels = vectorstore.index.search(vectors, k)
+    return [
+        [
+            (int(label), float(distance))
+            for label, distance in zip(row, row_distances)
+            if label != -1
+        ]
+        for row, row_distances in zip(labels, distances)
+    ]
+
+
+def ranked_documents(vectorstore, scored_labels):
+    """
+    Look up the chunks of a ranking in the docstore, skipping labels no longer stored.
+
+    :param vectorstore: The LangChain FAISS vector store.
+    :param scored_labels: A list of (label, score) tuples.
+    :return: A list of (Document, score) tuples, in the order of the ranking.
+    """
+    results = []
+    for label, score in scored_labels:
+        docstore_id = vectorstore.index_to_docstore_id.get(label)
+        if docstore_id is None:
+            continue
+        document = vectorstore.docstore.search(docstore_id)
+        if not isinstance(document, str):
+            results.append((document, score))
+    return results
+
+
+def _diversify(vectorstore, rankings, k, lambda_mult):
+    """
+    Narrow each candidate ranking to k results with mmr_select, reading the candidate vectors
+    back from the FAISS index in one batch.
+
+    :return: The narrowed rankings, or the top k of each if the index cannot reconstruct its
+        vectors.
+    """
+    start = time.perf_counter()
+    labels = np.unique(
+        np.array([label for ranking in rankings for label, _ in ranking], dtype=np.int64)
+    )
+    try:
+        vectors = vectorstore.index.reconstruct_batch(labels)
+    except RuntimeError as e:
+        logger.warning(f"Cannot reconstruct vectors for MMR, keeping the top results: {e}")
+        with _stats_lock:
+            retrieval_stats["mmr_fallbacks"] += 1
+        return [ranking[:k] for ranking in rankings]
+
+    results = []
+    for ranking in rankings:
+        if len(ranking) <= k:
+            results.append(ranking)
+            continue
+        positions = np.searchsorted(labels, [label for label, _ in ranking])
+        # Rankings mix FAISS distances and fused scores, so relevance comes from the rank
+        relevance = -np.arange(len(ranking), dtype=np.float32)
+        picked = mmr_select(relevance, vectors[positions], k, lambda_mult)
+        results.append([ranking[i] for i in picked])
+
+    with _stats_lock:
+        retrieval_stats["mmr_queries"] += len(rankings)
+        retrieval_stats["mmr_seconds"] += time.perf_counter() - start
+    return results
+
+
+def batch_search(
+    vectorstore,
+    queries,
+    embeddings,
+    k=4,
+    fetch_k=RETRIEVAL_FETCH_K,
+    mode=RETRIEVAL_MODE,
+    lambda_mult=None,
+):
+    """
+    Retrieve the chunks of a vector store most relevant to each of several queries.
+
+    The FAISS index is searched once for all the queries. In "hybrid" mode the BM25 index
+    stored with the vector store and the FAISS index each rank their top fetch_k chunks per
+    query and the rankings are fused with reciprocal rank fusion, so chunks sharing exact terms
+    with the query, such as course codes or formula names, are found even when their embeddings
+    are not the nearest. Vector stores built without a sparse index, and the "dense" mode, use
+    the FAISS ranking alone.
+
+    :param vectorstore: The LangChain FAISS vector store, with a sparse_index attribute when
+        it was loaded with one.
+    :param queries: The query texts.
+    :param embeddings: The query embeddings, in the same order.
+    :param k: The number of chunks to return per query.
+    :param fetch_k: The number of chunks each ranking contributes to the fusion.
+    :param mode: "hybrid" or "dense".
+    :param lambda_mult: When set below 1, the k results are picked from the top fetch_k
+        candidates by maximal marginal relevance, see mmr_select, so near-duplicate chunks do
+        not crowd out the rest. None keeps the plain top k.
+    :return: A list with, for every query, a list of (Document, score) tuples, best first.
+        Scores are RRF scores, higher is better, in hybrid mode and FAISS distances, lower is
+        better, otherwise.
+    """
+    return [
+        ranked_documents(vectorstore, ranking)
+        for ranking in batch_rank(
+            vectorstore, queries, embeddings, k, fetch_k, mode, lambda_mult
+        )
+    ]
+
+
+def batch_rank(
+    vectorstore,
+    queries,
+    embeddings,
+    k=4,
+    fetch_k=RETRIEVAL_FETCH_K,
+    mode=RETRIEVAL_MODE,
+    lambda_mult=None,
+):
+    """
+    Rank the chunks of a vector store for several queries, see batch_search.
+
+    :return: A list with, for every query, a list of (label, score) tuples, best first.
+    """
+    if not queries:
+        return []
+
+    diversify = lambda_mult is not None and lambda_mult < 1
+    candidates = max(k, fetch_k) if diversify else k
+    if retrieval_mode(vectorstore, mode) == "dense":
+        rankings = dense_search(vectorstore, embeddings, candidates)
+        with _stats_lock:
+            retrieval_stats["dense_queries"] += len(queries)
+    else:
+        dense_rankings = dense_search(vectorstore, embeddings, max(k, fetch_k))
+        start = time.perf_counter()
+        sparse_rankings = [
+            vectorstore.sparse_index.search(query, fetch_k)[0].tolist() for query in queries
+        ]
+        sparse_seconds = time.perf_counter() - start
+        rankings = [
+            reciprocal_rank_fusion([[label for label, _ in dense_ranking], sparse_ranking])[
+                :candidates
+            ]
+            for dense_ranking, sparse_ranking in zip(dense_rankings, sparse_rankings)
+        ]
+        with _stats_lock:
+            retrieval_stats["hybrid_queries"] += len(queries)
+            retrieval_stats["sparse_seconds"] += sparse_seconds
+
+    if diversify:
+        rankings = _diversify(vectorstore, rankings, k, lambda_mult)
+    return rankings
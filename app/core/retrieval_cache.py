@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from logging_config import logger
+from .config import (
+    redis_client,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_CACHE_TTL,
+    RETRIEVAL_FETCH_K,
+    RETRIEVAL_MODE,
+)
+from .metrics import register_metrics
+from .query_embedding_cache import normalize_query, query_embedding_cache
+from .retrieval import batch_rank, ranked_documents
+
+# A cached ranking is packed as (label, score) records
+_RANKING_DTYPE = np.dtype([("label", "<i8"), ("score", "<f8")])
+
+
+class RetrievalCache:
+    """
+    Two-level cache of retrieval results: an in-process LRU in front of Redis.
+
+    Entries map a vector store version, the search parameters and a sha256 of the normalized
+    query to the ranked chunk labels and scores. The version is part of the key, so a rebuilt
+    vector store is never served the rankings of the previous one, which expire on their own.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def key(self, store_key, normalized_query, k, fetch_k, mode, lambda_mult):
+        digest = hashlib.sha256(normalized_query.encode("utf-8")).hexdigest()
+        return f"rcache:{store_key}:{mode}:{k}:{fetch_k}:{lambda_mult}:{digest}"
+
+    def _get_local(self, key):
+        with self._lock:
+            ranking = self._entries.get(key)
+            if ranking is not None:
+                self._entries.move_to_end(key)
+            return ranking
+
+    def _put_local(self, key, ranking):
+        with self._lock:
+            self._entries[key] = ranking
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def search(
+        self,
+        vectorstore,
+        query,
+        k=4,
+        fetch_k=RETRIEVAL_FETCH_K,
+        mode=RETRIEVAL_MODE,
+        lambda_mult=None,
+    ):
+        """
+        Retrieve the chunks most relevant to a query, embedding and searching only on a miss.
+
+        Vector stores without a cache_key, those not loaded through load_vector_db, are always
+        searched.
+
+        :param vectorstore: The LangChain FAISS vector store.
+        :param query: The raw query text.
+        :param k: The number of chunks to return.
+        :param fetch_k: See batch_search.
+        :param mode: See batch_search.
+        :param lambda_mult: See batch_search.
+        :return: A list of (Document, score) tuples, best first.
+        """
+        store_key = getattr(vectorstore, "cache_key", None)
+        if store_key is None:
+            self.uncacheable += 1
+            return ranked_documents(
+                vectorstore, await self._rank(vectorstore, query, k, fetch_k, mode, lambda_mult)
+            )
+
+        key = self.key(store_key, normalize_query(query), k, fetch_k, mode, lambda_mult)
+        ranking = self._get_local(key)
+        if ranking is not None:
+            self.local_hits += 1
+            return ranked_documents(vectorstore, ranking)
+
+        try:
+            cached = await redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read retrieval results from Redis: {e}")
+            cached = None
+        if cached is not None:
+            self.redis_hits += 1
+            records = np.frombuffer(cached, dtype=_RANKING_DTYPE)
+            ranking = list(zip(records["label"].tolist(), records["score"].tolist()))
+            self._put_local(key, ranking)
+            return ranked_documents(vectorstore, ranking)
+
+        self.misses += 1
+        ranking = await self._rank(vectorstore, query, k, fetch_k, mode, lambda_mult)
+        self._put_local(key, ranking)
+        try:
+            await redis_client.setex(
+                key, self.ttl, np.array(ranking, dtype=_RANKING_DTYPE).tobytes()
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache retrieval results in Redis: {e}")
+        return ranked_documents(vectorstore, ranking)
+
+    async def _rank(self, vectorstore, query, k, fetch_k, mode, lambda_mult):
+        embedding = await query_embedding_cache.embed_query(vectorstore.embedding_function, query)
+        return batch_rank(vectorstore, [query], [embedding], k, fetch_k, mode, lambda_mult)[0]
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+        }
+
+
+retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+register_metrics("retrieval_cache", retrieval_cache.stats)
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import mmap
+import struct
+import hashlib
+from array import array
+from collections import Counter
+import numpy as np
+
+SPARSE_INDEX_FILENAME = "index.bm25"
+
+MAGIC = b"VSBM2501"
+_HEADER_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 8
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, keeping codes such as "cs2040" whole."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def term_hash(term):
+    """Hash a term to the 64-bit key it is stored under, the vocabulary is not kept."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _align(position):
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class SparseIndexBuilder:
+    """
+    Accumulate chunk texts into a BM25 inverted index.
+
+    Every (term, chunk) pair is appended to flat arrays as chunks arrive, so memory stays at
+    about ten bytes per pair, and the postings are grouped by term once in serialize().
+    """
+
+    def __init__(self):
+        self._vocabulary = {}
+        self._pair_terms = array("I")
+        self._pair_rows = array("I")
+        self._pair_counts = array("H")
+        self._labels = array("q")
+        self._lengths = array("I")
+
+    def add(self, label, text):
+        """
+        Index the text of a chunk.
+
+        :param label: The FAISS label of the chunk.
+        :param text: The chunk text.
+        """
+        row = len(self._labels)
+        tokens = tokenize(text)
+        self._labels.append(label)
+        self._lengths.append(len(tokens))
+        for term, count in Counter(tokens).items():
+            self._pair_terms.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+            self._pair_rows.append(row)
+            self._pair_counts.append(min(count, 0xFFFF))
+
+    def serialize(self):
+        """
+        Serialize the index.
+
+        Postings hold the chunk row and its BM25 score for the term, idf included, grouped by
+        the sorted 64-bit hashes of their terms, so a query term is found with a binary search
+        and scoring a query only sums postings.
+
+        :return: The serialized index bytes.
+        """
+        count = len(self._labels)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+        average_length = float(lengths.mean()) if count else 0.0
+
+        terms = np.frombuffer(self._pair_terms, dtype=np.uint32)
+        hashes = np.array([term_hash(term) for term in self._vocabulary], dtype=np.uint64)
+        pair_hashes = hashes[terms]
+        # Stable, postings stay in chunk order within a term
+        order = np.argsort(pair_hashes, kind="stable")
+        term_hashes, postings_per_term = np.unique(pair_hashes[order], return_counts=True)
+        offsets = np.zeros(len(term_hashes) + 1, dtype=np.uint64)
+        np.cumsum(postings_per_term, out=offsets[1:])
+
+        rows = np.frombuffer(self._pair_rows, dtype=np.uint32)[order]
+        counts = np.frombuffer(self._pair_counts, dtype=np.uint16)[order].astype(np.float32)
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / max(average_length, 1e-9))
+        frequencies = postings_per_term.astype(np.float64)
+        idf = np.log(1 + (count - frequencies + 0.5) / (frequencies + 0.5))
+        weights = (
+            np.repeat(idf, postings_per_term) * counts * (BM25_K1 + 1) / (counts + norms)
+        ).astype(np.float32)
+
+        sections = [
+            ("hashes", term_hashes.astype(np.uint64).tobytes()),
+            ("offsets", offsets.tobytes()),
+            ("rows", rows.tobytes()),
+            ("weights", weights.tobytes()),
+            ("labels", np.frombuffer(self._labels, dtype=np.int64).tobytes()),
+        ]
+        layout = {}
+        position = 0
+        for name, data in sections:
+            layout[name] = [position, len(data)]
+            position = _align(position + len(data))
+
+        header = json.dumps(
+            {
+                "count": count,
+                "terms": len(term_hashes),
+                "postings": len(rows),
+                "average_length": average_length,
+                "sections": layout,
+            }
+        ).encode("utf-8")
+        start = _align(len(MAGIC) + _HEADER_LENGTH.size + len(header))
+
+        out = bytearray(start + position)
+        out[: len(MAGIC)] = MAGIC
+        _HEADER_LENGTH.pack_into(out, len(MAGIC), len(header))
+        out[len(MAGIC) + _HEADER_LENGTH.size : len(MAGIC) + _HEADER_LENGTH.size + len(header)] = header
+        for name, data in sections:
+            offset = start + layout[name][0]
+            out[offset : offset + len(data)] = data
+        return bytes(out)
+
+    def write(self, path):
+        """Write the index to a file, replacing it whole."""
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(self.serialize())
+        os.replace(f"{path}.tmp", path)
+
+
+def build_sparse_index(docstore, index_to_docstore_id):
+    """
+    Build the BM25 index of every chunk in a docstore.
+
+    :param docstore: Any LangChain docstore holding the chunks.
+    :param index_to_docstore_id: The mapping from FAISS labels to docstore ids.
+    :return: A SparseIndexBuilder holding the chunks, ready to write.
+    """
+    builder = SparseIndexBuilder()
+    for label in sorted(int(label) for label in index_to_docstore_id):
+        document = docstore.search(index_to_docstore_id[label])
+        if not isinstance(document, str):
+            builder.add(label, document.page_content)
+    return builder
+
+
+class SparseIndex:
+    """
+    Read-only BM25 index over the serialized arrays, which may be memory-mapped.
+    """
+
+    def __init__(self, data):
+        if bytes(data[: len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a sparse index")
+        (header_length,) = _HEADER_LENGTH.unpack_from(data, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(bytes(data[header_start : header_start + header_length]))
+        start = _align(header_start + header_length)
+
+        def section(name, dtype, count):
+            offset, _ = header["sections"][name]
+            return np.frombuffer(data, dtype=dtype, count=count, offset=start + offset)
+
+        self.count = header["count"]
+        terms, postings = header["terms"], header["postings"]
+        self._hashes = section("hashes", np.uint64, terms)
+        self._offsets = section("offsets", np.uint64, terms + 1)
+        self._rows = section("rows", np.uint32, postings)
+        self._weights = section("weights", np.float32, postings)
+        self._labels = section("labels", np.int64, self.count)
+        self.nbytes = len(data)
+
+    def search(self, query, k):
+        """
+        Rank chunks against a query with BM25.
+
+        :param query: The query text.
+        :param k: The maximum number of chunks to return.
+        :return: A tuple of (labels, scores) arrays, best first, only chunks matching at least
+            one query term.
+        """
+        rows, weights = [], []
+        for term in set(tokenize(query)):
+            key = np.uint64(term_hash(term))
+            i = int(np.searchsorted(self._hashes, key))
+            if i == len(self._hashes) or self._hashes[i] != key:
+                continue
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            rows.append(self._rows[start:end])
+            weights.append(self._weights[start:end])
+
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.concatenate(rows)
+        weights = np.concatenate(weights)
+        if len(rows) * 8 < self.count:
+            # Rare terms, sum the few matching rows instead of a score for every chunk
+            matches, positions = np.unique(rows, return_inverse=True)
+            scores = np.bincount(positions, weights=weights)
+        else:
+            scores = np.bincount(rows, weights=weights, minlength=self.count)
+            matches = np.flatnonzero(scores)
+            scores = scores[matches]
+        if len(matches) > k:
+            top = np.argpartition(scores, -k)[-k:]
+            matches, scores = matches[top], scores[top]
+        # Ties go to the earlier chunk
+        order = np.lexsort((matches, -scores))
+        return self._labels[matches[order]], scores[order].astype(np.float32)
+
+
+def load_sparse_index(data):
+    """
+    Load a serialized sparse index.
+
+    :param data: A bytes-like object or mmap, or None for vector stores built without one.
+    :return: The SparseIndex, or None.
+    """
+    if not data:
+        return None
+    return SparseIndex(data)
+
+
+def load_sparse_index_file(db_path):
+    """
+    Load the sparse index saved next to index.faiss, memory-mapped.
+
+    :param db_path: The directory holding the vector store files.
+    :return: The SparseIndex, or None if the vector store has none.
+    """
+    path = os.path.join(db_path, SPARSE_INDEX_FILENAME)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return SparseIndex(data)
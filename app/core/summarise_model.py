@@ -4,6 +4,7 @@ from langchain_core.prompts import PromptTemplate
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import CTransformers
 from .openAI_embeddings import load_vector_db
+from .response_cache import response_cache, prompt_fingerprint
 from langchain_core.output_parsers import StrOutputParser
 from langchain.memory import ConversationBufferMemory
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
@@ -24,16 +25,25 @@ from app.core.config import templates
 summary_template = templates["summary"]
 
 
-def set_custom_prompt(difficulty: int):
+def prompt_templates(difficulty: int):
     """
-    Prompt template for QA retrieval for each vectorstore
+    The system and human templates for a difficulty, the easiest for unknown difficulties
     """
 
     if difficulty not in [1, 2, 3]:
         difficulty = 1
 
-    system_template = summary_template[difficulty - 1]["system"]
-    human_template = summary_template[difficulty - 1]["human"]
+    return summary_template[difficulty - 1]
+
+
+def set_custom_prompt(difficulty: int):
+    """
+    Prompt template for QA retrieval for each vectorstore
+    """
+
+    template = prompt_templates(difficulty)
+    system_template = template["system"]
+    human_template = template["human"]
 
     system_message_template = SystemMessagePromptTemplate.from_template(system_template)
     human_message_template = HumanMessagePromptTemplate.from_template(human_template)
@@ -45,8 +55,11 @@ def set_custom_prompt(difficulty: int):
     return chat_prompt
 
 
+summary_model_name = "gpt-3.5-turbo"
+
+
 def load_llm():
-    llm = ChatOpenAI(model="gpt-3.5-turbo", verbose=True)
+    llm = ChatOpenAI(model=summary_model_name, verbose=True)
     return llm
 
 
@@ -78,6 +91,15 @@ class CustomHandler(BaseCallbackHandler):
 
 
 def final_result(query, difficulty, request: Request):
+    # Resubmitted paragraphs are served from the response cache
+    template = prompt_templates(difficulty)
+    fingerprint = prompt_fingerprint(summary_model_name, template["system"], template["human"])
+    return response_cache.get_or_generate(
+        "summary", fingerprint, query, lambda: generate(query, difficulty)
+    )
+
+
+def generate(query, difficulty):
     prompt = set_custom_prompt(difficulty)
     chain = qa_bot(prompt)
     input_data = {"para": query}
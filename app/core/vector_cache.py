@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from logging_config import logger
+from .config import VECTOR_CACHE_MAX_BYTES, VECTOR_CACHE_TTL
+from .metrics import register_metrics
+
+
+def vector_store_key(user_email, version):
+    """
+    Build the shared cache key for one version of a user's vector store.
+
+    :param user_email: The email of the user owning the vector store.
+    :param version: The content version of the vector store.
+    :return: The cache key.
+    """
+    return f"vectorstore:{user_email}:{version}"
+
+
+def vector_store_version_key(user_email):
+    return f"vectorstore:{user_email}:version"
+
+
+def session_vector_store_key(session_id):
+    return f"{session_id}_vectorstore"
+
+
+def estimate_vectorstore_size(vectorstore):
+    """
+    Estimate the resident size of a FAISS vector store in bytes.
+
+    :param vectorstore: The LangChain FAISS vector store.
+    :return: The approximate number of bytes held by the index, docstore and BM25 index.
+    """
+    index = vectorstore.index
+    code_size = getattr(index, "code_size", index.d * 4)
+    size = index.ntotal * code_size
+
+    sparse_index = getattr(vectorstore, "sparse_index", None)
+    if sparse_index is not None:
+        size += sparse_index.nbytes
+
+    docstore = vectorstore.docstore
+    if hasattr(docstore, "nbytes"):
+        return size + docstore.nbytes
+
+    for document in getattr(docstore, "_dict", {}).values():
+        size += len(document.page_content)
+    return size
+
+
+class VectorStoreCache:
+    """
+    Per-worker LRU cache of live vector stores bounded by a byte budget.
+    """
+
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return the cached vector store for a key and mark it most recently used.
+
+        :param key: The cache key.
+        :return: The vector store, or None if the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                del self._entries[key]
+                self.current_bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, vectorstore, size=None):
+        """
+        Cache a vector store, evicting least recently used entries to stay within budget.
+
+        :param key: The cache key.
+        :param vectorstore: The vector store to cache.
+        :param size: The size of the vector store in bytes, estimated if not given.
+        """
+        if size is None:
+            size = estimate_vectorstore_size(vectorstore)
+
+        if size > self.max_bytes:
+            logger.info(
+                f"Vectorstore {key} ({size} bytes) exceeds the cache budget of {self.max_bytes} bytes"
+            )
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                evicted_key, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+                logger.info(f"Evicted vectorstore {evicted_key} from the worker cache")
+
+            self._entries[key] = (vectorstore, size, time.monotonic())
+            self.current_bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+vector_store_cache = VectorStoreCache(VECTOR_CACHE_MAX_BYTES, VECTOR_CACHE_TTL)
+register_metrics("vector_store_cache", vector_store_cache.stats)
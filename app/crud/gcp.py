@@ -8,6 +8,8 @@ import datetime
 import app.models.user as user
 from app.core.openAI_embeddings import create_vector_db_gcp, create_vector_db_for_selected_pdfs
 from app.core.gcp_utils import delete_pdf_from_gcp, list_pdfs
+from app.core.build_jobs import build_job_queue, enqueue_build
+from app.db.session import SessionLocal
 
 
 
@@ -28,60 +30,73 @@ def upload(params: gcp_schema.StorageBase, data_folder: str, resource_folder: st
         )
 
 
+def _find_user(user_id, db: Session):
+    user_found = db.query(user.User).filter(user.User.id == user_id).first()
+    if not user_found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found",
+        )
+    return user_found
+
+
 def setup_vectorStore(
     params: gcp_schema.VectorStore, data_folder: str, vector_folder: str, db: Session
 ):
-
+    _find_user(params.id, db)
     try:
-        user_found = db.query(user.User).filter(user.User.id == params.id).first()
-        if not user_found:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {id} not found",
-            )
-
-        create_vector_db_gcp(params.email)
-
-        user_found.vectorstore = True
-
-        db.add(user_found)
-        db.commit()
-        db.refresh(user_found)
-        return user_found
-
+        return enqueue_build(build_job_queue, params.id, params.email)
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to setup vector store for user {params.email}: {e}",
+            detail=f"Failed to queue vector store setup for user {params.email}: {e}",
         )
 
 
 def setup_vectorStoreWithPdf(
     params: gcp_schema.VectorStoreFiles, data_folder: str, vector_folder: str, db: Session
 ):
+    _find_user(params.id, db)
+    try:
+        return enqueue_build(build_job_queue, params.id, params.email, params.filenames)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to queue vector store setup for user {params.email}: {e}",
+        )
+
+
+def get_build_job(job_id: str):
+    job = build_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Build job {job_id} not found",
+        )
+    return job
+
+
+def run_build_job(job, report):
+    """Build the vector store of a queued job, then flag the user as having one."""
+    if job["filenames"] is None:
+        create_vector_db_gcp(job["user_email"], report)
+    else:
+        create_vector_db_for_selected_pdfs(job["user_email"], job["filenames"], report)
 
+    db = SessionLocal()
     try:
-        user_found = db.query(user.User).filter(user.User.id == params.id).first()
+        # Not _find_user, an HTTPException has no request to go to in a worker thread
+        user_found = db.query(user.User).filter(user.User.id == job["user_id"]).first()
         if not user_found:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {id} not found",
+            raise RuntimeError(
+                f"User with id {job['user_id']} not found, the vector store was built "
+                f"but not recorded"
             )
-
-        create_vector_db_for_selected_pdfs(params.email, params.filenames)
-
         user_found.vectorstore = True
-
         db.add(user_found)
         db.commit()
-        db.refresh(user_found)
-        return user_found
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to setup vector store for user {params.email}: {e}",
-        )
+    finally:
+        db.close()
 
 
 def generate_signed_url(params: gcp_schema.StorageCreate, data_folder: str):
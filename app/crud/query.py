@@ -4,10 +4,11 @@ from app.schemas import query_schema
 from datetime import datetime
 from fastapi import HTTPException, status, Request
 from app.core.qa_model import final_result as qa_final_result
+from app.core.qa_model import search_vector_db_batch
 from app.core.graph_model import final_result as graph_final_result
 from app.core.summarise_model import final_result as summary_final_result
 from app.quizGeneratingAgent.main import main as quiz_main
-from app.core.config import AGENT_SERVICE_URL
+from app.core.config import AGENT_SERVICE_URL, SEARCH_BATCH_MAX_QUERIES
 import requests
 import json
 
@@ -41,6 +42,38 @@ async def create_query(db: Session, chat: query_schema.QueryCreate, request: Req
     return new_query
 
 
+async def search_batch(search: query_schema.SearchBatchCreate, request: Request):
+    if not search.queries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one query is required",
+        )
+    if len(search.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries can be searched at once",
+        )
+
+    mode, results = await search_vector_db_batch(
+        search.queries, request, search.username, search.k
+    )
+
+    return query_schema.SearchBatchResponse(
+        mode=mode,
+        results=[
+            [
+                query_schema.SearchResult(
+                    content=document.page_content,
+                    metadata=document.metadata,
+                    score=score,
+                )
+                for document, score in query_results
+            ]
+            for query_results in results
+        ]
+    )
+
+
 def generate_graph_notation(
     db: Session, chat: query_schema.QueryGraphGenerate, request: Request
 ):
@@ -5,9 +5,11 @@ from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.db.base import Base
 from app.db.session import engine
-from app.api.endpoints import authentication, users, query, train, gcp
+from app.api.endpoints import authentication, users, query, train, gcp, metrics
 import aioredis
 from app.core.config import redis_client
+from app.core.build_jobs import BuildJobWorkers, build_job_queue
+from app.crud.gcp import run_build_job
 from logging_config import logger
 
 class RedisSessionMiddleware(BaseHTTPMiddleware):
@@ -70,6 +72,19 @@ app.include_router(authentication.router)
 app.include_router(users.router)
 app.include_router(query.router)
 app.include_router(gcp.router)
+app.include_router(metrics.router)
+
+build_job_workers = BuildJobWorkers(build_job_queue, run_build_job)
+
+
+@app.on_event("startup")
+def start_build_job_workers():
+    build_job_workers.start()
+
+
+@app.on_event("shutdown")
+def stop_build_job_workers():
+    build_job_workers.stop()
 
 @app.get("/")
 async def read_root(request: Request):
@@ -1,4 +1,7 @@
+from typing import List
 from langchain.agents import tool
+from app.core.query_embedding_cache import query_embedding_cache
+from app.core.retrieval import batch_search
 
 
 class QuizGeneratingToolset:
@@ -12,14 +15,22 @@ class QuizGeneratingToolset:
 
     def search_data_from_database(self, query: str):
         """Function to search the data from the vector database."""
-        if self.vectorstore:
-            results = self.vectorstore.search(
-                query=query, search_type="similarity", k=5
-            )
-            if results:
-                return results[0].page_content
-            return ""
-        return ""
+        return self.search_data_from_database_batch([query])[0]
+
+    def search_data_from_database_batch(self, queries: List[str]):
+        """Function to search the data from the vector database for several queries at once."""
+        if not (self.vectorstore and queries):
+            return [""] * len(queries)
+        # One embedding request for the uncached queries and one FAISS search for all of them,
+        # ranked by plain similarity like the vectorstore.search it replaced
+        embeddings = query_embedding_cache.embed_queries_sync(
+            self.vectorstore.embedding_function, queries
+        )
+        results = batch_search(self.vectorstore, queries, embeddings, k=5, mode="dense")
+        return [
+            query_results[0][0].page_content if query_results else ""
+            for query_results in results
+        ]
 
     @staticmethod
     @tool
@@ -34,6 +45,17 @@ class QuizGeneratingToolset:
         results = toolset.search_data_from_database(query)
         return results
 
+    @staticmethod
+    @tool
+    def search_data_from_vector_database_batch(queries: List[str]):
+        """
+        Function to search the data from the vector database for several queries at once, such as a list of
+        topics. Returns one search result per query, in the same order. Prefer it to repeated single searches.
+        """
+
+        toolset = QuizGeneratingToolset.current_instance
+        return toolset.search_data_from_database_batch(queries)
+
     @staticmethod
     @tool
     def search_sample_output_format(query: str):
@@ -58,5 +80,6 @@ class QuizGeneratingToolset:
     def tools(self):
         return [
             QuizGeneratingToolset.search_data_from_vector_database,
+            QuizGeneratingToolset.search_data_from_vector_database_batch,
             QuizGeneratingToolset.search_sample_output_format,
         ]
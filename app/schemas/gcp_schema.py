@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -39,3 +39,17 @@ class Response(BaseModel):
 class FileList(BaseModel):
     user_id: int
     filenames: List[str]
+
+
+class BuildJob(BaseModel):
+    id: str
+    user_id: int
+    user_email: str
+    filenames: Optional[List[str]] = None
+    state: str
+    phase: Optional[str] = None
+    progress: Dict[str, int] = {}
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
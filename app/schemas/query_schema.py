@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -32,6 +32,22 @@ class CustomResponse(BaseModel):
     response: Dict[str, Optional[str]]
     date_created: datetime = Field(default_factory=datetime.utcnow)
 
+class SearchBatchCreate(BaseModel):
+    user_id: int
+    username: str
+    queries: List[str]
+    k: int = Field(default=4, ge=1, le=50)
+
+class SearchResult(BaseModel):
+    content: str
+    metadata: Dict[str, Any]
+    # An RRF score, higher is better, in "hybrid" mode, a FAISS distance, lower is better, in "dense" mode
+    score: float
+
+class SearchBatchResponse(BaseModel):
+    mode: str
+    results: List[List[SearchResult]]
+
 class ResearchCreate(BaseModel):
     user_id: int
     username: str
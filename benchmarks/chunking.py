@@ -0,0 +1,94 @@
+"""
+Measure chunking throughput in MB/sec against RecursiveCharacterTextSplitter.
+
+Splits a generated regression corpus of pages with paragraphs, short and run-on lines and
+unbroken runs of characters with both splitters, checks they produce the same chunks, and
+reports their throughput. Run from the repository root:
+
+    python -m benchmarks.chunking --megabytes 20
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.core.chunker import FastTextSplitter
+from benchmarks.synthetic_pdfs import WORDS, page_lines
+
+
+def regression_page(rng):
+    """Build a page mixing the layouts PDF text extraction produces."""
+    blocks = []
+    for _ in range(rng.randint(2, 6)):
+        layout = rng.random()
+        if layout < 0.5:
+            # Short lines, as extracted from ordinary text
+            blocks.append("\n".join(page_lines(rng, lines=rng.randint(1, 15))))
+        elif layout < 0.8:
+            # A paragraph extracted as one long line
+            blocks.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 400))))
+        elif layout < 0.9:
+            # Tables and formulas extracted without spaces
+            blocks.append("".join(rng.choice(WORDS) for _ in range(rng.randint(50, 200))))
+        else:
+            # Stray whitespace around a few words
+            blocks.append("  \n " + " ".join(rng.choice(WORDS) for _ in range(5)) + " \n")
+    return "\n\n".join(blocks)
+
+
+def regression_corpus(megabytes, seed=0):
+    rng = random.Random(seed)
+    pages, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        text = regression_page(rng)
+        pages.append(
+            Document(page_content=text, metadata={"source": "corpus.pdf", "page": len(pages)})
+        )
+        size += len(text.encode("utf-8"))
+    return pages, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megabytes", type=float, default=20)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages, size = regression_corpus(args.megabytes, args.seed)
+    megabytes = size / (1024 * 1024)
+    splitters = [
+        (
+            "langchain",
+            RecursiveCharacterTextSplitter(
+                chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap
+            ),
+        ),
+        ("fast", FastTextSplitter(args.chunk_size, args.chunk_overlap)),
+    ]
+
+    print(f"{len(pages)} pages, {megabytes:.1f} MB")
+    print(f"{'splitter':>10} {'seconds':>8} {'MB/sec':>8} {'chunks':>8} {'identical':>10}")
+
+    expected = None
+    for name, splitter in splitters:
+        start = time.perf_counter()
+        chunks = splitter.split_documents(pages)
+        seconds = time.perf_counter() - start
+        result = [(chunk.page_content, chunk.metadata) for chunk in chunks]
+        identical = "-" if expected is None else str(result == expected)
+        expected = expected or result
+        print(
+            f"{name:>10} {seconds:>8.2f} {megabytes / seconds:>8.1f} {len(chunks):>8} "
+            f"{identical:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare embedding backends on document throughput and concurrent query latency.
+
+Runs the OpenAI backend against the local fake embedding server and the local CPU backend
+with every runtime that can be loaded here, next to the deterministic baseline. Run from the
+repository root:
+
+    python -m benchmarks.embedding_backends --chunks 2000 --queries 64 --threads 8
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_RATE_LIMITER", "memory")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from app.core.embedding_scheduler import ScheduledOpenAIEmbeddings
+from app.core.local_embeddings import LOCAL_RUNTIMES, LocalEmbeddings
+from benchmarks.fake_embedding_server import start_server
+
+CHUNK_TEXT = "lorem ipsum dolor sit amet " * 18  # roughly a 500 character chunk
+
+
+def measure(embeddings, texts, queries, threads):
+    """
+    :return: A tuple of (document chunks/sec, median query ms, p95 query ms).
+    """
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    docs_per_sec = len(texts) / (time.perf_counter() - start)
+    assert len(vectors) == len(texts)
+
+    def timed_query(query):
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(timed_query, queries))
+    return (
+        docs_per_sec,
+        statistics.median(latencies),
+        latencies[int(0.95 * (len(latencies) - 1))],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent queries")
+    parser.add_argument("--runtimes", nargs="+", default=list(LOCAL_RUNTIMES))
+    parser.add_argument("--cpu-threads", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="fake server seconds per request"
+    )
+    args = parser.parse_args()
+
+    texts = [f"{i} {CHUNK_TEXT}" for i in range(args.chunks)]
+    queries = [f"what does section {i} say about the results" for i in range(args.queries)]
+
+    print(f"{'backend':>16} {'chunks/sec':>11} {'query p50 ms':>13} {'query p95 ms':>13}")
+
+    def report(name, embeddings):
+        docs_per_sec, p50, p95 = measure(embeddings, texts, queries, args.threads)
+        print(f"{name:>16} {docs_per_sec:>11.1f} {p50:>13.2f} {p95:>13.2f}")
+
+    report("deterministic", DeterministicFakeEmbedding(size=384))
+
+    server, _ = start_server(dimension=1536, latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        report("openai (fake)", ScheduledOpenAIEmbeddings())
+    finally:
+        server.shutdown()
+
+    for runtime in args.runtimes:
+        try:
+            embeddings = LocalEmbeddings(runtime=runtime, threads=args.cpu_threads)
+        except Exception as e:
+            print(f"{f'local {runtime}':>16} unavailable: {e}")
+            continue
+        report(f"local {runtime}", embeddings)
+
+
+if __name__ == "__main__":
+    main()
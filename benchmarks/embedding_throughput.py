@@ -0,0 +1,121 @@
+"""
+Measure ingestion embedding throughput against a local fake OpenAI embedding server.
+
+Compares the serial batching of LangChain's OpenAIEmbeddings with the rate-limit-aware
+EmbeddingScheduler at several concurrency levels. Run from the repository root:
+
+    python -m benchmarks.embedding_throughput --chunks 3000 --concurrency 1 4 8
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_RATE_LIMITER", "memory")
+
+import openai
+
+from app.core.embedding_scheduler import ScheduledOpenAIEmbeddings, scheduler_stats
+from benchmarks.fake_embedding_server import start_server
+
+CHUNK_TEXT = "lorem ipsum dolor sit amet " * 18  # roughly a 500 character chunk
+
+
+# OpenAIEmbeddings sends 1000 texts per request, one request at a time
+LANGCHAIN_CHUNK_SIZE = 1000
+
+
+class SerialEmbeddings:
+    """
+    The request pattern of OpenAIEmbeddings.embed_documents, relying on the OpenAI client retries.
+
+    OpenAIEmbeddings itself needs tiktoken encodings that are downloaded on first use, so its
+    batching is reproduced here to keep the benchmark offline.
+    """
+
+    def __init__(self, max_retries=2):
+        self.client = openai.OpenAI(max_retries=max_retries)
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), LANGCHAIN_CHUNK_SIZE):
+            response = self.client.embeddings.create(
+                model="text-embedding-ada-002",
+                input=texts[start : start + LANGCHAIN_CHUNK_SIZE],
+            )
+            vectors.extend(item.embedding for item in response.data)
+        return vectors
+
+
+def run(make_embeddings, texts, args):
+    """
+    Embed texts against a fresh fake server, so every run starts with a full rate limit window.
+
+    :return: A tuple of (seconds, rate-limited requests).
+    """
+    server, limiter = start_server(
+        dimension=args.dimension,
+        latency=args.latency,
+        tokens_per_minute=args.tokens_per_minute,
+        requests_per_minute=args.requests_per_minute,
+    )
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    try:
+        embeddings = make_embeddings()
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        seconds = time.perf_counter() - start
+        assert len(vectors) == len(texts)
+        return seconds, limiter.rejected
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-tokens", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--tokens-per-minute", type=int, default=1000000)
+    parser.add_argument("--requests-per-minute", type=int, default=3000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    texts = [f"{i} {CHUNK_TEXT}" for i in range(args.chunks)]
+
+    print(f"{'embedder':>18} {'seconds':>8} {'chunks/sec':>11} {'retries':>8} {'429s':>6}")
+
+    try:
+        seconds, rejected = run(SerialEmbeddings, texts, args)
+        print(
+            f"{'langchain serial':>18} {seconds:>8.2f} {args.chunks / seconds:>11.1f} "
+            f"{'-':>8} {rejected:>6}"
+        )
+    except openai.RateLimitError:
+        print(f"{'langchain serial':>18} {'failed with 429 after retries':>36}")
+
+    for concurrency in args.concurrency:
+        retries = scheduler_stats["retries"]
+        seconds, rejected = run(
+            # Every level starts with full buckets of its own
+            lambda: ScheduledOpenAIEmbeddings(
+                shared_rate_limits=False,
+                concurrency=concurrency,
+                max_batch_tokens=args.batch_tokens,
+                tokens_per_minute=args.tokens_per_minute,
+                requests_per_minute=args.requests_per_minute,
+            ),
+            texts,
+            args,
+        )
+        print(
+            f"{f'scheduler x{concurrency}':>18} {seconds:>8.2f} "
+            f"{args.chunks / seconds:>11.1f} {scheduler_stats['retries'] - retries:>8} "
+            f"{rejected:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
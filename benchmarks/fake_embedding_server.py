@@ -0,0 +1,167 @@
+"""
+Serve an OpenAI-compatible /v1/embeddings endpoint with simulated latency and rate limits.
+
+Point ingestion at it with OPENAI_BASE_URL=http://127.0.0.1:8089/v1, for example:
+
+    python -m benchmarks.fake_embedding_server --port 8089 --tokens-per-minute 200000
+"""
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+
+
+def fake_embedding(text, dimension):
+    """Deterministic unit vector seeded by the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class RateLimiter:
+    """Fixed one-minute windows of tokens and requests, like the OpenAI account limits."""
+
+    def __init__(self, tokens_per_minute, requests_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._lock = threading.Lock()
+        self._window = 0
+        self._tokens = 0
+        self._requests = 0
+        self.rejected = 0
+
+    def admit(self, tokens):
+        """Return 0 if the request is admitted, else the seconds until the window resets."""
+        with self._lock:
+            now = time.monotonic()
+            window = int(now // 60)
+            if window != self._window:
+                self._window, self._tokens, self._requests = window, 0, 0
+            if (
+                self._tokens + tokens > self.tokens_per_minute
+                or self._requests + 1 > self.requests_per_minute
+            ):
+                self.rejected += 1
+                return 60 - now % 60
+            self._tokens += tokens
+            self._requests += 1
+            return 0
+
+
+def make_handler(dimension, latency, per_token_latency, limiter):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = request["input"]
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            tokens = sum(len(text) // CHARS_PER_TOKEN + 1 for text in inputs)
+
+            retry_after = limiter.admit(tokens)
+            if retry_after:
+                error = {
+                    "message": "Rate limit reached",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }
+                # A short Retry-After keeps benchmarks quick while still exercising backoff
+                self._send_json(
+                    429, {"error": error}, {"Retry-After": f"{min(retry_after, 1.0):.2f}"}
+                )
+                return
+
+            time.sleep(latency + per_token_latency * tokens)
+            data = []
+            for i, text in enumerate(inputs):
+                vector = fake_embedding(text, dimension)
+                if request.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vector.tobytes()).decode()
+                else:
+                    embedding = vector.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": request.get("model"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                },
+            )
+
+    return EmbeddingHandler
+
+
+def start_server(
+    port=0,
+    dimension=1536,
+    latency=0.2,
+    per_token_latency=0.00001,
+    tokens_per_minute=1000000,
+    requests_per_minute=3000,
+):
+    """
+    Start the fake server on a background thread.
+
+    :return: A tuple of (server, limiter), the bound port is server.server_address[1].
+    """
+    limiter = RateLimiter(tokens_per_minute, requests_per_minute)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port),
+        make_handler(dimension, latency, per_token_latency, limiter),
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--tokens-per-minute", type=int, default=1000000)
+    parser.add_argument("--requests-per-minute", type=int, default=3000)
+    args = parser.parse_args()
+
+    server, _ = start_server(
+        args.port,
+        args.dimension,
+        args.latency,
+        tokens_per_minute=args.tokens_per_minute,
+        requests_per_minute=args.requests_per_minute,
+    )
+    print(f"Serving fake embeddings on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
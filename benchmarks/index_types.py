@@ -0,0 +1,106 @@
+"""
+Measure recall@k, search latency, build time and size of each FAISS index type on
+synthetic clustered embeddings.
+
+Run from the repository root:
+
+    python -m benchmarks.index_types --count 50000 --dimension 1536 --k 4
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import faiss
+import numpy as np
+
+from app.core.index_factory import INDEX_TYPES, build_index, index_factory_string
+
+
+def synthetic_embeddings(count, dimension, clusters, spread, seed=0):
+    """
+    Generate unit-norm vectors drawn around random topic centroids, like chunk embeddings.
+
+    :return: A float32 array of shape (count, dimension).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    assignment = rng.integers(0, clusters, count)
+    vectors = centroids[assignment] + spread * rng.standard_normal(
+        (count, dimension), dtype=np.float32
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_queries(vectors, count, seed=1):
+    """Queries are perturbed copies of stored vectors, as questions land near their answers."""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape, dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.35, help="noise around each topic centroid")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES))
+    parser.add_argument("--json", action="store_true", help="print one JSON object per index type")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.count, args.dimension, args.clusters, args.spread)
+    queries = synthetic_queries(vectors, args.queries)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    if not args.json:
+        print(
+            f"{'type':>9} {'factory':>16} {'build_s':>8} {'size_mb':>8} "
+            f"{'latency_ms':>10} {'recall@' + str(args.k):>9}"
+        )
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type, train_threshold=0)
+        build_seconds = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+        # One query at a time, which is how chat retrieval calls the index
+        found = []
+        start = time.perf_counter()
+        for query in queries:
+            _, labels = index.search(query.reshape(1, -1), args.k)
+            found.append(labels[0])
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        result = {
+            "type": index_type,
+            "factory": index_factory_string(index_type, args.dimension, args.count),
+            "build_seconds": round(build_seconds, 3),
+            "size_mb": round(size_mb, 2),
+            "latency_ms": round(latency_ms, 3),
+            f"recall@{args.k}": round(recall_at_k(found, truth, args.k), 4),
+        }
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{index_type:>9} {result['factory']:>16} {build_seconds:>8.2f} {size_mb:>8.1f} "
+                f"{latency_ms:>10.3f} {result[f'recall@{args.k}']:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Measure end-to-end ingestion of a synthetic PDF corpus, per stage and overall.
+
+Builds a vector store from generated PDFs with deterministic fake embeddings, the local
+storage backend and an in-memory stand-in for Redis, so it needs neither real documents, an
+OpenAI key, a bucket nor a Redis server, and every run embeds every chunk. "local" runs
+create_vector_db_locally over a folder, "storage" runs create_vector_db_gcp against the local
+storage stand-in, including the downloads and the publish. Reports per-stage timings,
+pages/sec, chunks/sec and peak RSS, as JSON to diff between releases. Run from the repository
+root:
+
+    python -m benchmarks.ingestion --files 20 --pages 50 --mode storage --json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_BACKEND", "deterministic")
+os.environ.setdefault("BUCKET_NAME", "benchmark")
+# Never touch a real bucket, the storage mode runs against a throwaway local one
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_ROOT"] = tempfile.mkdtemp(prefix="ingestion-benchmark-")
+
+import app.core.openAI_embeddings as openai_embeddings
+from app.core.config import BUCKET_NAME, DATA_FOLDER, RESOURCE_FOLDER, VECTOR_STORE_FOLDER
+from app.core.disk_cache import read_index_mmap
+from app.core.embedding_store import chunk_embedding_store
+from app.core.gcp_utils import download_from_gcp, resolve_vector_store_folder
+from app.core.index_factory import resolve_index_type
+from app.core.openAI_embeddings import create_vector_db_gcp, create_vector_db_locally
+from benchmarks.synthetic_pdfs import write_corpus
+
+USER_EMAIL = "benchmark@example.com"
+
+
+class MemoryRedis:
+    """
+    The few synchronous Redis commands an ingestion run uses, kept in a dict.
+
+    Stands in for Redis so the run needs no server and starts with an empty chunk embedding
+    cache every time, otherwise a rerun of the seeded corpus would be served from the cache.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def set(self, key, value):
+        self.commands.append((key, value))
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, value))
+
+    def execute(self):
+        for key, value in self.commands:
+            self.client.set(key, value)
+        self.commands = []
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished children, the parse pool."""
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def run_local(corpus_dir, work_dir, index_type):
+    db_path = os.path.join(work_dir, VECTOR_STORE_FOLDER)
+    stats = create_vector_db_locally(corpus_dir, db_path, index_type)
+    return stats, {}, read_index_mmap(os.path.join(db_path, "index.faiss")).ntotal
+
+
+def run_storage(corpus_dir, work_dir, index_type):
+    user_folder = os.path.join(
+        os.environ["LOCAL_STORAGE_ROOT"], BUCKET_NAME, DATA_FOLDER, USER_EMAIL
+    )
+    shutil.copytree(corpus_dir, os.path.join(user_folder, RESOURCE_FOLDER))
+
+    phases = {}
+    final = {}
+    last = [None, time.perf_counter()]
+
+    def on_progress(phase, stats=None):
+        now = time.perf_counter()
+        if phase != last[0]:
+            if last[0] is not None:
+                phases[last[0]] = phases.get(last[0], 0.0) + now - last[1]
+            last[:] = [phase, now]
+        if stats is not None:
+            final["stats"] = stats
+
+    create_vector_db_gcp(USER_EMAIL, on_progress=on_progress)
+    phases[last[0]] = phases.get(last[0], 0.0) + time.perf_counter() - last[1]
+
+    db_path = os.path.join(work_dir, VECTOR_STORE_FOLDER)
+    download_from_gcp(
+        BUCKET_NAME,
+        resolve_vector_store_folder(f"{DATA_FOLDER}/{USER_EMAIL}/{VECTOR_STORE_FOLDER}"),
+        db_path,
+    )
+    chunks = read_index_mmap(os.path.join(db_path, "index.faiss")).ntotal
+    return final.get("stats", {}), phases, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("local", "storage"), default="storage")
+    parser.add_argument(
+        "--index-type",
+        help="local mode only, the storage mode uses VECTOR_INDEX_TYPE like the service",
+    )
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+    if args.index_type and args.mode == "storage":
+        parser.error("--index-type only applies to --mode local, set VECTOR_INDEX_TYPE instead")
+    index_type = args.index_type or resolve_index_type(USER_EMAIL)
+
+    redis = MemoryRedis()
+    chunk_embedding_store.client = redis
+    # The build records the new vector store version in Redis when it finishes
+    openai_embeddings.redis_sync_client = redis
+
+    storage_root = os.environ["LOCAL_STORAGE_ROOT"]
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            corpus_dir = os.path.join(work_dir, "corpus")
+            write_corpus(corpus_dir, args.files, args.pages, args.seed)
+
+            start = time.perf_counter()
+            run = run_local if args.mode == "local" else run_storage
+            stats, phases, chunks = run(corpus_dir, work_dir, index_type)
+            seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(storage_root, ignore_errors=True)
+
+    pages = args.files * args.pages
+    result = {
+        "mode": args.mode,
+        "embedding_backend": os.environ["EMBEDDING_BACKEND"],
+        "index_type": index_type,
+        "files": args.files,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds,
+        "chunks_per_sec": chunks / seconds,
+        "stages": stats,
+        "phases": phases,
+        "peak_rss_mb": peak_rss_mb(),
+        "chunk_embedding_cache": chunk_embedding_store.stats(),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+        return
+
+    print(
+        f"{args.files} files, {pages} pages, {chunks} chunks in {seconds:.2f}s: "
+        f"{result['pages_per_sec']:.1f} pages/sec, {result['chunks_per_sec']:.1f} chunks/sec, "
+        f"peak RSS {result['peak_rss_mb']['self']:.0f} MB "
+        f"(+{result['peak_rss_mb']['children']:.0f} MB in parse workers)"
+    )
+    print(f"{'stage':>8} {'items':>8} {'busy s':>8} {'waiting s':>10}")
+    for name, values in stats.items():
+        print(
+            f"{name:>8} {values['items']:>8} {values['seconds']:>8.2f} "
+            f"{values['wait_seconds']:>10.2f}"
+        )
+    for name, phase_seconds in phases.items():
+        print(f"{name:>12} {phase_seconds:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Measure PDF parsing throughput in pages/sec on a synthetic corpus.
+
+Compares PyPDFLoader, one file after another, with the process pool parser at several worker
+counts. Run from the repository root:
+
+    python -m benchmarks.pdf_parsing --files 8 --pages 200 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from app.core.pdf_parser import parse_pdfs
+from benchmarks.synthetic_pdfs import write_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = write_corpus(corpus_dir, args.files, args.pages)
+        total_pages = args.files * args.pages
+
+        print(f"{'parser':>16} {'seconds':>8} {'pages/sec':>10} {'identical':>10}")
+
+        start = time.perf_counter()
+        expected = [doc for path in paths for doc in PyPDFLoader(path).load()]
+        seconds = time.perf_counter() - start
+        print(f"{'PyPDFLoader':>16} {seconds:>8.2f} {total_pages / seconds:>10.1f} {'-':>10}")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            documents = parse_pdfs(paths, workers, args.pages_per_task)
+            seconds = time.perf_counter() - start
+            identical = [(d.page_content, d.metadata) for d in documents] == [
+                (d.page_content, d.metadata) for d in expected
+            ]
+            print(
+                f"{f'pool x{workers}':>16} {seconds:>8.2f} {total_pages / seconds:>10.1f} "
+                f"{str(identical):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure BM25 index build time, size and query latency on synthetic chunks.
+
+Chunks draw their words from a Zipf-distributed vocabulary, as natural text does, and each
+carries a unique code so exact-term queries have a single match. Run from the repository root:
+
+    python -m benchmarks.sparse_index --chunks 200000 --queries 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import numpy as np
+
+from app.core.sparse_index import SparseIndex, SparseIndexBuilder
+
+
+def synthetic_chunks(count, vocabulary, words, seed=0):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.2, size=(count, words)), vocabulary) - 1
+    for i, row in enumerate(ranks):
+        yield " ".join(f"w{rank}" for rank in row) + f" code{i}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=80, help="words per chunk")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    builder = SparseIndexBuilder()
+    for label, text in enumerate(synthetic_chunks(args.chunks, args.vocabulary, args.words)):
+        builder.add(label, text)
+    data = builder.serialize()
+    build_seconds = time.perf_counter() - start
+    index = SparseIndex(data)
+    print(
+        f"{args.chunks} chunks indexed in {build_seconds:.1f}s, "
+        f"{len(data) / (1024 * 1024):.1f} MB"
+    )
+
+    rng = np.random.default_rng(1)
+    query_sets = {
+        "exact code": [f"code{i}" for i in rng.integers(0, args.chunks, args.queries)],
+        "5 words": [
+            " ".join(f"w{rank - 1}" for rank in np.minimum(rng.zipf(1.2, 5), args.vocabulary))
+            for _ in range(args.queries)
+        ],
+        "code + 5 words": [
+            f"code{i} " + " ".join(f"w{rank}" for rank in rng.integers(0, 100, 5))
+            for i in rng.integers(0, args.chunks, args.queries)
+        ],
+    }
+
+    print(f"{'queries':>16} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, queries in query_sets.items():
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(
+            f"{name:>16} {statistics.median(latencies):>8.2f} "
+            f"{latencies[int(0.95 * (len(latencies) - 1))]:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Write a deterministic corpus of synthetic text PDFs for the ingestion benchmarks.
+
+    python -m benchmarks.synthetic_pdfs --out /tmp/corpus --files 20 --pages 50
+"""
+import argparse
+import os
+import random
+
+WORDS = (
+    "data model system network storage query index vector embedding search result user "
+    "process memory thread request response cache latency throughput document page chunk "
+    "token batch server client service pipeline stage buffer queue worker scheduler"
+).split()
+
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+
+def page_lines(rng, lines=LINES_PER_PAGE, words=WORDS_PER_LINE):
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(lines)]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """
+    Build a minimal PDF with one Helvetica text page per list of lines.
+
+    :param pages: A list of pages, each a list of text lines.
+    :return: The PDF bytes.
+    """
+    count = len(pages)
+    font_id = 3 + 2 * count
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids [%s] /Count %d >>"
+            % (" ".join(f"{3 + 2 * i} 0 R" for i in range(count)), count)
+        ).encode(),
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+            ).encode()
+        )
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 750 Td {text} ET".encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def write_corpus(out_dir, files, pages, seed=0):
+    """
+    Write files PDFs of pages pages each.
+
+    :return: The sorted list of PDF paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        path = os.path.join(out_dir, f"synthetic_{i:04d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf([page_lines(rng) for _ in range(pages)]))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_corpus(args.out, args.files, args.pages, args.seed)
+    print(f"Wrote {len(paths)} PDFs of {args.pages} pages to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare loading a cached vector store through a temporary directory against
+building it straight from the in-memory bytes.
+
+Run from the repository root:
+
+    python -m benchmarks.vectorstore_load --sizes 1 10 100 500
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.core.openAI_embeddings import load_vectorstore_from_bytes
+
+DIMENSION = 1536
+CHUNK_TEXT = "lorem ipsum dolor sit amet " * 18  # roughly a 500 character chunk
+
+
+def build_serialized_store(size_mb):
+    """
+    Build a flat index of roughly size_mb megabytes and return its serialized bytes.
+
+    :param size_mb: The target size of the index in megabytes.
+    :return: A tuple of (index bytes, pickled docstore bytes).
+    """
+    ntotal = max(1, size_mb * 1024 * 1024 // (DIMENSION * 4))
+    index = faiss.IndexFlatL2(DIMENSION)
+    rng = np.random.default_rng(0)
+    for start in range(0, ntotal, 10000):
+        count = min(10000, ntotal - start)
+        index.add(rng.random((count, DIMENSION), dtype=np.float32))
+
+    ids = [str(i) for i in range(ntotal)]
+    docstore = InMemoryDocstore(
+        {
+            _id: Document(page_content=CHUNK_TEXT, metadata={"source": "bench.pdf", "page": i})
+            for i, _id in enumerate(ids)
+        }
+    )
+    index_to_docstore_id = dict(enumerate(ids))
+
+    index_data = faiss.serialize_index(index).tobytes()
+    metadata_data = pickle.dumps((docstore, index_to_docstore_id))
+    return index_data, metadata_data
+
+
+def load_via_temp_dir(index_data, metadata_data, embeddings):
+    """The previous Redis hit path: deserialize, write to disk and load_local again."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index_array = np.frombuffer(index_data, dtype=np.uint8)
+        faiss.deserialize_index(index_array)
+        pickle.loads(metadata_data)
+
+        with open(os.path.join(temp_dir, "index.faiss"), "wb") as f:
+            f.write(index_array)
+        with open(os.path.join(temp_dir, "index.pkl"), "wb") as f:
+            f.write(metadata_data)
+
+        return FAISS.load_local(
+            temp_dir, embeddings, allow_dangerous_deserialization=True
+        )
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    embeddings = FakeEmbeddings(size=DIMENSION)
+
+    print(f"{'size_mb':>8} {'temp_dir_ms':>12} {'in_memory_ms':>13} {'speedup':>8}")
+    for size_mb in args.sizes:
+        index_data, metadata_data = build_serialized_store(size_mb)
+        temp_dir_time = best_of(
+            lambda: load_via_temp_dir(index_data, metadata_data, embeddings),
+            args.repeat,
+        )
+        in_memory_time = best_of(
+            lambda: load_vectorstore_from_bytes(index_data, metadata_data, embeddings),
+            args.repeat,
+        )
+        print(
+            f"{size_mb:>8} {temp_dir_time * 1000:>12.1f} {in_memory_time * 1000:>13.1f} "
+            f"{temp_dir_time / in_memory_time:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()